@@ -0,0 +1,54 @@
+"""
+Import time of pyportlib, each statement is timed in a fresh interpreter
+
+usage: python benchmarks/import_time.py [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = ["import pyportlib",
+              "import pyportlib.create",
+              "import pyportlib.portfolio.portfolio",
+              "import pyportlib.stats",
+              "import pyportlib.plots"]
+
+HEAVY_MODULES = ["quantstats", "scipy", "yfinance", "yahoo_fin", "pandas_datareader", "pandas_market_calendars",
+                 "matplotlib", "dependency_injector"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str, repeat: int) -> dict:
+    runs = []
+    loaded = []
+    for _ in range(repeat):
+        code = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        runs.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"statement": statement, "median": statistics.median(runs), "min": min(runs), "loaded": loaded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="number of fresh interpreters per statement")
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        result = measure(statement=statement, repeat=args.repeat)
+        print(f"{result['statement']:<55} median {result['median']:.3f}s  min {result['min']:.3f}s  "
+              f"heavy modules: {', '.join(result['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Memory of a portfolio built from a large synthetic account, in the default and the compact mode
+
+The account and its price files are written to a temporary client directory, every portfolio is then built by
+create.portfolio in a fresh interpreter so the modes do not share memory.
+
+usage: python benchmarks/memory.py [--tickers 200] [--years 10] [--transactions 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ACCOUNT = "benchmark"
+MODES = ["default", "compact"]
+
+
+def setup(tickers: int, years: int, transactions: int) -> None:
+    """
+    Writes the transactions, cash changes and market data of the synthetic account to the client directory
+    """
+    from pyportlib import create
+    from pyportlib.utils import files_utils
+
+    rng = np.random.default_rng(0)
+    names = [f"T{i:05d}" + (".TO" if i % 3 == 0 else "") for i in range(tickers)]
+    dates = pd.bdate_range(end="2022-06-30", periods=252 * years, name="Date")
+    reader = create.datareader()
+
+    walks = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(names), len(dates))), axis=1))
+    for ticker, walk in zip(names, walks):
+        pd.DataFrame({"Close": walk.round(2)}, index=dates).to_csv(reader.prices_path(ticker=ticker))
+    pd.DataFrame({"Close": 1.}, index=dates).to_csv(reader.fx_path(currency_pair="CADCAD"))
+    pd.DataFrame({"Close": (1.25 + rng.normal(0, 0.01, len(dates))).round(4)},
+                 index=dates).to_csv(reader.fx_path(currency_pair="USDCAD"))
+    # the files are added to the data catalog here, the measured builds only read them
+    for ticker in names:
+        reader.read_prices(ticker=ticker)
+    for pair in ["CADCAD", "USDCAD"]:
+        reader.read_fx(currency_pair=pair)
+
+    traded = rng.choice(names, transactions)
+    buy = rng.random(transactions) < 0.7
+    quantities = rng.integers(1, 100, transactions)
+    trx = pd.DataFrame({"Date": np.sort(rng.choice(dates, transactions)),
+                        "Ticker": traded,
+                        "Type": np.where(buy, "Buy", "Sell"),
+                        "Quantity": np.where(buy, quantities, -quantities),
+                        "Price": rng.uniform(1, 500, transactions).round(2),
+                        "Fees": rng.uniform(0, 10, transactions).round(2),
+                        "Currency": ["CAD" if ticker.endswith(".TO") else "USD" for ticker in traded]})
+    directory = f"{files_utils.get_accounts_dir()}{ACCOUNT}"
+    os.makedirs(directory, exist_ok=True)
+    trx.to_csv(f"{directory}/transactions.csv", index=False)
+    pd.DataFrame({"Date": [dates[0]], "Direction": ["Deposit"], "Amount": [1e9]}).to_csv(f"{directory}/cash.csv",
+                                                                                         index=False)
+
+
+def measure(compact: bool) -> dict:
+    from pyportlib import create
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    ptf = create.portfolio(account=ACCOUNT, currency="CAD", compact=compact)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"transactions": int(ptf.transactions.memory_usage(deep=True).sum()),
+            # the price series share their date index, only the values are counted
+            "prices": int(sum(pos.prices.memory_usage(index=False) for pos in ptf.positions.values())),
+            "peak": peak,
+            "seconds": seconds}
+
+
+def _child(home: str, *args: str) -> str:
+    # the client directory is ~/pyportlib_client_data, home is the temporary directory in the child interpreters
+    env = {**os.environ, "HOME": home, "USERPROFILE": home}
+    return subprocess.run([sys.executable, __file__, *args], env=env, stdout=subprocess.PIPE, text=True,
+                          check=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=200, help="number of tickers in the account")
+    parser.add_argument("--years", type=int, default=10, help="years of daily prices per ticker")
+    parser.add_argument("--transactions", type=int, default=20000, help="number of transactions of the account")
+    parser.add_argument("--setup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        setup(tickers=args.tickers, years=args.years, transactions=args.transactions)
+        return
+    if args.measure:
+        print(json.dumps(measure(compact=args.measure == "compact")))
+        return
+
+    with tempfile.TemporaryDirectory() as home:
+        _child(home, "--setup", "--tickers", str(args.tickers), "--years", str(args.years),
+               "--transactions", str(args.transactions))
+        results = {mode: json.loads(_child(home, "--measure", mode).strip().splitlines()[-1]) for mode in MODES}
+    for key in ["transactions", "prices", "peak"]:
+        default, compact = results["default"][key], results["compact"][key]
+        print(f"{key:<14} default {default / 2 ** 20:9.1f} MiB  compact {compact / 2 ** 20:9.1f} MiB  "
+              f"{1 - compact / default:6.1%} less")
+    print(f"{'build':<14} default {results['default']['seconds']:9.2f} s    "
+          f"compact {results['compact']['seconds']:9.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,29 @@
-from pyportlib.utils import files_utils
+import importlib
 
-files_utils.set_client_dir()
-
-from pyportlib import create
-from pyportlib import plots
-from pyportlib import stats
-from pyportlib.utils.indices import Index
-from pyportlib.utils import dates_utils, df_utils
 from pyportlib.utils.files_utils import get_client_dir, set_client_dir
-from pyportlib.account_sources.questrade_connection import QuestradeConnection
\ No newline at end of file
+
+# submodules and objects are imported on first access, importing pyportlib stays fast and does not touch the disk
+_LAZY = {"create": ("pyportlib.create", None),
+         "plots": ("pyportlib.plots", None),
+         "stats": ("pyportlib.stats", None),
+         "dates_utils": ("pyportlib.utils.dates_utils", None),
+         "df_utils": ("pyportlib.utils.df_utils", None),
+         "Index": ("pyportlib.utils.indices", "Index"),
+         "QuestradeConnection": ("pyportlib.account_sources.questrade_connection", "QuestradeConnection")}
+
+__all__ = ["get_client_dir", "set_client_dir"] + list(_LAZY)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module 'pyportlib' has no attribute '{name}'")
+    module_name, attribute = _LAZY[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
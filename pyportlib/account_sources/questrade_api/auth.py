@@ -1,6 +1,7 @@
 import os
 import json
 import time
+import threading
 from urllib import request
 from pyportlib.utils import files_utils
 
@@ -18,6 +19,7 @@ class Auth:
             self.token_path = kwargs['token_path']
         else:
             self.token_path = TOKEN_PATH
+        self._lock = threading.Lock()
         if 'refresh_token' in kwargs:
             self.__refresh_token(kwargs['refresh_token'])
 
@@ -41,19 +43,17 @@ class Auth:
             token = json.loads(r.read().decode('utf-8'))
             token['expires_at'] = str(req_time + token['expires_in'])
             self.__write_token(token)
+            self.token_data = token
 
     def __get_valid_token(self):
-        try:
-            self.token_data
-        except AttributeError:
-            self.token_data = self.__read_token()
-        finally:
-            if time.time() + 60 < int(self.token_data['expires_at']):
-                return self.token_data
-            else:
-                self.__refresh_token(self.token_data['refresh_token'])
+        with self._lock:
+            try:
+                self.token_data
+            except AttributeError:
                 self.token_data = self.__read_token()
-                return self.token_data
+            if time.time() + 60 >= int(self.token_data['expires_at']):
+                self.__refresh_token(self.token_data['refresh_token'])
+            return self.token_data
 
     @property
     def token(self):
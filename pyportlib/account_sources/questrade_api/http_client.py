@@ -0,0 +1,112 @@
+import http.client
+import queue
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+from pyportlib.utils import logger
+
+
+class HttpClient:
+    """
+    Thread safe HTTP client keeping persistent (keep-alive) connections per host, with retries and exponential
+    backoff on connection errors, 429 and 5xx responses.
+    """
+    _RETRY_STATUS = {429, 500, 502, 503, 504}
+    # a request failing on a reused connection may have reached the server, it is only sent again for free when
+    # sending it twice is harmless
+    _IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+    def __init__(self, pool_size: int = 8, max_retries: int = 3, backoff: float = 0.5, timeout: float = 30.):
+        """
+        :param pool_size: maximum number of idle connections kept per host
+        :param max_retries: number of retries after the first attempt
+        :param backoff: base wait in seconds, doubled at every retry
+        :param timeout: socket timeout in seconds
+        """
+        self._pool_size = pool_size
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._pools: Dict[Tuple[str, str], queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "HTTP Client"
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None) -> Tuple[int, bytes]:
+        """
+        Sends a request on a pooled connection
+
+        :param method: 'GET', 'POST', ...
+        :param url: full url
+        :param headers: request headers
+        :param body: request body
+        :return: status code and response body
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = dict(headers) if headers else {}
+        headers.setdefault('Connection', 'keep-alive')
+
+        attempt = 0
+        while True:
+            conn, reused = self._get_connection(parts.scheme, parts.netloc)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as ex:
+                conn.close()
+                if reused and method.upper() in self._IDEMPOTENT_METHODS:
+                    # idle connection closed by the server, try again on another one
+                    continue
+                if attempt >= self._max_retries:
+                    raise
+                logger.logging.debug(f"{method} {url} failed ({ex}), retrying")
+            else:
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._release_connection(parts.scheme, parts.netloc, conn)
+                if response.status not in self._RETRY_STATUS or attempt >= self._max_retries:
+                    return response.status, data
+                logger.logging.debug(f"{method} {url} returned {response.status}, retrying")
+                retry_after = response.getheader('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    time.sleep(float(retry_after))
+                    attempt += 1
+                    continue
+            time.sleep(self._backoff * 2 ** attempt)
+            attempt += 1
+
+    def close(self) -> None:
+        """
+        Closes all the idle connections
+        :return: None
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while not pool.empty():
+                pool.get_nowait().close()
+
+    def _pool(self, scheme: str, netloc: str) -> queue.LifoQueue:
+        with self._lock:
+            return self._pools.setdefault((scheme, netloc), queue.LifoQueue(maxsize=self._pool_size))
+
+    def _get_connection(self, scheme: str, netloc: str) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._pool(scheme, netloc).get_nowait(), True
+        except queue.Empty:
+            if scheme == 'https':
+                return http.client.HTTPSConnection(netloc, timeout=self._timeout), False
+            return http.client.HTTPConnection(netloc, timeout=self._timeout), False
+
+    def _release_connection(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool(scheme, netloc).put_nowait(conn)
+        except queue.Full:
+            conn.close()
@@ -1,9 +1,12 @@
 import os
 import json
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import configparser
-import urllib
 from .auth import Auth
+from .http_client import HttpClient
 
 CONFIG_PATH = os.path.join(os.path.abspath(
     os.path.dirname(__file__)), 'questrade.cfg')
@@ -20,6 +23,7 @@ class Questrade:
                        ['token_path', 'refresh_token']}
 
         self.auth = Auth(**auth_kwargs, config=self.config)
+        self._http = kwargs['http_client'] if 'http_client' in kwargs else HttpClient()
 
     def __read_config(self, fpath):
         config = configparser.ConfigParser()
@@ -27,48 +31,27 @@ class Questrade:
             config.read_file(f)
         return config
 
-    @property
-    def __base_url(self):
-        return self.auth.token['api_server'] + self.config['Settings']['Version']
-
-    def __build_get_req(self, url, params):
+    def __build_get_url(self, url, params):
         if params:
-            # url1 = self.__base_url + url + '?' + urllib.parse.urlencode(params, encoding='utf-8')
             params = [f'{k}={v}&' for k, v in params.items()]
-            url = self.__base_url + url + '?' + ''.join(params)
-            return urllib.request.Request(url)
-        else:
-            return urllib.request.Request(self.__base_url + url)
+            return url + '?' + ''.join(params)
+        return url
+
+    def __request(self, method, url, body=None):
+        # token is read once per call, it is kept in memory by Auth until it is close to expiry
+        token = self.auth.token
+        headers = {'Authorization': token['token_type'] + ' ' + token['access_token']}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        url = token['api_server'] + self.config['Settings']['Version'] + url
+        status, data = self._http.request(method, url, headers=headers, body=body)
+        return json.loads(data.decode('utf-8'))
 
     def __get(self, url, params=None):
-        req = self.__build_get_req(url, params)
-        req.add_header(
-            'Authorization',
-            self.auth.token['token_type'] + ' ' +
-            self.auth.token['access_token']
-        )
-        try:
-            r = urllib.request.urlopen(req)
-            return json.loads(r.read().decode('utf-8'))
-        except urllib.error.HTTPError as e:
-            return json.loads(e.read().decode('utf-8'))
-
-    def __build_post_req(self, url, params):
-        url = self.__base_url + url
-        return urllib.request.Request(url, data=json.dumps(params).encode('utf8'))
+        return self.__request('GET', self.__build_get_url(url, params))
 
     def __post(self, url, params):
-        req = self.__build_post_req(url, params)
-        req.add_header(
-            'Authorization',
-            self.auth.token['token_type'] + ' ' +
-            self.auth.token['access_token']
-        )
-        try:
-            r = urllib.request.urlopen(req)
-            return json.loads(r.read().decode('utf-8'))
-        except urllib.error.HTTPError as e:
-            return json.loads(e.read().decode('utf-8'))
+        return self.__request('POST', url, body=json.dumps(params).encode('utf8'))
 
     @property
     def __now(self):
@@ -148,3 +131,30 @@ class Questrade:
         if 'endTime' not in kwargs:
             kwargs['endTime'] = self.__now
         return self.__get(self.config['API']['MarketsCandles'].format(id), kwargs)
+
+
+class AsyncQuestrade:
+    """
+    Asyncio variant of the Questrade client. Every method and property of Questrade is available as a coroutine,
+    calls run in a thread pool and share the client's connection pool.
+
+    ex. accounts = await client.accounts
+        quotes = await client.markets_quotes(ids='8049,9292')
+    """
+
+    def __init__(self, client: Questrade = None, max_workers: int = 8, **kwargs):
+        self._client = client if client is not None else Questrade(**kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __getattr__(self, name):
+        if isinstance(getattr(type(self._client), name, None), property):
+            return self._run(lambda: getattr(self._client, name))
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await self._run(functools.partial(method, *args, **kwargs))
+        return call
+
+    async def _run(self, func):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func)
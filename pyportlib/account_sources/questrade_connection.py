@@ -1,5 +1,9 @@
-from datetime import datetime
-from typing import Union, List
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Union, List, Tuple
+import numpy as np
 import pandas as pd
 import dateutil.parser
 
@@ -8,19 +12,37 @@ from pyportlib.portfolio.iportfolio import IPortfolio
 from pyportlib.position.iposition import IPosition
 from pyportlib.account_sources.account_source_interface import AccountSourceInterface
 from pyportlib.services.interfaces.icash_change import ICashChange
-from pyportlib.utils import logger, config_utils
+from pyportlib.utils import logger, config_utils, files_utils
+from pyportlib.utils.rate_limiter import RateLimiter
 from pyportlib.account_sources.questrade_api.questrade import Questrade
+from pyportlib.account_sources.questrade_quote_source import QuestradeQuoteSource
 from pyportlib.services.interfaces.itransaction import ITransaction
+from pyportlib.services.corporate_actions import split_factors
+from pyportlib.services.dedup_index import DedupIndex
 from pyportlib.utils import dates_utils
 from pyportlib import create
 
 
 class QuestradeConnection(Questrade, AccountSourceInterface):
+    # questrade accepts at most 31 days between startTime and endTime of the activities endpoint
+    _MAX_WINDOW_DAYS = 30
+    # activity windows are aligned on blocks of _MAX_WINDOW_DAYS counted from this date, so the checkpointed windows
+    # are found again when a backfill resumes with another start or end date
+    _WINDOW_ANCHOR = datetime(2000, 1, 1)
+    # account calls are limited to 30 requests per second
+    _REQUESTS_PER_SECOND = 20
+    _CHECKPOINT_FILENAME = "questrade_{}_checkpoint.json"
+    # a candles request returns at most 2000 candles, one trading day of minute bars is 390
+    _CANDLE_WINDOW_DAYS = {'OneMinute': 1, 'TwoMinutes': 2, 'ThreeMinutes': 3, 'FourMinutes': 4, 'FiveMinutes': 5,
+                           'TenMinutes': 10, 'FifteenMinutes': 15, 'HalfHour': 30, 'OneHour': 60}
+
     def __init__(self, account_name, **kwargs):
         super().__init__(**kwargs)
         self.account_name = account_name.upper()
         self.active_accounts = self.active_accounts()
         self.account_id = self.select_account()
+        self._rate_limiter = RateLimiter(rate=self._REQUESTS_PER_SECOND)
+        self._quotes = QuestradeQuoteSource(client=self)
 
     def select_account(self, select: str = "TFSA"):
         if len(self.active_accounts) == 1:
@@ -52,27 +74,154 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
         """
         return self.account_balances(self.account_id)
 
-    def get_transactions(self, start_date: datetime = None, end_date: datetime = None) -> List[dict]:
+    def get_transactions(self, start_date: datetime = None, end_date: datetime = None, max_workers: int = 4) -> List[dict]:
         """
-        Get transactions raw transactions data within a date range from the connected account
+        Get transactions raw transactions data within a date range from the connected account.
+        The range is fetched in windows of up to 30 days requested concurrently. Every completed window is
+        checkpointed so an interrupted backfill resumes where it stopped.
         :param start_date: Date to start search
         :param end_date: Date to stop search
+        :param max_workers: number of windows requested at the same time
         :return: List of dict containing transaction information
         """
         end_date = dates_utils.last_bday(as_of=end_date)
+        if start_date is None:
+            start_date = end_date
+
+        windows = self._date_windows(start_date=start_date, end_date=end_date, days=self._MAX_WINDOW_DAYS,
+                                     anchor=self._WINDOW_ANCHOR)
+        checkpoint = self._load_checkpoint()
+        # windows of another range (ex. the last window of a run that ended earlier) are dropped
+        keys = {self._window_key(window) for window in windows}
+        checkpoint = {k: v for k, v in checkpoint.items() if k in keys}
+        to_fetch = [window for window in windows if self._window_key(window) not in checkpoint]
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_activities, *window): window for window in to_fetch}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    checkpoint[self._window_key(window)] = future.result()
+                    self._save_checkpoint(checkpoint)
+                except Exception as ex:
+                    logger.logging.error(f"questrade activities from {window[0].date()} to {window[1].date()} not fetched: {ex}")
+                    failed.append(window)
+
+        if failed:
+            raise ConnectionError(f"{len(failed)} activity windows not fetched, call again to resume")
 
-        date_rng = dates_utils.get_market_days(start=start_date, end=end_date)
         list_of_trx = []
-        for date in date_rng:
-            date = date.isoformat('T') + '-05:00'
-            kwargs = {'startTime': date, 'endTime': date}
-            trx = self.account_activities(self.account_id, **kwargs).get('activities', self.account_activities(
-                self.account_id, **kwargs))
-            if trx:
-                list_of_trx.extend(trx)
+        for window in windows:
+            list_of_trx.extend(checkpoint[self._window_key(window)])
+        self._clear_checkpoint()
 
         return list_of_trx
 
+    def _fetch_activities(self, start_date: datetime, end_date: datetime) -> List[dict]:
+        kwargs = {'startTime': start_date.isoformat('T') + '-05:00',
+                  'endTime': end_date.replace(hour=23, minute=59, second=59).isoformat('T') + '-05:00'}
+        self._rate_limiter.acquire()
+        response = self.account_activities(self.account_id, **kwargs)
+        if 'activities' not in response:
+            raise ConnectionError(response.get('message', response))
+        return response['activities']
+
+    @staticmethod
+    def _date_windows(start_date: datetime, end_date: datetime, days: int,
+                      anchor: datetime = None) -> List[Tuple[datetime, datetime]]:
+        """
+        Splits a date range in consecutive windows of at most days calendar days, both ends included
+
+        :param anchor: if given, windows end on the blocks of days counted from the anchor, only the first and last
+        windows depend on the range. Windows start at start_date otherwise
+        """
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        windows = []
+        while start_date <= end_date:
+            length = days if anchor is None else days - (start_date - anchor).days % days
+            window_end = min(start_date + timedelta(days=length - 1), end_date)
+            windows.append((start_date, window_end))
+            start_date = window_end + timedelta(days=1)
+        return windows
+
+    @staticmethod
+    def _window_key(window: Tuple[datetime, datetime]) -> str:
+        return f"{window[0].date().isoformat()}|{window[1].date().isoformat()}"
+
+    @property
+    def _checkpoint_path(self) -> str:
+        return f"{files_utils.get_config_dir()}{self._CHECKPOINT_FILENAME.format(self.account_id)}"
+
+    def _load_checkpoint(self) -> dict:
+        if not files_utils.check_file(directory="", file=self._checkpoint_path):
+            return {}
+        with open(self._checkpoint_path) as myfile:
+            checkpoint = json.loads(myfile.read())
+        logger.logging.info(f"resuming questrade activities fetch, {len(checkpoint)} windows already fetched")
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        tmp = f"{self._checkpoint_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self._checkpoint_path)
+
+    def _clear_checkpoint(self) -> None:
+        if files_utils.check_file(directory="", file=self._checkpoint_path):
+            os.remove(self._checkpoint_path)
+
+    def get_candles(self, ticker: str, start_date: datetime, end_date: datetime = None,
+                    interval: str = 'OneMinute') -> pd.DataFrame:
+        """
+        Intraday bars of a ticker within a date range, requested in windows that fit the candles limit
+        :param ticker: Stock ticker
+        :param start_date: first day
+        :param end_date: last day (included), last business day if None
+        :param interval: questrade candle interval, ex. 'OneMinute', 'FiveMinutes', 'OneHour'
+        :return: DataFrame of Open, High, Low, Close and Volume indexed by bar start time
+        """
+        if interval not in self._CANDLE_WINDOW_DAYS:
+            raise ValueError(f"enter valid candle interval: {list(self._CANDLE_WINDOW_DAYS)}")
+        end_date = dates_utils.last_bday(as_of=end_date)
+        symbol_id = self._quotes.symbol_ids(tickers=[ticker]).get(ticker)
+        if symbol_id is None:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+        candles = []
+        for window in self._date_windows(start_date=start_date, end_date=end_date, days=self._CANDLE_WINDOW_DAYS[interval]):
+            kwargs = {'startTime': window[0].isoformat('T') + '-05:00',
+                      'endTime': window[1].replace(hour=23, minute=59, second=59).isoformat('T') + '-05:00',
+                      'interval': interval}
+            self._rate_limiter.acquire()
+            candles.extend(self.markets_candles(symbol_id, **kwargs).get('candles', []))
+
+        bars = pd.DataFrame(candles, columns=['start', 'open', 'high', 'low', 'close', 'volume'])
+        bars.index = pd.DatetimeIndex([dateutil.parser.isoparse(start).replace(tzinfo=None) for start in bars['start']],
+                                      name='Date')
+        bars = bars.drop(columns='start').rename(columns=str.title)
+        return bars[~bars.index.duplicated()]
+
+    def update_intraday(self, tickers: List[str], start_date: datetime, end_date: datetime = None,
+                        interval: str = 'OneMinute') -> None:
+        """
+        Fetches the intraday bars of tickers and appends them to the locally saved bars
+        :param tickers: Stock tickers
+        :param start_date: first day
+        :param end_date: last day (included), last business day if None
+        :param interval: questrade candle interval
+        :return: None
+        """
+        datareader = create.datareader()
+        for ticker in tickers:
+            try:
+                bars = self.get_candles(ticker=ticker, start_date=start_date, end_date=end_date, interval=interval)
+            except Exception as ex:
+                logger.logging.error(f"{ticker} intraday bars not fetched: {ex}")
+                continue
+            datareader.write_intraday(ticker=ticker, bars=bars)
+
     def _to_cash_changes_list(self, transactions: List[dict]) -> List[ICashChange]:
         """
         Converts list of dicts containing cash change info to a list of CashChange objects
@@ -93,9 +242,11 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
         :param transactions: List of dicts containing transaction info
         :return: List of Transaction objects
         """
+        factors = self._split_factors(transactions)
+        positions = {}
         list_of_transactions = []
         for i in range(len(transactions)):
-            trx = self._make_transaction(transactions[i])
+            trx = self._make_transaction(transactions[i], split_factor=factors[i], positions=positions)
             list_of_transactions.append(trx)
 
         to_remove = config_utils.fetch_tickers_to_ignore()
@@ -123,64 +274,17 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
         list_of_cash_changes = self._to_cash_changes_list(transactions)
         list_of_transactions = self._to_transactions_list(transactions)
 
-        list_of_transactions = self._remove_duplicated_transaction(new_transactions=list_of_transactions,
-                                                                   ptf_transactions=portfolio.transactions,
-                                                                   last_trade_date=last_trade)
+        dedup = DedupIndex(account=portfolio.account)
+        dedup.sync(transactions=portfolio.transactions, cash_changes=portfolio.cash_changes)
+        list_of_transactions = dedup.new_transactions(list_of_transactions)
+        list_of_cash_changes = dedup.new_cash_changes(list_of_cash_changes)
 
-        list_of_cash_changes = self._remove_duplicated_cash_change(new_cash_changes=list_of_cash_changes,
-                                                                   ptf_cash_changes=portfolio.cash_changes,
-                                                                   last_cash_change_date=last_trade)
+        n_transactions, n_cash_changes = len(portfolio.transactions), len(portfolio.cash_changes)
         portfolio.add_cash_change(list_of_cash_changes)
         portfolio.add_transaction(list_of_transactions)
-
-    def _remove_duplicated_cash_change(self, new_cash_changes: List[ICashChange], ptf_cash_changes: pd.DataFrame,
-                                       last_cash_change_date: datetime) -> List[ICashChange]:
-        duped = self._duplicated_cash_change(new_cash_changes, ptf_cash_changes, last_cash_change_date)
-
-        cash_changes = []
-        for cc in new_cash_changes:
-            df = pd.DataFrame([cc.info]).set_index('Date')
-            merge = df.merge(duped, indicator=True)
-            if merge.empty:
-                cash_changes.append(cc)
-            else:
-                pass
-
-        return cash_changes
-
-    @staticmethod
-    def _duplicated_cash_change(new_cash_changes: List[ICashChange], ptf_cash_changes: pd.DataFrame,
-                                last_trade_date: datetime) -> pd.DataFrame:
-        cash_changes = [cc.info for cc in new_cash_changes]
-        try:
-            cash_changes = pd.DataFrame(cash_changes).set_index('Date')
-            cash_changes = pd.concat([cash_changes, ptf_cash_changes], axis=0).sort_index().loc[last_trade_date:]
-        except KeyError:
-            cash_changes = pd.DataFrame()
-        duped = cash_changes.duplicated()
-        return cash_changes.loc[duped]
-
-    def _remove_duplicated_transaction(self, new_transactions: List[ITransaction], ptf_transactions: pd.DataFrame,
-                                       last_trade_date: datetime) -> List[ITransaction]:
-        duped = self._duplicated_transaction(new_transactions=new_transactions, ptf_transactions=ptf_transactions,
-                                             last_trade_date=last_trade_date)
-        transactions = []
-        for trx in new_transactions:
-            merge = trx.df.merge(duped, indicator=True)
-            if merge.empty:
-                transactions.append(trx)
-            else:
-                pass
-
-        return transactions
-
-    @staticmethod
-    def _duplicated_transaction(new_transactions: List[ITransaction], ptf_transactions: pd.DataFrame,
-                                last_trade_date: datetime) -> pd.DataFrame:
-        transactions = pd.concat([trx.df for trx in new_transactions])
-        transactions = pd.concat([transactions, ptf_transactions], axis=0).sort_index().loc[last_trade_date:]
-        duped = transactions.duplicated()
-        return transactions.loc[duped]
+        complete = len(portfolio.transactions) == n_transactions + len(list_of_transactions) and \
+            len(portfolio.cash_changes) == n_cash_changes + len(list_of_cash_changes)
+        dedup.record(transactions=list_of_transactions, cash_changes=list_of_cash_changes, complete=complete)
 
     @staticmethod
     def _filter_cash_changes(transactions: list) -> List[dict]:
@@ -194,10 +298,39 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
                                             direction=cash_change["type"][:-1].title(),
                                             amount=float(cash_change["netAmount"]))
 
-    def _make_transaction(self, transaction) -> Union[ITransaction, None]:
+    @staticmethod
+    def _split_factors(transactions: List[dict]) -> np.ndarray:
+        """
+        Split factor of every transaction. Splits are read once per ticker from the corporate actions store and
+        the factors of all the trades of a ticker are computed at once.
+        :param transactions: List of dicts containing transaction info
+        :return: array of split factors in the same order as transactions
+        """
+        factors = np.ones(len(transactions))
+        by_ticker = {}
+        for i, trx in enumerate(transactions):
+            ticker = trx.get('symbol')
+            if not isinstance(ticker, float) and ticker and trx.get('tradeDate'):
+                by_ticker.setdefault(ticker, []).append(i)
+
+        datareader = create.datareader()
+        for ticker, idx in by_ticker.items():
+            dates = [dateutil.parser.isoparse(transactions[i].get('tradeDate')).replace(tzinfo=None) for i in idx]
+            dates = [date.replace(hour=0, minute=0, second=0, microsecond=0) for date in dates]
+            try:
+                splits = datareader.get_splits(ticker=ticker)
+            except Exception as ex:
+                logger.logging.error(f"no splits data for {ticker}: {ex}")
+                continue
+            factors[idx] = split_factors(splits=splits, dates=dates)
+        return factors
+
+    def _make_transaction(self, transaction, split_factor: float = 1., positions: dict = None) -> Union[ITransaction, None]:
         """
         Makes Transaction object from dict containing transaction info.
         :param transaction:
+        :param split_factor: split factor of all the splits since the trade date
+        :param positions: positions already created during the import, by ticker
         :return: Transaction object
         """
         if transaction.get('type') not in ['Trades', 'Dividends', 'Transfers'] or "SPLIT" in transaction.get(
@@ -218,15 +351,10 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
         qty = transaction.get('quantity')
         fees = abs(transaction.get('commission'))
 
-        if not isinstance(ticker, float) and ticker:
-            pos = create.position(ticker=ticker, local_currency=currency)
-        else:
+        if isinstance(ticker, float) or not ticker:
             logger.logging.error(f"{ticker} not supported")
             return
 
-        splits = pos.get_splits()
-        split_factor = self._calc_split(splits=splits, trade_date=date)
-
         if trx_type == 'Dividends':
             trx_type = 'Dividend'
             price = transaction.get('netAmount')
@@ -238,7 +366,11 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
         elif trx_type == 'Transfers':
             if transaction.get('quantity') == 0:
                 return
-            price = self._transfer_cost(position=pos, date=date)
+            if positions is None:
+                positions = {}
+            if ticker not in positions:
+                positions[ticker] = create.position(ticker=ticker, local_currency=currency)
+            price = self._transfer_cost(position=positions[ticker], date=date)
             trx_type = "Buy"
 
         else:
@@ -255,24 +387,6 @@ class QuestradeConnection(Questrade, AccountSourceInterface):
 
         return trx
 
-    @staticmethod
-    def _calc_split(splits: pd.DataFrame, trade_date: datetime) -> float:
-        if not isinstance(splits, list):
-            if not splits.empty:
-                splits = splits.loc[trade_date:].cumprod()
-                try:
-                    split_factor = splits.iloc[-1]
-                except KeyError:
-                    split_factor = 1
-                except IndexError:
-                    split_factor = 1
-            else:
-                split_factor = 1
-        else:
-            split_factor = 1
-
-        return split_factor
-
     @staticmethod
     def _transfer_cost(position: IPosition, date: datetime) -> float:
         try:
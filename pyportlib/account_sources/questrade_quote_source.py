@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+import dateutil.parser
+
+from pyportlib.account_sources.questrade_api.questrade import Questrade
+from pyportlib.data_connections.interfaces.iquote_source import IQuoteSource
+from pyportlib.utils import logger
+
+
+class QuestradeQuoteSource(IQuoteSource):
+    """
+    Live quotes from the Questrade markets endpoints. Symbol ids are resolved once and quotes are requested in
+    batches of ids.
+    """
+    _NAME = "Questrade Quotes"
+    _BATCH_SIZE = 100
+
+    def __init__(self, client: Questrade = None, **kwargs):
+        self._client = client if client is not None else Questrade(**kwargs)
+        self._symbol_ids = {}
+
+    def __repr__(self):
+        return self._NAME
+
+    def get_quotes(self, tickers: List[str]) -> Dict[str, Tuple[datetime, float]]:
+        """
+        Last trade of every ticker
+
+        :param tickers: Stock tickers, as in the portfolio (ex. XIU.TO)
+        :return: dict of ticker: (last trade time, last trade price)
+        """
+        ids = {symbol_id: ticker for ticker, symbol_id in self.symbol_ids(tickers=tickers).items()}
+        id_list = list(ids.keys())
+
+        quotes = {}
+        for i in range(0, len(id_list), self._BATCH_SIZE):
+            batch = id_list[i:i + self._BATCH_SIZE]
+            response = self._client.markets_quotes(ids=",".join(str(symbol_id) for symbol_id in batch))
+            for quote in response.get('quotes', []):
+                price = quote.get('lastTradePrice')
+                if price is None:
+                    continue
+                time = quote.get('lastTradeTime')
+                time = dateutil.parser.isoparse(time).replace(tzinfo=None) if time else datetime.now()
+                quotes[ids[quote.get('symbolId')]] = (time, float(price))
+        return quotes
+
+    def symbol_ids(self, tickers: List[str]) -> Dict[str, int]:
+        """
+        Questrade symbol id of every ticker, ids are looked up once and kept
+
+        :param tickers: Stock tickers
+        :return: dict of ticker: symbol id, tickers without a questrade symbol are omitted
+        """
+        missing = [ticker for ticker in tickers if ticker not in self._symbol_ids]
+        for i in range(0, len(missing), self._BATCH_SIZE):
+            batch = missing[i:i + self._BATCH_SIZE]
+            names = {self._questrade_symbol(ticker): ticker for ticker in batch}
+            response = self._client.symbols(names=",".join(names.keys()))
+            for symbol in response.get('symbols', []):
+                ticker = names.get(symbol.get('symbol'))
+                if ticker is not None:
+                    self._symbol_ids[ticker] = symbol.get('symbolId')
+        for ticker in missing:
+            if ticker not in self._symbol_ids:
+                logger.logging.error(f"{ticker} has no questrade symbol")
+        return {ticker: self._symbol_ids[ticker] for ticker in tickers if ticker in self._symbol_ids}
+
+    @staticmethod
+    def _questrade_symbol(ticker: str) -> str:
+        # questrade lists tsx symbols with a .TO suffix as well, class shares use a dot instead of a dash
+        return ticker.replace('-', '.') if not ticker.endswith('.TO') else ticker[:-3].replace('-', '.') + '.TO'
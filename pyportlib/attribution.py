@@ -0,0 +1,335 @@
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+
+import pyportlib.create
+from pyportlib.portfolio import scenarios
+from pyportlib.portfolio.iportfolio import IPortfolio
+from pyportlib.services.attribution_cache import AttributionCache
+from pyportlib.utils import logger
+from pyportlib.utils.indices import Index
+
+
+def weights_and_returns(ptf: IPortfolio, start_date: datetime = None,
+                        end_date: datetime = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Daily weight and return of every position in one aligned pair of matrices, dates x tickers. The weights are the
+    position market values in % of the portfolio market value and the returns are the position pnl in % of their
+    market value, so the sum of weights * returns is the pct_daily_total_pnl of the portfolio (without cash). The pnl
+    of a position on the day it is opened has no market value to be measured on and is left out.
+
+    :param ptf: Portfolio
+    :param start_date: start date of series, first transaction date if None
+    :param end_date: end date of series, last market value date if None
+    :return: weights, returns
+    """
+    if start_date is None:
+        start_date = ptf.start_date
+    if end_date is None:
+        end_date = ptf.market_value.index[-1]
+
+    pnl = ptf.daily_total_pnl(start_date=start_date, end_date=end_date)
+    market_values = scenarios.position_market_values(ptf=ptf).reindex(index=pnl.index, columns=pnl.columns).fillna(0.)
+    total = market_values.sum(axis=1).values[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.nan_to_num(market_values.values / total, posinf=0., neginf=0.)
+        returns = np.nan_to_num(pnl.values / market_values.values, posinf=0., neginf=0.)
+    return (pd.DataFrame(weights, index=pnl.index, columns=pnl.columns),
+            pd.DataFrame(returns, index=pnl.index, columns=pnl.columns))
+
+
+def group_matrix(tickers: List[str], groups: Dict[str, str]) -> pd.DataFrame:
+    """
+    One hot matrix of the group of every ticker, tickers x groups. Tickers without a group are in the '' group.
+
+    :param tickers: tickers
+    :param groups: ticker: group (ex. position tags or index sectors)
+    :return:
+    """
+    labels = pd.Series([groups.get(ticker, "") for ticker in tickers], index=tickers)
+    return pd.get_dummies(labels).astype(float)
+
+
+def brinson(weights: pd.DataFrame, returns: pd.DataFrame, benchmark_weights: Union[pd.DataFrame, pd.Series],
+            benchmark_returns: pd.DataFrame, groups: Dict[str, str]) -> pd.DataFrame:
+    """
+    Daily Brinson-Fachler attribution of the active return by group. The portfolio and the benchmark are aligned on
+    the union of their tickers and aggregated by group with one matrix product, the effects of a day sum to the
+    portfolio return less the benchmark return.
+
+    :param weights: portfolio weights, dates x tickers
+    :param returns: portfolio returns, dates x tickers
+    :param benchmark_weights: benchmark weights, dates x tickers, or constant weights by ticker
+    :param benchmark_returns: benchmark returns, dates x tickers
+    :param groups: group of every ticker of the portfolio and of the benchmark
+    :return: dates x (effect, group), with the effects Allocation, Selection and Interaction
+    """
+    dates = weights.index
+    tickers = list(dict.fromkeys(list(weights.columns) + list(benchmark_returns.columns)))
+    wp = weights.reindex(columns=tickers).fillna(0.).values
+    rp = returns.reindex(index=dates, columns=tickers).fillna(0.).values
+    wb, rb = _align_benchmark(benchmark_weights, benchmark_returns, dates=dates, tickers=tickers)
+    g = group_matrix(tickers=tickers, groups=groups)
+
+    group_wp, group_wb = wp @ g.values, wb @ g.values
+    group_cb = (wb * rb) @ g.values
+    total_b = group_cb.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the return of a group without benchmark weight is the benchmark return, and the return of a group not
+        # held is its benchmark return, the group then only has an allocation effect
+        group_rb = np.where(group_wb != 0, group_cb / group_wb, total_b)
+        group_rp = np.where(group_wp != 0, ((wp * rp) @ g.values) / group_wp, group_rb)
+
+    active_w = group_wp - group_wb
+    effects = {'Allocation': active_w * (group_rb - total_b),
+               'Selection': group_wb * (group_rp - group_rb),
+               'Interaction': active_w * (group_rp - group_rb)}
+    return pd.concat({effect: pd.DataFrame(values, index=dates, columns=g.columns)
+                      for effect, values in effects.items()}, axis=1)
+
+
+def benchmark_return(benchmark_weights: Union[pd.DataFrame, pd.Series], benchmark_returns: pd.DataFrame,
+                     dates: pd.DatetimeIndex) -> pd.Series:
+    """
+    Daily return of a benchmark, sum of weights * returns
+
+    :param benchmark_weights: benchmark weights, dates x tickers, or constant weights by ticker
+    :param benchmark_returns: benchmark returns, dates x tickers
+    :param dates: dates of the returns
+    :return:
+    """
+    wb, rb = _align_benchmark(benchmark_weights, benchmark_returns, dates=dates,
+                              tickers=list(benchmark_returns.columns))
+    return pd.Series((wb * rb).sum(axis=1), index=dates, name='Benchmark')
+
+
+def _align_benchmark(benchmark_weights: Union[pd.DataFrame, pd.Series], benchmark_returns: pd.DataFrame,
+                     dates: pd.DatetimeIndex, tickers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(benchmark_weights, pd.Series):
+        wb = np.tile(benchmark_weights.reindex(tickers).fillna(0.).values, (len(dates), 1))
+    else:
+        # weights are known at their date and kept until the next one
+        wb = benchmark_weights.sort_index().reindex(index=dates, method='ffill').reindex(columns=tickers).fillna(0.).values
+    rb = benchmark_returns.reindex(index=dates, columns=tickers).fillna(0.).values
+    return wb, rb
+
+
+def link(effects: pd.DataFrame, portfolio_returns: pd.Series, benchmark_returns: pd.Series = None) -> pd.Series:
+    """
+    Carino linking of daily arithmetic effects over a period, the linked effects sum to the compounded portfolio
+    return less the compounded benchmark return
+
+    :param effects: daily effects, dates x effects
+    :param portfolio_returns: daily portfolio returns
+    :param benchmark_returns: daily benchmark returns, 0 if None
+    :return: linked effects
+    """
+    rp = portfolio_returns.reindex(effects.index).fillna(0.).values
+    rb = np.zeros_like(rp) if benchmark_returns is None else benchmark_returns.reindex(effects.index).fillna(0.).values
+    total_p, total_b = np.prod(1 + rp) - 1, np.prod(1 + rb) - 1
+    k = _carino(rp, rb)
+    linked = (effects.values * k[:, None]).sum(axis=0) / _carino(np.array([total_p]), np.array([total_b]))[0]
+    return pd.Series(linked, index=effects.columns)
+
+
+def _carino(rp: np.ndarray, rb: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = (np.log1p(rp) - np.log1p(rb)) / (rp - rb)
+    return np.where(np.isclose(rp, rb), 1 / (1 + rp), k)
+
+
+def rolling_betas(returns: pd.Series, factors: pd.DataFrame, window: int = 252) -> pd.DataFrame:
+    """
+    Rolling regressions of returns on factor returns (with an intercept). The window sums of x'x and x'y are taken
+    from running sums so every date costs the same whatever the window, all the windows are then solved at once.
+
+    :param returns: daily returns
+    :param factors: daily factor returns, dates x factors
+    :param window: number of days of every regression
+    :return: dates x (Alpha and factors), NaN before the first full window
+    """
+    factors = factors.reindex(returns.index).fillna(0.)
+    x = np.column_stack([np.ones(len(returns)), factors.values])
+    y = returns.fillna(0.).values
+
+    xx = np.cumsum(x[:, :, None] * x[:, None, :], axis=0)
+    xy = np.cumsum(x * y[:, None], axis=0)
+    xx[window:] = xx[window:] - xx[:-window]
+    xy[window:] = xy[window:] - xy[:-window]
+
+    betas = np.full(x.shape, np.nan)
+    if len(returns) >= window:
+        betas[window - 1:] = np.einsum('tij,tj->ti', np.linalg.pinv(xx[window - 1:]), xy[window - 1:])
+    return pd.DataFrame(betas, index=returns.index, columns=['Alpha'] + list(factors.columns))
+
+
+def factor_attribution(returns: pd.Series, factors: pd.DataFrame, window: int = 252) -> pd.DataFrame:
+    """
+    Daily contribution of every factor to the returns: the factor return times the exposure estimated by the rolling
+    regression up to the previous day. The Specific column is what the factors do not explain.
+
+    :param returns: daily returns
+    :param factors: daily factor returns, dates x factors
+    :param window: number of days of every regression
+    :return: dates x (factors and Specific), from the first day with a full window
+    """
+    betas = rolling_betas(returns=returns, factors=factors, window=window).shift(1)
+    exposures = betas.drop(columns='Alpha')
+    contributions = exposures * factors.reindex(returns.index).fillna(0.)
+    contributions['Specific'] = returns - contributions.sum(axis=1)
+    return contributions.loc[exposures.notna().all(axis=1)]
+
+
+def index_benchmark(index: Index, start_date: datetime = None, end_date: datetime = None, currency: str = 'USD',
+                    weights: pd.Series = None) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, str]]:
+    """
+    Benchmark made of the constituents of an index, grouped by sector
+
+    :param index: Index
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :param currency: currency of the portfolio, the constituent prices are converted from USD
+    :param weights: weight of every constituent (ex. market caps), equal weights if None
+    :return: weights (dates x tickers), returns (dates x tickers), sector by ticker
+    """
+    datareader = pyportlib.create.datareader()
+    prices = pd.DataFrame({ticker: datareader.read_prices(ticker=ticker) for ticker in index.constituents})
+    if currency.upper() != 'USD':
+        fx = datareader.read_fx(currency_pair=f"USD{currency.upper()}")
+        prices = prices.multiply(fx.reindex(prices.index, method='ffill'), axis=0)
+    returns = prices.sort_index().ffill().pct_change().loc[start_date:end_date].fillna(0.)
+
+    if weights is None:
+        weights = pd.Series(1., index=returns.columns)
+    listed = prices.reindex(returns.index).notna()
+    benchmark_weights = listed.astype(float).multiply(weights.reindex(returns.columns).fillna(0.), axis=1)
+    benchmark_weights = benchmark_weights.divide(benchmark_weights.sum(axis=1), axis=0).fillna(0.)
+
+    groups = dict(zip(index.index_info['Ticker'], index.index_info['Sector']))
+    return benchmark_weights, returns, groups
+
+
+def brinson_by_period(ptf: IPortfolio, benchmark_weights: Union[pd.DataFrame, pd.Series],
+                      benchmark_returns: pd.DataFrame, groups: Dict[str, str] = None, start_date: datetime = None,
+                      end_date: datetime = None, freq: str = 'M', cache: bool = True) -> pd.DataFrame:
+    """
+    Brinson attribution of every period (ex. month), linked over the days of the period. Closed periods are cached
+    with the account, only the periods not in the cache and the current period are computed from the daily data.
+    Cached results are only reused with the same benchmark, groups and position prices.
+
+    :param ptf: Portfolio
+    :param benchmark_weights: benchmark weights, dates x tickers, or constant weights by ticker
+    :param benchmark_returns: benchmark returns, dates x tickers
+    :param groups: group of every ticker of the portfolio and of the benchmark, the position tags if None
+    :param start_date: start date, first transaction date if None
+    :param end_date: end date, last market value date if None
+    :param freq: pandas period frequency, M for monthly
+    :param cache: False to compute every period
+    :return: periods x (effect, group), with the Total columns Portfolio, Benchmark and Active
+    """
+    if groups is None:
+        groups = {ticker: position.tag for ticker, position in ptf.positions.items()}
+
+    def compute(start: datetime, end: datetime) -> Dict[str, pd.Series]:
+        weights, returns = weights_and_returns(ptf=ptf, start_date=start, end_date=end)
+        effects = brinson(weights=weights, returns=returns, benchmark_weights=benchmark_weights,
+                          benchmark_returns=benchmark_returns, groups=groups)
+        rp = (weights * returns).sum(axis=1)
+        rb = benchmark_return(benchmark_weights=benchmark_weights, benchmark_returns=benchmark_returns,
+                              dates=weights.index)
+        results = {}
+        for period, days in effects.groupby(effects.index.to_period(freq)):
+            linked = link(effects=days, portfolio_returns=rp, benchmark_returns=rb)
+            total_p, total_b = np.prod(1 + rp.loc[days.index]) - 1, np.prod(1 + rb.loc[days.index]) - 1
+            linked[('Total', 'Portfolio')] = total_p
+            linked[('Total', 'Benchmark')] = total_b
+            linked[('Total', 'Active')] = total_p - total_b
+            results[str(period)] = linked
+        return results
+
+    return _by_period(ptf=ptf, name="brinson", compute=compute, start_date=start_date, end_date=end_date, freq=freq,
+                      cache=cache, inputs=[benchmark_weights, benchmark_returns], params={'groups': groups})
+
+
+def factors_by_period(ptf: IPortfolio, factors: pd.DataFrame, window: int = 252, start_date: datetime = None,
+                      end_date: datetime = None, freq: str = 'M', cache: bool = True) -> pd.DataFrame:
+    """
+    Factor attribution of the portfolio returns (without cash) for every period (ex. month), linked over the days
+    of the period. The regressions need the window of days before the first period computed, closed periods are
+    cached with the account so a monthly report only computes the new month. Cached results are only reused with
+    the same factors, window and position prices.
+
+    :param ptf: Portfolio
+    :param factors: daily factor returns, dates x factors (ex. benchmark or ETF returns)
+    :param window: number of days of every regression
+    :param start_date: start date, first transaction date if None
+    :param end_date: end date, last market value date if None
+    :param freq: pandas period frequency, M for monthly
+    :param cache: False to compute every period
+    :return: periods x (factors, Specific and Total)
+    """
+    def compute(start: datetime, end: datetime) -> Dict[str, pd.Series]:
+        history_start = max(pd.Timestamp(start) - pd.tseries.offsets.BDay(window + 1), pd.Timestamp(ptf.start_date))
+        weights, returns = weights_and_returns(ptf=ptf, start_date=history_start, end_date=end)
+        rp = (weights * returns).sum(axis=1)
+        contributions = factor_attribution(returns=rp, factors=factors, window=window).loc[start:end]
+        results = {}
+        for period, days in contributions.groupby(contributions.index.to_period(freq)):
+            linked = link(effects=days, portfolio_returns=rp)
+            linked['Total'] = np.prod(1 + rp.loc[days.index]) - 1
+            results[str(period)] = linked
+        return results
+
+    return _by_period(ptf=ptf, name="factors", compute=compute, start_date=start_date, end_date=end_date, freq=freq,
+                      cache=cache, inputs=[factors], params={'window': window})
+
+
+def _by_period(ptf: IPortfolio, name: str, compute, start_date: datetime, end_date: datetime, freq: str, cache: bool,
+               inputs: List[Union[pd.DataFrame, pd.Series]], params: dict) -> pd.DataFrame:
+    if start_date is None:
+        start_date = ptf.start_date
+    if end_date is None:
+        end_date = ptf.market_value.index[-1]
+    last_date = ptf.market_value.index[-1]
+
+    periods = pd.period_range(start=start_date, end=end_date, freq=freq)
+    store, keys = None, {}
+    if cache:
+        prices = pd.DataFrame({ticker: position.prices for ticker, position in ptf.positions.items()})
+        inputs = [prices, ptf.transactions, ptf.cash_changes, *inputs]
+        store = AttributionCache(account=ptf.account, name=name, params={**params, 'freq': freq})
+        # every closed period is keyed on its own data, new days of data do not invalidate the past periods
+        keys = {str(period): store.key(end=period.end_time, inputs=inputs) for period in periods
+                if _closed(period, start_date=start_date, end_date=end_date, last_date=last_date)}
+    results = {}
+    missing = []
+    for period in periods:
+        cached = store.get(str(period), key=keys[str(period)]) if str(period) in keys else None
+        if cached is None:
+            missing.append(period)
+        else:
+            results[str(period)] = cached
+
+    if missing:
+        start = max(missing[0].start_time, pd.Timestamp(start_date))
+        end = min(missing[-1].end_time.normalize(), pd.Timestamp(end_date))
+        logger.logging.debug(f"{ptf.account}: computing {name} attribution from {start.date()} to {end.date()}")
+        computed = compute(start, end)
+        computed = {str(p): computed[str(p)] for p in missing if str(p) in computed}
+        results.update(computed)
+        if store is not None:
+            store.put({p: (keys[p], v) for p, v in computed.items() if p in keys})
+
+    if not results:
+        return pd.DataFrame()
+    return pd.DataFrame(results).T.loc[[str(p) for p in periods if str(p) in results]]
+
+
+def _closed(period: pd.Period, start_date: datetime, end_date: datetime, last_date: datetime) -> bool:
+    """
+    A period result is final when the period is over and was computed over all of its days
+    """
+    return (period.start_time >= pd.Timestamp(start_date)
+            and period.end_time.normalize() <= pd.Timestamp(end_date)
+            and period.end_time.normalize() < pd.Timestamp(last_date))
@@ -0,0 +1,72 @@
+from typing import List
+import numpy as np
+import pandas as pd
+
+
+class BacktestContext:
+    """
+    State of a running backtest as seen by a strategy. Arrays are in the order of the tickers, prices and values are
+    in the backtest currency.
+    """
+
+    def __init__(self, tickers: List[str], dates: pd.DatetimeIndex, prices: np.ndarray):
+        self.tickers = tickers
+        self.dates = dates
+        self._prices = prices
+        self._index = {ticker: i for i, ticker in enumerate(tickers)}
+        self.i = 0
+        self.holdings = np.zeros(len(tickers))
+        self.cash = 0.
+        self._orders = np.zeros(len(tickers))
+
+    def __repr__(self):
+        return f"BacktestContext - {self.dates[self.i].date()}"
+
+    @property
+    def date(self) -> pd.Timestamp:
+        return self.dates[self.i]
+
+    @property
+    def prices(self) -> np.ndarray:
+        """
+        Closing prices of the current date
+        """
+        return self._prices[self.i]
+
+    def history(self, lookback: int = None) -> np.ndarray:
+        """
+        Closing prices up to the current date, dates x tickers. No copy is made, do not modify it.
+
+        :param lookback: number of dates, all the dates if None
+        :return:
+        """
+        start = 0 if lookback is None else max(0, self.i + 1 - lookback)
+        return self._prices[start:self.i + 1]
+
+    @property
+    def market_value(self) -> float:
+        return float(np.dot(self.holdings, self.prices))
+
+    @property
+    def equity(self) -> float:
+        return self.market_value + self.cash
+
+    @property
+    def weights(self) -> np.ndarray:
+        equity = self.equity
+        return self.holdings * self.prices / equity if equity else np.zeros(len(self.tickers))
+
+    def order(self, ticker: str, quantity: float) -> None:
+        """
+        Places an order, it is filled at the close of the execution date
+
+        :param ticker: Stock ticker
+        :param quantity: positive to buy, negative to sell
+        :return: None
+        """
+        self._orders[self._index[ticker]] += quantity
+
+    def _pop_orders(self) -> np.ndarray:
+        orders = self._orders
+        self._orders = np.zeros(len(self.tickers))
+        return orders
@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Union
+import numpy as np
+import pandas as pd
+
+from pyportlib.backtest.context import BacktestContext
+from pyportlib.backtest.istrategy import IStrategy
+from pyportlib.backtest.result import BacktestResult
+from pyportlib.utils import logger
+
+
+class Backtest:
+    """
+    Daily backtest engine. Orders are filled at the close, holdings, cash and values are carried forward one day at a
+    time in numpy arrays, the price and fx data are aligned once when the engine is created and shared by every run.
+    """
+    _NAME = "Backtest"
+
+    def __init__(self, prices: pd.DataFrame, currency: str, currencies: Dict[str, str] = None,
+                 fx: pd.DataFrame = None, initial_cash: float = 100000., fee_per_trade: float = 0.,
+                 fee_rate: float = 0., lot_size: Union[int, Dict[str, int]] = 1, execution_lag: int = 1,
+                 allow_margin: bool = False):
+        """
+        :param prices: closing prices in the local currency of each ticker, dates x tickers
+        :param currency: currency of the backtest
+        :param currencies: local currency of each ticker, the backtest currency if None
+        :param fx: rate from the local currency of each ticker to the backtest currency, dates x tickers. 1 if None
+        :param initial_cash: cash at the start, in the backtest currency
+        :param fee_per_trade: fixed fee of every fill, in the local currency of the ticker
+        :param fee_rate: fee in % of the value of every fill
+        :param lot_size: fills are rounded down to a multiple of the lot size, for all or by ticker
+        :param execution_lag: number of days between the decision and the fill, 0 fills at the close of the decision
+        :param allow_margin: False to scale down buys that would make the cash negative
+        """
+        prices = prices.sort_index().ffill()
+        self.currency = currency.upper()
+        self.tickers = list(prices.columns)
+        self.dates = pd.DatetimeIndex(prices.index)
+        self.currencies = {ticker: (currencies or {}).get(ticker, self.currency) for ticker in self.tickers}
+        self.initial_cash = float(initial_cash)
+        self.fee_per_trade = float(fee_per_trade)
+        self.fee_rate = float(fee_rate)
+        self.execution_lag = execution_lag
+        self.allow_margin = allow_margin
+
+        self._local_prices = prices.values.astype(float)
+        if fx is None:
+            self._fx = np.ones_like(self._local_prices)
+        else:
+            self._fx = fx.reindex(index=self.dates, columns=self.tickers).ffill().bfill().fillna(1.).values.astype(float)
+        # tickers without a price yet (not listed) can not be traded, they are valued at 0
+        self._valid = ~np.isnan(self._local_prices)
+        self._local_prices = np.nan_to_num(self._local_prices)
+        self._prices = self._local_prices * self._fx
+        if isinstance(lot_size, dict):
+            self._lots = np.array([lot_size.get(ticker, 1) for ticker in self.tickers], dtype=float)
+        else:
+            self._lots = np.full(len(self.tickers), float(lot_size))
+
+    def __repr__(self):
+        return f"{self._NAME} - {len(self.tickers)} tickers - {len(self.dates)} days"
+
+    def run(self, strategy: IStrategy, name: str = None) -> BacktestResult:
+        """
+        Runs a strategy over all the dates
+
+        :param strategy: strategy deciding the trades
+        :param name: name of the result, the strategy repr if None
+        :return: BacktestResult
+        """
+        n_dates, n_tickers = self._prices.shape
+        holdings = np.zeros((n_dates, n_tickers))
+        cash = np.zeros(n_dates)
+        fees = np.zeros((n_dates, n_tickers))
+        fills = []
+        pending = {}
+
+        context = BacktestContext(tickers=self.tickers, dates=self.dates, prices=self._prices)
+        context.cash = self.initial_cash
+
+        for i in range(n_dates):
+            context.i = i
+            orders = pending.pop(i, None)
+            if orders is not None:
+                self._execute(i=i, orders=orders, context=context, fees=fees, fills=fills, valid=self._valid[i])
+
+            target = strategy.on_day(date=self.dates[i], context=context)
+            orders = context._pop_orders()
+            if target is not None:
+                # orders waiting for their fill already count towards the target
+                held = context.holdings + sum(pending.values())
+                orders = orders + self._target_orders(target=target, context=context, held=held,
+                                                      valid=self._valid[i])
+            if np.any(orders != 0):
+                if self.execution_lag == 0:
+                    self._execute(i=i, orders=orders, context=context, fees=fees, fills=fills, valid=self._valid[i])
+                elif i + self.execution_lag < n_dates:
+                    day = i + self.execution_lag
+                    pending[day] = pending.get(day, 0) + orders
+
+            holdings[i] = context.holdings
+            cash[i] = context.cash
+
+        return BacktestResult(name=name if name is not None else repr(strategy),
+                              currency=self.currency,
+                              dates=self.dates,
+                              tickers=self.tickers,
+                              currencies=self.currencies,
+                              prices=self._prices,
+                              holdings=holdings,
+                              cash=cash,
+                              fees=fees,
+                              fills=fills)
+
+    def run_many(self, strategies: List[IStrategy], processes: int = None) -> List[BacktestResult]:
+        """
+        Runs many strategies (ex. a parameter sweep) in a process pool. The engine is inherited by the workers,
+        only the strategies and the results are sent between processes.
+
+        :param strategies: strategies to run, they must be picklable
+        :param processes: number of worker processes, number of cpus if None
+        :return: results in the same order as strategies
+        """
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(self,)) as executor:
+            return list(executor.map(_run_strategy, strategies, chunksize=max(1, len(strategies) // 64)))
+
+    def _target_orders(self, target, context: BacktestContext, held: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        if isinstance(target, dict):
+            weights = np.array([target.get(ticker, 0.) for ticker in self.tickers], dtype=float)
+        elif isinstance(target, pd.Series):
+            weights = target.reindex(self.tickers).fillna(0.).values.astype(float)
+        else:
+            weights = np.asarray(target, dtype=float)
+
+        prices = np.where(valid, context.prices, np.nan)
+        target_qty = np.trunc(np.nan_to_num(weights * context.equity / prices) / self._lots) * self._lots
+        orders = np.where(valid, target_qty - held, 0.)
+        return orders
+
+    def _execute(self, i: int, orders: np.ndarray, context: BacktestContext, fees: np.ndarray, fills: list,
+                 valid: np.ndarray) -> None:
+        orders = np.where(valid, np.trunc(orders / self._lots) * self._lots, 0.)
+        if not np.any(orders):
+            return
+        prices = self._prices[i]
+
+        trade_fees = self._fees(orders=orders, i=i)
+        cost = orders * prices + trade_fees * self._fx[i]
+        if not self.allow_margin and context.cash - cost.sum() < 0:
+            buys = orders > 0
+            available = context.cash - cost[~buys].sum()
+            scale = max(available, 0.) / cost[buys].sum() if cost[buys].sum() > 0 else 0.
+            orders[buys] = np.floor(orders[buys] * scale / self._lots[buys]) * self._lots[buys]
+            trade_fees = self._fees(orders=orders, i=i)
+            cost = orders * prices + trade_fees * self._fx[i]
+            logger.logging.debug(f"{self.dates[i].date()} buys scaled down by {scale:.4f}, not enough cash")
+
+        context.holdings = context.holdings + orders
+        context.cash -= cost.sum()
+        fees[i] += trade_fees * self._fx[i]
+        for j in np.flatnonzero(orders):
+            fills.append((i, j, orders[j], self._local_prices[i, j], trade_fees[j]))
+
+    def _fees(self, orders: np.ndarray, i: int) -> np.ndarray:
+        traded = orders != 0
+        return np.where(traded, self.fee_per_trade + self.fee_rate * np.abs(orders) * self._local_prices[i], 0.)
+
+
+_worker_backtest: Backtest = None
+
+
+def _init_worker(backtest: Backtest) -> None:
+    global _worker_backtest
+    _worker_backtest = backtest
+
+
+def _run_strategy(strategy: IStrategy) -> BacktestResult:
+    return _worker_backtest.run(strategy=strategy)
@@ -0,0 +1,22 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Union, Dict
+import numpy as np
+import pandas as pd
+
+
+class IStrategy(ABC):
+    """
+    Strategy run by the backtest engine. Every day it either returns target weights or places orders on the context.
+    """
+
+    @abstractmethod
+    def on_day(self, date: datetime, context) -> Union[Dict[str, float], pd.Series, np.ndarray, None]:
+        """
+        Called after the close of every day of the backtest
+
+        :param date: current date
+        :param context: BacktestContext with the prices up to the date, the holdings and the cash
+        :return: target weights of the equity by ticker (array in the order of context.tickers), or None to only
+        execute the orders placed with context.order
+        """
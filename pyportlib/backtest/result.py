@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+from pyportlib.services.transaction import Transaction
+from pyportlib.utils.time_series import ITimeSeries
+
+
+class BacktestResult(ITimeSeries):
+    """
+    Holdings, cash and fills of a backtest run. Exposes the same series as a Portfolio (market_value, cash_history,
+    transactions, daily_total_pnl, pct_daily_total_pnl) and implements ITimeSeries so it can be used with stats and
+    plots.
+    """
+
+    def __init__(self, name: str, currency: str, dates: pd.DatetimeIndex, tickers: List[str],
+                 currencies: Dict[str, str], prices: np.ndarray, holdings: np.ndarray, cash: np.ndarray,
+                 fees: np.ndarray, fills: List[Tuple[int, int, float, float, float]]):
+        self.account = name
+        self.currency = currency
+        self.dates = dates
+        self.tickers = tickers
+        self.currencies = currencies
+        self._prices = prices
+        self._holdings = holdings
+        self._cash = cash
+        self._fees = fees
+        self._fills = fills
+
+    def __repr__(self):
+        return self.account
+
+    @property
+    def holdings(self) -> pd.DataFrame:
+        """
+        Quantities held at the close of every date, dates x tickers
+        """
+        return pd.DataFrame(self._holdings, index=self.dates, columns=self.tickers)
+
+    @property
+    def market_value(self) -> pd.Series:
+        return pd.Series((self._holdings * self._prices).sum(axis=1), index=self.dates)
+
+    @property
+    def cash_history(self) -> pd.Series:
+        return pd.Series(self._cash, index=self.dates)
+
+    @property
+    def equity(self) -> pd.Series:
+        return self.market_value + self.cash_history
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        """
+        Fills with the columns of the transactions of a Portfolio
+        """
+        rows = [[self.dates[i], self.tickers[j], 'Buy' if qty > 0 else 'Sell', qty, price, fee,
+                 self.currencies[self.tickers[j]]] for i, j, qty, price, fee in self._fills]
+        return pd.DataFrame(rows, columns=Transaction.INFO).set_index('Date')
+
+    def to_transactions(self) -> List[Transaction]:
+        """
+        Fills as Transaction objects, ready to be added to a Portfolio
+        """
+        return [Transaction(date=self.dates[i].to_pydatetime(), ticker=self.tickers[j],
+                            transaction_type='Buy' if qty > 0 else 'Sell', quantity=qty, price=price, fees=fee,
+                            currency=self.currencies[self.tickers[j]]) for i, j, qty, price, fee in self._fills]
+
+    @property
+    def total_fees(self) -> float:
+        return float(self._fees.sum())
+
+    def daily_total_pnl(self, start_date: datetime = None, end_date: datetime = None) -> pd.DataFrame:
+        """
+        Return per position in $ amount, price change on the quantities held at the previous close less the fees
+
+        :param start_date: start date of series, first date if None
+        :param end_date: end date of series, last date if None
+        :return:
+        """
+        pnl = np.zeros_like(self._prices)
+        pnl[1:] = self._holdings[:-1] * np.diff(self._prices, axis=0)
+        pnl -= self._fees
+        return pd.DataFrame(pnl, index=self.dates, columns=self.tickers).loc[start_date:end_date]
+
+    def pct_daily_total_pnl(self, start_date: datetime = None, end_date: datetime = None,
+                            include_cash: bool = True) -> pd.Series:
+        """
+        Return in % of the value at the previous close
+
+        :param start_date: start date of series, first date if None
+        :param end_date: end date of series, last date if None
+        :param include_cash: True for the return of the whole account, False for the return of the invested value
+        :return:
+        """
+        values = self.equity if include_cash else self.market_value
+        pnl = self.daily_total_pnl().sum(axis=1).divide(values.shift(1))
+        pnl = pnl.replace([np.inf, -np.inf], np.nan).fillna(0)
+        pnl.name = self.account
+        return pnl.loc[start_date:end_date]
+
+    def position_weights(self, date: datetime = None) -> pd.Series:
+        """
+        Position weights in % of the market value
+        """
+        i = -1 if date is None else self.dates.get_indexer([pd.Timestamp(date)], method='ffill')[0]
+        values = self._holdings[i] * self._prices[i]
+        weights = pd.Series(values / values.sum() if values.sum() else values, index=self.tickers)
+        weights = weights.loc[weights.round(8) != 0]
+        weights.name = 'Position Allocations'
+        return weights
+
+    def returns(self, start_date: datetime, end_date: datetime, **kwargs):
+        """
+        Implementation of the returns method of the ITimeSeries
+
+        :param start_date: datetime
+        :param end_date: datetime
+        :param kwargs: include_cash, True by default
+        :return:
+        """
+        include_cash = kwargs.get("include_cash") if kwargs.get("include_cash") is not None else True
+        return self.pct_daily_total_pnl(start_date=start_date, end_date=end_date, include_cash=include_cash)
@@ -0,0 +1,7 @@
+from dependency_injector import providers, containers
+
+from pyportlib.backtest.engine import Backtest
+
+
+class BacktestContainer(containers.DeclarativeContainer):
+    backtest = providers.Factory(Backtest)
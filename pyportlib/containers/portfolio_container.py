@@ -1,7 +1,11 @@
 from dependency_injector import providers, containers
 
+from pyportlib.portfolio.composite_portfolio import CompositePortfolio
+from pyportlib.portfolio.live_valuation import LiveValuation
 from pyportlib.portfolio.portfolio import Portfolio
 
 
 class PortfolioContainer(containers.DeclarativeContainer):
     ptf = providers.Factory(Portfolio)
+    composite = providers.Factory(CompositePortfolio)
+    live = providers.Factory(LiveValuation)
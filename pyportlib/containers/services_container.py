@@ -4,6 +4,7 @@ from pyportlib.services.transaction import Transaction
 from pyportlib.services.cash_change import CashChange
 from pyportlib.services.cash_manager import CashManager
 from pyportlib.services.fx_rates import FxRates
+from pyportlib.services.portfolio_snapshot import PortfolioSnapshot
 from pyportlib.services.transaction_manager import TransactionManager
 
 
@@ -13,4 +14,5 @@ class ServicesContainer(containers.DeclarativeContainer):
     transaction_manager = providers.Factory(TransactionManager)
     cash_manager = providers.Factory(CashManager)
     fx = providers.Factory(FxRates)
+    snapshot = providers.Factory(PortfolioSnapshot)
 
@@ -1,50 +1,232 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from typing import Dict, List
+import pandas as pd
 
+from pyportlib.containers.backtest_container import BacktestContainer
 from pyportlib.containers.services_container import ServicesContainer
 from pyportlib.containers.datareader_container import DataReaderContainer
-from pyportlib.containers.portfolio_container import PortfolioContainer
 from pyportlib.containers.position_container import PositionContainer
+from pyportlib.data_connections.interfaces.iquote_source import IQuoteSource
 from pyportlib.position.iposition import IPosition
-from pyportlib.utils import config_utils
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import config_utils, logger
 
 _data_source_config = config_utils.data_source_config()
 
-_ptf_container = PortfolioContainer()
+_ptf_container = None
 _position_container = PositionContainer()
 _services_container = ServicesContainer()
 _datareader_container = DataReaderContainer(config=_data_source_config)
-
-
-def portfolio(account: str, currency: str):
+_backtest_container = BacktestContainer()
+
+
+def _portfolio_container():
+    # the portfolio modules import this module, their container is only built when a portfolio is first created
+    global _ptf_container
+    if _ptf_container is None:
+        from pyportlib.containers.portfolio_container import PortfolioContainer
+        _ptf_container = PortfolioContainer()
+    return _ptf_container
+
+
+def portfolio(account: str, currency: str, use_snapshot: bool = False, compact: bool = False):
+    """
+    :param account: account name
+    :param currency: currency of the portfolio
+    :param use_snapshot: True to build the portfolio from its snapshot when possible
+    :param compact: True for the compact memory mode: categorical transaction columns and float32 prices
+    :return:
+    """
     datareader = _datareader_container.datareader()
 
     cash_manager = _services_container.cash_manager(account=account)
-    transaction_manager = _services_container.transaction_manager(account=account)
+    transaction_manager = _services_container.transaction_manager(account=account, compact=compact)
 
     required_currencies = transaction_manager.get_currencies()
     fx = _services_container.fx(ptf_currency=currency, currencies=required_currencies, datareader=datareader)
+    snapshot = _services_container.snapshot(account=account, datareader=datareader) if use_snapshot else None
 
-    ptf = _ptf_container.ptf(account=account,
-                             currency=currency,
-                             cash_manager=cash_manager,
-                             transaction_manager=transaction_manager,
-                             fx=fx,
-                             datareader=datareader)
+    ptf = _portfolio_container().ptf(account=account,
+                                     currency=currency,
+                                     cash_manager=cash_manager,
+                                     transaction_manager=transaction_manager,
+                                     fx=fx,
+                                     datareader=datareader,
+                                     snapshot=snapshot,
+                                     compact=compact)
 
     return ptf
 
 
-def position(ticker: str, local_currency: str = None, tag: str = None) -> IPosition:
+def portfolios(accounts: List[str], currency: str, processes: int = None, load: bool = True) -> list:
+    """
+    Builds many portfolios in a process pool. The missing market data is fetched in this process first, the workers
+    only read it and never write the shared data manifests. Every worker saves its portfolio snapshot, the snapshots
+    are then memory-mapped back in this process instead of pickling the price data between processes.
+
+    :param accounts: accounts to build
+    :param currency: currency of the portfolios
+    :param processes: number of worker processes, number of cpus if None
+    :param load: True to return the Portfolio objects, False to return their PortfolioSnapshot
+    :return: list in the same order as accounts, accounts that failed to build are omitted
+    """
+    datareader = _datareader_container.datareader()
+    _fetch_missing_data(accounts=accounts, currency=currency)
+
+    built = set()
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+        futures = {executor.submit(_build_snapshot, account, currency): account for account in accounts}
+        for future in as_completed(futures):
+            try:
+                built.add(future.result())
+            except Exception as ex:
+                logger.logging.error(f"{futures[future]} portfolio not built: {ex}")
+
+    accounts = [account for account in accounts if account in built]
+    if not load:
+        return [_services_container.snapshot(account=account, datareader=datareader) for account in accounts]
+    return [portfolio(account=account, currency=currency, use_snapshot=True) for account in accounts]
+
+
+def _init_worker() -> None:
+    _datareader_container.datareader().set_read_only()
+
+
+def _build_snapshot(account: str, currency: str) -> str:
+    portfolio(account=account, currency=currency, use_snapshot=True)
+    return account
+
+
+def _fetch_missing_data(accounts: List[str], currency: str) -> None:
+    """
+    Fetches missing price and fx files before the workers start, the workers only read them
+    """
+    datareader = _datareader_container.datareader()
+    tickers, currencies = set(), {currency}
+    for account in accounts:
+        transaction_manager = _services_container.transaction_manager(account=account)
+        tickers.update(transaction_manager.all_tickers())
+        currencies.update(transaction_manager.get_currencies())
+
+    for ticker in tickers:
+        if not datareader.has_prices(ticker=ticker):
+            datareader.update_prices(ticker=ticker)
+    for curr in currencies:
+        pair = f"{curr}{currency}"
+        if not datareader.has_fx(currency_pair=pair):
+            datareader.update_fx(currency_pair=pair)
+
+
+def composite_portfolio(accounts: List[str], currency: str, name: str = None, use_snapshot: bool = False,
+                        compact: bool = False):
+    """
+    Consolidated portfolio of many accounts. All the accounts share the same data reader and fx rates.
+
+    :param accounts: accounts to consolidate
+    :param currency: currency of the consolidated portfolio, also used for every account
+    :param name: name of the consolidated portfolio, accounts joined by '+' if None
+    :param use_snapshot: True to build the accounts from their snapshots when possible
+    :param compact: True for the compact memory mode: categorical transaction columns and float32 prices
+    :return:
+    """
+    datareader = _datareader_container.datareader()
+
+    transaction_managers = {account: _services_container.transaction_manager(account=account, compact=compact)
+                            for account in accounts}
+    required_currencies = set().union(*[trx.get_currencies() for trx in transaction_managers.values()])
+    fx = _services_container.fx(ptf_currency=currency, currencies=required_currencies, datareader=datareader)
+
+    portfolios = []
+    for account in accounts:
+        snapshot = _services_container.snapshot(account=account, datareader=datareader) if use_snapshot else None
+        portfolios.append(_portfolio_container().ptf(account=account,
+                                                     currency=currency,
+                                                     cash_manager=_services_container.cash_manager(account=account),
+                                                     transaction_manager=transaction_managers[account],
+                                                     fx=fx,
+                                                     datareader=datareader,
+                                                     snapshot=snapshot,
+                                                     compact=compact))
+
+    ptf = _portfolio_container().composite(account=name if name else "+".join(accounts),
+                                           currency=currency,
+                                           portfolios=portfolios,
+                                           datareader=datareader,
+                                           fx=fx)
+    return ptf
+
+
+def live_valuation(ptf, quote_source: IQuoteSource = None, buffer_size: int = 1024):
+    """
+    Intraday valuation of the open positions of a portfolio
+
+    :param ptf: Portfolio to value
+    :param quote_source: source of the live quotes, Questrade if None
+    :param buffer_size: number of quotes kept per position
+    :return:
+    """
+    if quote_source is None:
+        from pyportlib.account_sources.questrade_quote_source import QuestradeQuoteSource
+        quote_source = QuestradeQuoteSource()
+
+    return _portfolio_container().live(portfolio=ptf,
+                                       quote_source=quote_source,
+                                       datareader=_datareader_container.datareader(),
+                                       buffer_size=buffer_size)
+
+
+def backtest(tickers: List[str], currency: str, start_date: datetime = None, end_date: datetime = None,
+             currencies: Dict[str, str] = None, **kwargs):
+    """
+    Backtest engine on the locally saved prices and fx rates of tickers
+
+    :param tickers: Stock tickers
+    :param currency: currency of the backtest
+    :param start_date: first date, first common price date if None
+    :param end_date: last date, last price date if None
+    :param currencies: local currency of the tickers, guessed from the ticker if None (CAD for .TO, else USD)
+    :param kwargs: Backtest arguments (initial_cash, fee_per_trade, fee_rate, lot_size, execution_lag, allow_margin)
+    :return:
+    """
+    positions = {ticker: position(ticker, local_currency=(currencies or {}).get(ticker)) for ticker in tickers}
+    prices = pd.DataFrame({ticker: pos.prices for ticker, pos in positions.items()}).sort_index()
+    if start_date is None:
+        start_date = max(pos.prices.index.min() for pos in positions.values())
+    prices = prices.loc[start_date:end_date]
+
+    datareader = _datareader_container.datareader()
+    currency = currency.upper()
+    fx = pd.DataFrame({ticker: datareader.read_fx(currency_pair=f"{pos.currency}{currency}")
+                       for ticker, pos in positions.items()})
+    fx = fx.reindex(fx.index.union(prices.index)).sort_index().ffill().reindex(prices.index)
+
+    return _backtest_container.backtest(prices=prices,
+                                        currency=currency,
+                                        currencies={ticker: pos.currency for ticker, pos in positions.items()},
+                                        fx=fx,
+                                        **kwargs)
+
+
+def position(ticker: str, local_currency: str = None, tag: str = None, prices: pd.Series = None,
+             compact: bool = False, local_prices: pd.Series = None) -> IPosition:
     datareader = _datareader_container.datareader()
 
     pos = _position_container.position(ticker=ticker,
                                             local_currency=local_currency,
                                             tag=tag,
-                                            datareader=datareader)
+                                            datareader=datareader,
+                                            prices=prices,
+                                            compact=compact,
+                                            local_prices=local_prices)
 
     return pos
 
 
+def datareader() -> DataReader:
+    return _datareader_container.datareader()
+
+
 def transaction(date: datetime,
                 ticker: str,
                 transaction_type: str,
@@ -1,3 +0,0 @@
-from pyportlib.utils import files_utils
-
-files_utils.set_client_dir()
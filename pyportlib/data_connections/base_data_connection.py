@@ -16,6 +16,10 @@ class BaseDataConnection(IMarketDataSource, IStatementsDataSource):
     _NAME: str
     _URL: str
 
+    @property
+    def name(self):
+        return self._NAME
+
     @property
     def data_dir(self):
         return self._DATA_DIRECTORY
@@ -0,0 +1,12 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+
+class IQuoteSource(ABC):
+
+    @abstractmethod
+    def get_quotes(self, tickers: List[str]) -> Dict[str, Tuple[datetime, float]]:
+        """
+        Last trade time and price of every ticker, tickers without a quote are omitted
+        """
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from pyportlib.data_connections.interfaces.iquote_source import IQuoteSource
+
+
+class StaticQuoteSource(IQuoteSource):
+    """
+    Local quote source returning prices set by hand, used outside of market hours and in tests
+    """
+    _NAME = "Static Quotes"
+
+    def __init__(self, prices: Dict[str, float] = None):
+        self._prices = {k.upper(): float(v) for k, v in (prices or {}).items()}
+
+    def __repr__(self):
+        return self._NAME
+
+    def set_price(self, ticker: str, price: float) -> None:
+        self._prices[ticker.upper()] = float(price)
+
+    def get_quotes(self, tickers: List[str]) -> Dict[str, Tuple[datetime, float]]:
+        now = datetime.now()
+        return {ticker: (now, self._prices[ticker]) for ticker in tickers if ticker in self._prices}
@@ -1,17 +1,28 @@
 import pandas as pd
-from pandas_datareader import data as pdr
-import yfinance as yfin
-import yahoo_fin.stock_info as yf
 
 from pyportlib.data_connections.base_data_connection import BaseDataConnection
 from pyportlib.utils import logger
 
+_pdr = None
+
+
+def _datareader():
+    """
+    pandas_datareader with the yfinance override, imported and overridden on the first download only
+    """
+    global _pdr
+    if _pdr is None:
+        from pandas_datareader import data as pdr
+        import yfinance as yfin
+        yfin.pdr_override()
+        _pdr = pdr
+    return _pdr
+
 
 class YahooConnection(BaseDataConnection):
     _FILE_PREFIX = 'yfin'
     _NAME = 'Yahoo'
     _URL = ''
-    yfin.pdr_override()
 
     def __repr__(self):
         return f"{self._NAME} API Connection"
@@ -31,11 +42,11 @@ class YahooConnection(BaseDataConnection):
         directory = self.prices_dir
         ticker = self._convert_ticker(ticker)
         try:
-            data = pdr.get_data_yahoo(ticker, progress=False)
+            data = _datareader().get_data_yahoo(ticker, progress=False)
         except ValueError:
             logger.logging.error(f"yahoo api error for {ticker}, trying again")
             try:
-                data = pdr.get_data_yahoo(ticker, progress=False)
+                data = _datareader().get_data_yahoo(ticker, progress=False)
             except ValueError:
                 logger.logging.error(f"yahoo api error, no data")
                 return
@@ -57,7 +68,7 @@ class YahooConnection(BaseDataConnection):
         if currency_pair[:3] == currency_pair[-3:]:
             data = self._make_ptf_currency_df()
         else:
-            data = pdr.get_data_yahoo(f'{currency_pair}=X', progress=False)
+            data = _datareader().get_data_yahoo(f'{currency_pair}=X', progress=False)
             data.columns = [col.replace(' ', '') for col in data.columns]
 
         data.to_csv(f"{directory}/{filename}")
@@ -72,6 +83,7 @@ class YahooConnection(BaseDataConnection):
         filename = f"{self.file_prefix}_{ticker.replace('.TO', '_TO')}_balance_sheet.csv"
         directory = self.statement_dir
         ticker = self._convert_ticker(ticker)
+        import yahoo_fin.stock_info as yf
         try:
             bs = yf.get_balance_sheet(ticker)
         except KeyError:
@@ -88,6 +100,7 @@ class YahooConnection(BaseDataConnection):
         filename = f"{self.file_prefix}_{ticker.replace('.TO', '_TO')}_cash_flow.csv"
         directory = self.statement_dir
         ticker = self._convert_ticker(ticker)
+        import yahoo_fin.stock_info as yf
 
         try:
             cf = yf.get_cash_flow(ticker)
@@ -105,6 +118,7 @@ class YahooConnection(BaseDataConnection):
         filename = f"{self.file_prefix}_{ticker.replace('.TO', '_TO')}_income_statement.csv"
         directory = self.statement_dir
         ticker = self._convert_ticker(ticker)
+        import yahoo_fin.stock_info as yf
 
         try:
             bs = yf.get_cash_flow(ticker)
@@ -124,6 +138,7 @@ class YahooConnection(BaseDataConnection):
         filename = f"{self.file_prefix}_{ticker.replace('.TO', '_TO')}_dividends.csv"
         directory = self.statement_dir
         ticker = self._convert_ticker(ticker)
+        import yahoo_fin.stock_info as yf
         divs = yf.get_dividends(ticker, start_date=start_date, end_date=end_date, index_as_date=False)
         if divs.empty:
             divs.to_csv(f"{directory}/{filename}")
@@ -140,6 +155,7 @@ class YahooConnection(BaseDataConnection):
         :return:
         """
         ticker = self._convert_ticker(ticker)
+        import yfinance as yfin
         splits = yfin.Ticker(ticker=ticker).get_splits()
         return splits
 
@@ -1,3 +1,405 @@
-# TODO speed up updating data at position/ptf level
-# TODO speed up ptf creating and build/compute
-# TODO clean up unused functionalities
+"""
+Command line batch runner for the nightly jobs of the accounts saved in the accounts directory
+
+    pyportlib refresh --accounts tfsa:CAD margin:USD --workers 8
+    pyportlib run --questrade tfsa=TFSA --benchmark SPY --at 18:30
+
+Jobs are sync (Questrade transactions and cash changes), refresh (market data), build (portfolio snapshots) and
+report (quantstats html reports), run does all of them in that order. Every job of every account is written as one
+json line in the jobs log. Refresh and report are skipped for an account when their inputs did not change since
+their last success, build loads the portfolio snapshot when nothing changed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple, Union
+
+import pandas as pd
+
+from pyportlib.utils import files_utils, logger
+
+EXIT_OK = 0
+EXIT_JOB_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_ACCOUNTS = 3
+
+JOBS = ["sync", "refresh", "build", "report"]
+STATE_FILENAME = "jobs_state.json"
+LOG_FILENAME = "jobs_log.jsonl"
+_ACCOUNT_FILES = ["transactions.csv", "cash.csv", "position_tags.json"]
+
+
+def list_accounts() -> List[str]:
+    """
+    Accounts saved in the accounts directory
+
+    :return: account names
+    """
+    directory = files_utils.get_accounts_dir()
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.isfile(f"{directory}{name}/transactions.csv"))
+
+
+def account_currencies(specs: List[str] = None, currency: str = "CAD") -> Dict[str, str]:
+    """
+    Portfolio currency by account from ACCOUNT or ACCOUNT:CURRENCY specs
+
+    :param specs: account specs, every account of the accounts directory if None
+    :param currency: currency of the accounts given without one
+    :return:
+    """
+    if not specs:
+        return {account: currency for account in list_accounts()}
+    accounts = {}
+    for spec in specs:
+        account, _, account_currency = spec.partition(':')
+        accounts[account] = account_currency.upper() or currency
+    return accounts
+
+
+class JobState:
+    """
+    Fingerprint of the inputs of the last successful run of every job and account, saved in the outputs directory
+    """
+    def __init__(self, path: str = None):
+        self.path = path or f"{files_utils.get_outputs_dir()}{STATE_FILENAME}"
+        self._state = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    self._state = json.load(f)
+            except (IOError, ValueError) as ex:
+                logger.logging.error(f'unable to read jobs state {self.path}: {ex}')
+
+    def unchanged(self, job: str, account: str, fingerprint: str) -> bool:
+        return self._state.get(f"{job}|{account}") == fingerprint
+
+    def record(self, job: str, account: str, fingerprint: str) -> None:
+        self._state[f"{job}|{account}"] = fingerprint
+
+    def save(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class JobLog:
+    """
+    Structured timing log, one json line by job and account
+    """
+    def __init__(self, path: str = None):
+        self.path = path or f"{files_utils.get_outputs_dir()}{LOG_FILENAME}"
+        self.run_id = uuid.uuid4().hex[:12]
+
+    def write(self, **record) -> None:
+        record = {"run": self.run_id, "time": datetime.now().isoformat(timespec='seconds'), **record}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+
+class Runner:
+    """
+    Runs the jobs of many accounts. Portfolios are built once and shared by the jobs of a run.
+    """
+    def __init__(self, accounts: Dict[str, str], workers: int = 4, force: bool = False, fundamentals: bool = False,
+                 benchmark: str = "SPY", questrade: Dict[str, str] = None, state: JobState = None,
+                 log: JobLog = None):
+        """
+        :param accounts: portfolio currency by account
+        :param workers: number of threads of the refresh downloads and of the build and report jobs
+        :param force: True to run the jobs even if their inputs did not change
+        :param fundamentals: True to also refresh the statements and dividends
+        :param benchmark: ticker of the reports benchmark
+        :param questrade: Questrade account type by account (ex. TFSA), only these accounts are synced
+        :param state: jobs state
+        :param log: jobs log
+        """
+        self.accounts = accounts
+        self.workers = max(1, workers)
+        self.force = force
+        self.fundamentals = fundamentals
+        self.benchmark = benchmark
+        self.questrade = questrade or {}
+        self.state = state or JobState()
+        self.log = log or JobLog()
+        self._portfolios = {}
+
+    def run(self, jobs: List[str]) -> int:
+        """
+        Runs the jobs in the order of JOBS
+
+        :param jobs: jobs to run
+        :return: exit code, EXIT_JOB_FAILED if a job failed for any account
+        """
+        from pyportlib import create
+        from pyportlib.reporting import html_reports
+        # the shared data reader is created before the jobs start their threads
+        create.datareader()
+        # the benchmark returns kept by the reports of the last run may be stale
+        html_reports.clear_benchmarks()
+
+        start = time.perf_counter()
+        statuses = []
+        for job in [job for job in JOBS if job in jobs]:
+            statuses += getattr(self, job)()
+            self.state.save()
+        failed = statuses.count("failed")
+        self.log.write(job="run", account=None, status="failed" if failed else "ok",
+                       seconds=round(time.perf_counter() - start, 3), jobs=jobs, failed=failed,
+                       skipped=statuses.count("skipped"))
+        return EXIT_JOB_FAILED if failed else EXIT_OK
+
+    def sync(self) -> List[str]:
+        from pyportlib.account_sources.questrade_connection import QuestradeConnection
+
+        def sync_account(account: str) -> str:
+            if account not in self.questrade:
+                return "skipped"
+            connection = QuestradeConnection(account_name=self.questrade[account])
+            connection.account_id = connection.select_account(select=self.questrade[account].upper())
+            connection.update_ptf(portfolio=self._portfolio(account))
+            return "ok"
+
+        # the Questrade token is shared by the accounts, they are synced one after the other
+        return [self._timed("sync", account, sync_account) for account in self.accounts]
+
+    def refresh(self) -> List[str]:
+        from pyportlib import create
+        from pyportlib.services import data_refresh
+        from pyportlib.services.refresh_planner import RefreshPlanner
+
+        last_market_day = self._last_market_day()
+        fingerprints = {account: self._account_hash(account, last_market_day, self.fundamentals)
+                        for account in self.accounts}
+        stale = [account for account in self.accounts
+                 if self.force or not self.state.unchanged("refresh", account, fingerprints[account])]
+        statuses = {account: "skipped" for account in self.accounts if account not in stale}
+        for account in statuses:
+            self.log.write(job="refresh", account=account, status="skipped", seconds=0.)
+
+        # positions and fx pairs held by many accounts are downloaded once, only when they are stale
+        tickers, errors = {}, {}
+        for account in stale:
+            status, errors[account], _ = self._call(self._portfolio, account)
+            if status == "failed":
+                continue
+            for ticker in self._portfolios[account].positions:
+                tickers.setdefault(ticker, set()).add(account)
+        # the reports benchmark is refreshed with the positions even if no account holds it
+        tickers.setdefault(self.benchmark, set())
+        _, pairs, closed = data_refresh.holdings([self._portfolios[account] for account in stale
+                                                  if account in self._portfolios])
+
+        start = time.perf_counter()
+        if self.force:
+            errors_by_key = data_refresh.download(datareader=create.datareader(), tickers=tickers, pairs=pairs,
+                                                  workers=self.workers, fundamentals_and_dividends=self.fundamentals)
+        else:
+            planner = RefreshPlanner(datareader=create.datareader())
+            errors_by_key = planner.refresh(tickers=tickers, pairs=pairs, closed=closed,
+                                            fundamentals_and_dividends=self.fundamentals, workers=self.workers)
+        seconds = round(time.perf_counter() - start, 3)
+
+        for account in stale:
+            held = [ticker for ticker, owners in tickers.items() if account in owners]
+            failed = [ticker for ticker in held if ticker in errors_by_key]
+            statuses[account] = "failed" if errors[account] or failed else "ok"
+            self.log.write(job="refresh", account=account, status=statuses[account], seconds=seconds,
+                           tickers=len(held), failed_tickers=failed, error=errors[account])
+            if statuses[account] == "ok":
+                self.state.record("refresh", account, fingerprints[account])
+        # portfolios are built again from the new data by the next jobs
+        self._portfolios = {}
+        return list(statuses.values())
+
+    def build(self) -> List[str]:
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda account: self._timed("build", account, self._portfolio), self.accounts))
+
+    def report(self) -> List[str]:
+        from pyportlib import create
+        from pyportlib.reporting import html_reports
+
+        fingerprints = {}
+        # the reports are made again when the benchmark prices change
+        benchmark_entry = create.datareader().catalog.entry(kind='prices', key=self.benchmark) or {}
+
+        def fingerprint(account: str) -> None:
+            ptf = self._portfolio(account)
+            fingerprints[account] = self._account_hash(account, self.benchmark, benchmark_entry.get('hash'),
+                                                       pd.util.hash_pandas_object(ptf.market_value).sum())
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = dict(zip(self.accounts, pool.map(lambda account: self._call(fingerprint, account),
+                                                       self.accounts)))
+        statuses = {}
+        for account, (status, error, _) in results.items():
+            if status == "failed":
+                statuses[account] = status
+                self.log.write(job="report", account=account, status=status, seconds=None, error=error)
+            elif not self.force and self.state.unchanged("report", account, fingerprints[account]) \
+                    and os.path.isfile(f"{html_reports.OUT_DIR}{account}.html"):
+                statuses[account] = "skipped"
+                self.log.write(job="report", account=account, status="skipped", seconds=0.)
+
+        stale = [account for account in self.accounts if account not in statuses]
+        start = time.perf_counter()
+        paths = html_reports.batch(ptfs=[self._portfolio(account) for account in stale], benchmark=self.benchmark,
+                                   names=stale, update=False, workers=self.workers) if stale else {}
+        seconds = round(time.perf_counter() - start, 3)
+        for account in stale:
+            statuses[account] = "ok" if account in paths else "failed"
+            self.log.write(job="report", account=account, status=statuses[account], seconds=seconds,
+                           path=paths.get(account))
+            if account in paths:
+                self.state.record("report", account, fingerprints[account])
+        return list(statuses.values())
+
+    def _portfolio(self, account: str):
+        if account not in self._portfolios:
+            from pyportlib import create
+            self._portfolios[account] = create.portfolio(account=account, currency=self.accounts[account],
+                                                         use_snapshot=True)
+        return self._portfolios[account]
+
+    def _timed(self, job: str, account: str, func: Callable) -> str:
+        status, error, seconds = self._call(func, account)
+        self.log.write(job=job, account=account, status=status, seconds=seconds, error=error)
+        return status
+
+    @staticmethod
+    def _call(func: Callable, arg: str) -> Tuple[str, Union[str, None], float]:
+        start = time.perf_counter()
+        error = None
+        try:
+            status = "skipped" if func(arg) == "skipped" else "ok"
+        except Exception as ex:
+            status, error = "failed", f"{type(ex).__name__}: {ex}"
+            logger.logging.error(f"{func.__name__} failed for {arg}: {error}")
+        return status, error, round(time.perf_counter() - start, 3)
+
+    @staticmethod
+    def _account_hash(account: str, *inputs) -> str:
+        digest = hashlib.sha1("|".join(str(i) for i in inputs).encode('utf-8'))
+        for filename in _ACCOUNT_FILES:
+            file = f"{files_utils.get_accounts_dir()}{account}/{filename}"
+            if os.path.isfile(file):
+                with open(file, 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _last_market_day() -> str:
+        from pyportlib.utils import dates_utils
+        days = dates_utils.get_market_days(start=datetime.today() - timedelta(days=10))
+        return str(days[-1].date()) if len(days) else str(datetime.today().date())
+
+
+def next_run(now: datetime, at: str = None, every: int = None, last: datetime = None) -> datetime:
+    """
+    Start of the next scheduled run
+
+    :param now: current time
+    :param at: daily start time HH:MM, the first run waits for it
+    :param every: minutes between the starts of the runs
+    :param last: start of the previous run, None for the first run
+    :return:
+    """
+    if last is not None and every:
+        return max(now, last + timedelta(minutes=every))
+    if at:
+        hour, minute = (int(x) for x in at.split(':'))
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return start if start >= now and (last is None or start > last) else start + timedelta(days=1)
+    return now
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pyportlib", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=JOBS + ["run"], help="job to run, run for all of them")
+    parser.add_argument("--accounts", nargs="*", metavar="ACCOUNT[:CURRENCY]",
+                        help="accounts to run, all the accounts of the accounts directory if not given")
+    parser.add_argument("--currency", default="CAD", help="portfolio currency of the accounts given without one")
+    parser.add_argument("--jobs", nargs="*", choices=JOBS, default=JOBS, help="jobs of the run command")
+    parser.add_argument("--workers", type=int, default=4, help="number of concurrent downloads, builds and reports")
+    parser.add_argument("--force", action="store_true", help="run the jobs even if their inputs did not change")
+    parser.add_argument("--fundamentals", action="store_true", help="also refresh statements and dividends")
+    parser.add_argument("--benchmark", default="SPY", help="benchmark ticker of the reports")
+    parser.add_argument("--questrade", nargs="*", default=[], metavar="ACCOUNT=TYPE",
+                        help="Questrade account type of the accounts to sync, ex. tfsa=TFSA")
+    parser.add_argument("--client-dir", help="pyportlib data directory, the default one if not given")
+    parser.add_argument("--log-file", help=f"json lines timing log, {LOG_FILENAME} in the outputs directory if not given")
+    parser.add_argument("--at", help="daily start time HH:MM, runs are repeated every day")
+    parser.add_argument("--every", type=int, help="minutes between the starts of the runs")
+    parser.add_argument("--max-runs", type=int, help="number of runs, 1 without --at or --every, unlimited with them")
+    return parser
+
+
+def _parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.at is not None:
+        try:
+            datetime.strptime(args.at, "%H:%M")
+        except ValueError:
+            parser.error(f"--at must be HH:MM, got {args.at}")
+    invalid = [spec for spec in args.questrade if not all(spec.partition('=')[::2])]
+    if invalid:
+        parser.error(f"--questrade must be ACCOUNT=TYPE, got {' '.join(invalid)}")
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Entry point of the pyportlib command
+
+    :param argv: command line arguments, sys.argv if None
+    :return: exit code
+    """
+    try:
+        args = _parse_args(argv)
+    except SystemExit as ex:
+        # argparse exits after printing the usage, 0 for --help
+        return EXIT_USAGE if ex.code else EXIT_OK
+    if args.client_dir:
+        files_utils.set_client_dir(args.client_dir)
+
+    accounts = account_currencies(specs=args.accounts, currency=args.currency)
+    missing = [account for account in accounts if not os.path.isdir(f"{files_utils.get_accounts_dir()}{account}")]
+    if missing or not accounts:
+        logger.logging.error(f"accounts {missing} not found in {files_utils.get_accounts_dir()}" if missing
+                             else f"no accounts to run in {files_utils.get_accounts_dir()}")
+        return EXIT_NO_ACCOUNTS
+
+    runner = Runner(accounts=accounts, workers=args.workers, force=args.force, fundamentals=args.fundamentals,
+                    benchmark=args.benchmark, questrade=dict(spec.split('=', 1) for spec in args.questrade),
+                    log=JobLog(path=args.log_file))
+    jobs = args.jobs if args.command == "run" else [args.command]
+    scheduled = args.at is not None or args.every is not None
+    max_runs = args.max_runs if args.max_runs is not None else (None if scheduled else 1)
+
+    exit_code, runs, last = EXIT_OK, 0, None
+    try:
+        while max_runs is None or runs < max_runs:
+            start = next_run(now=datetime.now(), at=args.at, every=args.every, last=last)
+            if start > datetime.now():
+                logger.logging.info(f"next run at {start:%Y-%m-%d %H:%M}")
+                time.sleep((start - datetime.now()).total_seconds())
+            last = datetime.now()
+            exit_code = max(exit_code, runner.run(jobs=jobs))
+            runs += 1
+    except KeyboardInterrupt:
+        logger.logging.info("scheduled runs interrupted")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
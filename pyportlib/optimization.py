@@ -0,0 +1,246 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from pyportlib import stats
+from pyportlib.portfolio.iportfolio import IPortfolio
+
+
+def shrunk_covariance(returns: pd.DataFrame, shrinkage: float = None) -> pd.DataFrame:
+    """
+    Ledoit-Wolf shrinkage of the sample covariance towards a scaled identity matrix
+
+    :param returns: returns, dates x tickers
+    :param shrinkage: shrinkage intensity between 0 and 1, the Ledoit-Wolf optimal intensity if None
+    :return: covariance, tickers x tickers
+    """
+    x = returns.fillna(0).values
+    x = x - x.mean(axis=0)
+    n_obs, n_assets = x.shape
+    sample = x.T @ x / n_obs
+    mu = np.trace(sample) / n_assets
+    target = mu * np.eye(n_assets)
+
+    if shrinkage is None:
+        d2 = ((sample - target) ** 2).sum()
+        b2 = ((x ** 2).sum(axis=1) ** 2).sum() / n_obs ** 2 - (sample ** 2).sum() / n_obs
+        shrinkage = min(max(b2, 0.), d2) / d2 if d2 > 0 else 1.
+
+    cov = shrinkage * target + (1 - shrinkage) * sample
+    return pd.DataFrame(cov, index=returns.columns, columns=returns.columns)
+
+
+def position_covariance(ptf: IPortfolio, lookback: str = '1y', end_date: datetime = None,
+                        shrinkage: float = None) -> pd.DataFrame:
+    """
+    Shrunk covariance of the daily returns of the open positions of a portfolio
+
+    :param ptf: Portfolio
+    :param lookback: ex. 1y or 10m to lookback from the end date
+    :param end_date: last business day if none
+    :param shrinkage: shrinkage intensity, the Ledoit-Wolf optimal intensity if None
+    :return: covariance, tickers x tickers
+    """
+    returns = ptf.open_positions_returns(lookback=lookback, end_date=end_date)
+    return shrunk_covariance(returns=returns, shrinkage=shrinkage)
+
+
+def min_variance(cov: pd.DataFrame, long_only: bool = True, max_iter: int = 10000, tol: float = 1e-10) -> pd.Series:
+    """
+    Minimum variance weights
+
+    :param cov: covariance, tickers x tickers
+    :param long_only: True for weights between 0 and 1, else weights can be negative (closed form)
+    :param max_iter: maximum number of iterations of the long only solver
+    :param tol: convergence tolerance of the long only solver
+    :return: weights summing to 1
+    """
+    sigma = cov.values
+    if long_only:
+        weights = _simplex_qp(a=sigma, max_iter=max_iter, tol=tol)
+    else:
+        weights = np.linalg.solve(sigma, np.ones(len(sigma)))
+        weights /= weights.sum()
+    return pd.Series(weights, index=cov.index, name='Minimum Variance')
+
+
+def max_sharpe(cov: pd.DataFrame, expected_returns: pd.Series, risk_free: float = 0., long_only: bool = True,
+               max_iter: int = 10000, tol: float = 1e-10) -> pd.Series:
+    """
+    Maximum Sharpe ratio (tangency) weights
+
+    :param cov: covariance, tickers x tickers
+    :param expected_returns: expected returns by ticker, in the same units as the covariance (ex. daily)
+    :param risk_free: risk free rate, in the same units as the expected returns
+    :param long_only: True for weights between 0 and 1, else weights can be negative (closed form)
+    :param max_iter: maximum number of iterations of the long only solver
+    :param tol: convergence tolerance of the long only solver
+    :return: weights summing to 1
+    """
+    excess = expected_returns.reindex(cov.index).fillna(0).values - risk_free
+    sigma = cov.values
+    weights = np.zeros(len(sigma))
+
+    if not long_only:
+        weights = np.linalg.solve(sigma, excess)
+        weights /= weights.sum()
+    elif np.any(excess > 0):
+        # with y = w / excess'w, max sharpe is min y'Σy with y >= 0 and excess'y = 1
+        y = _simplex_qp(a=sigma, max_iter=max_iter, tol=tol, c=excess)
+        weights = y / y.sum()
+    return pd.Series(weights, index=cov.index, name='Maximum Sharpe')
+
+
+def risk_parity(cov: pd.DataFrame, budgets: pd.Series = None, max_iter: int = 100, tol: float = 1e-10) -> pd.Series:
+    """
+    Weights where every position contributes its risk budget to the portfolio variance (equal risk contributions by
+    default). Solved with Newton steps on the convex formulation min x'Σx/2 - b'log(x).
+
+    :param cov: covariance, tickers x tickers
+    :param budgets: risk budget by ticker, equal if None
+    :param max_iter: maximum number of Newton steps
+    :param tol: convergence tolerance on the gradient
+    :return: weights summing to 1
+    """
+    sigma = cov.values
+    n_assets = len(sigma)
+    b = np.full(n_assets, 1. / n_assets) if budgets is None else budgets.reindex(cov.index).fillna(0).values
+    b = b / b.sum()
+
+    x = 1 / np.sqrt(np.diag(sigma))
+    x *= np.sqrt(b.sum() / (x @ sigma @ x))
+    for _ in range(max_iter):
+        gradient = sigma @ x - b / x
+        if np.abs(gradient).max() < tol:
+            break
+        hessian = sigma + np.diag(b / x ** 2)
+        step = np.linalg.solve(hessian, gradient)
+        # stay in the positive orthant
+        t = 1.
+        negative = step > 0
+        if np.any(negative):
+            t = min(1., 0.95 * np.min(x[negative] / step[negative]))
+        x = x - t * step
+
+    return pd.Series(x / x.sum(), index=cov.index, name='Risk Parity')
+
+
+def hierarchical_risk_parity(cov: pd.DataFrame) -> pd.Series:
+    """
+    Hierarchical risk parity weights: assets are ordered with the correlation clustering of stats.cluster_order,
+    then the weight is split by recursive bisection in inverse proportion to the variance of each half
+
+    :param cov: covariance, tickers x tickers
+    :return: weights summing to 1
+    """
+    sigma = cov.values
+    std = np.sqrt(np.diag(sigma))
+    corr = sigma / np.outer(std, std)
+    order = stats.cluster_order(corr)
+
+    weights = np.ones(len(sigma))
+    clusters = [order]
+    while clusters:
+        splits = []
+        for cluster in clusters:
+            if len(cluster) < 2:
+                continue
+            left, right = cluster[:len(cluster) // 2], cluster[len(cluster) // 2:]
+            var_left, var_right = _cluster_variance(sigma, left), _cluster_variance(sigma, right)
+            alpha = 1 - var_left / (var_left + var_right)
+            weights[left] *= alpha
+            weights[right] *= 1 - alpha
+            splits += [left, right]
+        clusters = splits
+
+    return pd.Series(weights, index=cov.index, name='Hierarchical Risk Parity')
+
+
+def risk_contributions(weights: pd.Series, cov: pd.DataFrame) -> pd.Series:
+    """
+    Contribution of every position to the portfolio variance, in %
+
+    :param weights: weights by ticker
+    :param cov: covariance, tickers x tickers
+    :return:
+    """
+    w = weights.reindex(cov.index).fillna(0).values
+    contributions = w * (cov.values @ w)
+    return pd.Series(contributions / contributions.sum(), index=cov.index, name='Risk Contributions')
+
+
+def _cluster_variance(sigma: np.ndarray, cluster: np.ndarray) -> float:
+    sub = sigma[np.ix_(cluster, cluster)]
+    ivp = 1 / np.diag(sub)
+    ivp /= ivp.sum()
+    return ivp @ sub @ ivp
+
+
+def _simplex_qp(a: np.ndarray, max_iter: int, tol: float, c: np.ndarray = None) -> np.ndarray:
+    """
+    min w'Aw with w >= 0 and c'w = 1 (sum(w) = 1 if c is None), accelerated projected gradient (FISTA) with adaptive
+    restart
+    """
+    n_assets = len(a)
+    project = _project_simplex if c is None else lambda v: _project_orthant_hyperplane(v, c)
+    # power iteration converges from below, keep a margin so the step is not too long
+    lipschitz = 2.1 * _max_eigenvalue(a)
+    w = project(np.full(n_assets, 1. / n_assets))
+    y, t = w.copy(), 1.
+    for _ in range(max_iter):
+        w_next = project(y - 2 * (a @ y) / lipschitz)
+        if np.dot(y - w_next, w_next - w) > 0:
+            # the momentum points uphill, restart the acceleration
+            t = 1.
+        t_next = (1 + np.sqrt(1 + 4 * t ** 2)) / 2
+        y = w_next + (t - 1) / t_next * (w_next - w)
+        if np.abs(w_next - w).max() < tol:
+            w = w_next
+            break
+        w, t = w_next, t_next
+    return w
+
+
+def _project_simplex(v: np.ndarray) -> np.ndarray:
+    u = np.sort(v)[::-1]
+    cumulative = np.cumsum(u) - 1
+    rho = np.flatnonzero(u - cumulative / np.arange(1, len(v) + 1) > 0)[-1]
+    return np.maximum(v - cumulative[rho] / (rho + 1), 0)
+
+
+def _project_orthant_hyperplane(v: np.ndarray, c: np.ndarray, n_iter: int = 100) -> np.ndarray:
+    """
+    Projection on w >= 0 and c'w = 1: w = max(v + theta * c, 0) where c'w is increasing in theta, found by bisection
+    """
+    def excess(theta):
+        return c @ np.maximum(v + theta * c, 0) - 1
+
+    low, high = -1., 1.
+    while excess(low) > 0:
+        low *= 2
+    while excess(high) < 0:
+        high *= 2
+    for _ in range(n_iter):
+        theta = (low + high) / 2
+        if excess(theta) < 0:
+            low = theta
+        else:
+            high = theta
+        if high - low < 1e-15 * max(1., abs(theta)):
+            break
+    return np.maximum(v + high * c, 0)
+
+
+def _max_eigenvalue(a: np.ndarray, n_iter: int = 100) -> float:
+    x = np.ones(len(a)) / np.sqrt(len(a))
+    value = 0.
+    for _ in range(n_iter):
+        y = a @ x
+        norm = np.linalg.norm(y)
+        if norm == 0:
+            return 1.
+        x = y / norm
+        if abs(norm - value) < 1e-9 * norm:
+            break
+        value = norm
+    return max(value, norm)
@@ -1,5 +1,4 @@
 from datetime import datetime
-import quantstats as qs
 
 from pyportlib.portfolio.iportfolio import IPortfolio
 from pyportlib import stats
@@ -19,6 +18,7 @@ def snapshot(pos: ITimeSeries, start_date: datetime = None, end_date: datetime =
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -45,6 +45,7 @@ def returns(pos: ITimeSeries, start_date: datetime = None, end_date: datetime =
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -75,6 +76,7 @@ def distribution(pos: ITimeSeries, start_date: datetime = None, end_date: dateti
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -100,6 +102,7 @@ def rolling_beta(pos: ITimeSeries, benchmark: ITimeSeries, start_date: datetime
     :param kwargs: PnL and Quantstats keyword arguments
     :return
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -128,6 +131,7 @@ def rolling_vol(pos: ITimeSeries, start_date: datetime = None, end_date: datetim
     :param kwargs: PnL and Quantstats keyword arguments
     :return
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -157,6 +161,7 @@ def rolling_skew(pos: ITimeSeries, lookback: str = None, start_date: datetime =
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -184,6 +189,7 @@ def rolling_kurtosis(pos: ITimeSeries, lookback: str = None, start_date: datetim
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -211,6 +217,7 @@ def rolling_sharpe(pos: ITimeSeries, start_date: datetime = None, end_date: date
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
 
     if rets.empty:
@@ -246,6 +253,7 @@ def rolling_var(pos: ITimeSeries,
     :param kwargs: PnL and Quantstats keyword arguments
     :return:
     """
+    import quantstats as qs
     rets = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end=end_date)
     if rets.empty:
         logger.logging.error(f"{pos} prices missing")
@@ -289,6 +297,7 @@ def excess_returns(pos: ITimeSeries,
                    start_date: datetime = None, end_date: datetime = None,
                    lookback: str = None,
                    **kwargs):
+    import quantstats as qs
     rets = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end=end_date, **kwargs)
     bench = time_series.prep_returns(benchmark, lookback=lookback, start_date=start_date, end=end_date, include_cash=False)
 
@@ -0,0 +1,494 @@
+from datetime import datetime
+from typing import Union, List, Dict
+import numpy as np
+import pandas as pd
+
+import pyportlib.create
+from pyportlib import rebalancing
+from pyportlib.portfolio import currency as currency_lib, performance, scenarios as scenarios_lib
+from pyportlib.portfolio.iportfolio import IPortfolio
+from pyportlib.position.iposition import IPosition
+from pyportlib.services import data_refresh
+from pyportlib.services.data_reader import DataReader
+from pyportlib.services.fx_rates import FxRates
+from pyportlib.services.refresh_planner import RefreshPlanner
+from pyportlib.utils import logger, time_series
+from pyportlib.utils.time_series import ITimeSeries
+from pyportlib.services.interfaces.icash_change import ICashChange
+from pyportlib.services.interfaces.itransaction import ITransaction
+
+
+class CompositePortfolio(IPortfolio, ITimeSeries):
+    """
+    Consolidated view of many accounts (ex. TFSA, RRSP and margin of a household). Member portfolios share the same
+    DataReader and FxRates so prices and fx rates are only loaded once. The positions of the members are consolidated
+    once when loaded, a ticker held in many accounts is one position with the sum of their quantities and the tag
+    of its first account.
+    """
+
+    def __init__(self, account: str, currency: str,
+                 portfolios: List[IPortfolio],
+                 datareader: DataReader,
+                 fx: FxRates):
+        # attributes
+        self.account = account
+        self.currency = currency.upper()
+        self._portfolios = portfolios
+        self._positions = {}
+        self._position_values = pd.DataFrame()
+        self._market_value = pd.Series()
+        self._cash_history = pd.Series()
+
+        # services
+        self._datareader = datareader
+        self._fx = fx
+
+        self.start_date = None
+        self._load()
+
+    def __repr__(self):
+        return self.account
+
+    @property
+    def portfolios(self) -> List[IPortfolio]:
+        return self._portfolios
+
+    def load_data(self) -> None:
+        """
+        Reloads every member portfolio and the consolidated values
+
+        :return: None
+        """
+        for ptf in self._portfolios:
+            ptf.load_data()
+        self._load()
+
+    def reload(self) -> None:
+        """
+        Loads every member portfolio again after their inputs changed, their snapshots are saved
+
+        :return: None
+        """
+        for ptf in self._portfolios:
+            ptf.reload()
+        self._load()
+
+    def _load(self) -> None:
+        start_dates = [ptf.start_date for ptf in self._portfolios if ptf.start_date is not None]
+        self.start_date = min(start_dates) if start_dates else None
+        self._load_positions()
+        self._load_position_values()
+        self._market_value = self.compute_market_value()
+        self._load_cash_history()
+        logger.logging.debug(f'{self.account} data loaded')
+
+    def update_data(self, fundamentals_and_dividends: bool = False, force: bool = False) -> None:
+        """
+        Updates the stale market data of all the member portfolios, each ticker is only updated once
+
+        :param fundamentals_and_dividends: True to update the statement and dividend data
+        :param force: True to update all of the market data
+        :return: None
+        """
+        if force:
+            tickers = {ticker for ptf in self._portfolios for ticker in ptf.positions.keys()}
+            with self._datareader.catalog.batch():
+                for ticker in tickers:
+                    if fundamentals_and_dividends:
+                        self._datareader.update_statement(ticker=ticker, statement_type='all')
+                        self._datareader.update_dividends(ticker=ticker)
+                    self._datareader.update_prices(ticker=ticker)
+                self._fx.refresh()
+        else:
+            tickers, pairs, closed = data_refresh.holdings(self._portfolios)
+            RefreshPlanner(datareader=self._datareader).refresh(tickers=tickers, pairs=pairs | set(self._fx.pairs),
+                                                                closed=closed,
+                                                                fundamentals_and_dividends=fundamentals_and_dividends)
+        self.reload()
+        logger.logging.info(f'{self.account} updated')
+
+    def compute_market_value(self, positions_to_exclude: List[str] = None, tags: List[str] = None) -> pd.Series:
+        """
+        Computes the daily consolidated market value of the member portfolios
+
+        :param positions_to_exclude: Ticker of position to exclude from computations
+        :param tags: Tags to compute the market value of. If None, it will be the market value of all the portfolios
+        :return:
+        """
+        tickers = self._filter_positions(positions_to_exclude=positions_to_exclude, tags=tags)
+        values = self._position_values.loc[:, self._position_values.columns.intersection(tickers)]
+        if values.empty:
+            logger.logging.debug(f"{self.account} no positions in portfolios")
+            return pd.Series()
+        return values.sum(axis=1)
+
+    @property
+    def market_value(self) -> pd.Series:
+        return self._market_value.copy()
+
+    def position_tags(self) -> list:
+        return list({tag for ptf in self._portfolios for tag in ptf.position_tags()})
+
+    def _load_positions(self) -> None:
+        """
+        Consolidated positions, quantities of a ticker held in many accounts are added together
+
+        :return: None
+        """
+        self._positions = {}
+        held = {}
+        for ptf in self._portfolios:
+            for ticker, pos in ptf.positions.items():
+                held.setdefault(ticker, []).append(pos)
+
+        for ticker, positions in held.items():
+            first = positions[0]
+            pos = pyportlib.create.position(ticker, local_currency=first.currency, tag=first.tag, prices=first.prices,
+                                            local_prices=first.local_prices)
+            quantities = pd.concat([p.quantities for p in positions], axis=1).sort_index().ffill().fillna(0)
+            pos.quantities = quantities.sum(axis=1)
+            self._positions[ticker] = pos
+        logger.logging.debug(f'positions for {self.account} loaded')
+
+    def _load_position_values(self) -> None:
+        """
+        Consolidated market value of every position, dates x tickers. The value of a position in every member is
+        computed as in its portfolio (quantity held at the previous close * price) and the members are added once.
+
+        :return: None
+        """
+        values, dates = {}, pd.DatetimeIndex([])
+        for i, ptf in enumerate(self._portfolios):
+            if ptf.start_date is None:
+                continue
+            dates = dates.union(ptf.market_value.index)
+            for ticker, pos in ptf.positions.items():
+                value = pos.quantities.shift(1).fillna(method="backfill").multiply(pos.prices.loc[ptf.start_date:])
+                values[(i, ticker)] = value.fillna(method='ffill')
+        if not values:
+            self._position_values = pd.DataFrame()
+            return
+        values = pd.DataFrame(values)
+        values = values.reindex(dates.union(values.index)).ffill().fillna(0)
+        self._position_values = values.groupby(level=1, axis=1).sum()
+
+    def _filter_positions(self, positions_to_exclude: List[str] = None, tags: List[str] = None) -> List[str]:
+        tickers = [ticker for ticker in self._positions if ticker not in (positions_to_exclude or [])]
+        if tags is not None:
+            tickers = [ticker for ticker in tickers if self._positions[ticker].tag in tags]
+        return tickers
+
+    @property
+    def positions(self) -> Dict[str, Union[IPosition, ITimeSeries]]:
+        return self._positions
+
+    @property
+    def datareader(self) -> DataReader:
+        return self._datareader
+
+    def add_transaction(self, transactions: Union[ITransaction, List[ITransaction]], account: str = None) -> None:
+        """
+        Adds transactions to a member portfolio and reloads the consolidated values
+
+        :param transactions: transactions to add
+        :param account: account of the member portfolio, can be omitted when there is only one member
+        :return: None
+        """
+        self._member(account=account).add_transaction(transactions)
+        self._load()
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        return pd.concat([ptf.transactions for ptf in self._portfolios]).sort_index()
+
+    @property
+    def cash_changes(self) -> pd.DataFrame:
+        return pd.concat([ptf.cash_changes for ptf in self._portfolios]).sort_index()
+
+    @property
+    def cash_history(self) -> pd.Series:
+        return self._cash_history
+
+    def _load_cash_history(self) -> None:
+        histories = [ptf.cash_history for ptf in self._portfolios if not ptf.cash_history.empty]
+        if not histories:
+            self._cash_history = pd.Series()
+            return
+        cash = pd.concat(histories, axis=1).sort_index().ffill().fillna(0).sum(axis=1)
+        self._cash_history = cash.reindex(self._market_value.index).ffill().fillna(0)
+
+    def add_cash_change(self, cash_changes: Union[List[ICashChange], ICashChange], account: str = None) -> None:
+        """
+        Adds cash changes to a member portfolio and reloads the consolidated values
+
+        :param cash_changes: cash changes to add
+        :param account: account of the member portfolio, can be omitted when there is only one member
+        :return: None
+        """
+        self._member(account=account).add_cash_change(cash_changes)
+        self._load()
+
+    def _member(self, account: str = None) -> IPortfolio:
+        if account is None:
+            if len(self._portfolios) == 1:
+                return self._portfolios[0]
+            raise ValueError(f"{self.account}: choose the account of a member portfolio in "
+                             f"{[ptf.account for ptf in self._portfolios]}")
+        for ptf in self._portfolios:
+            if ptf.account == account:
+                return ptf
+        raise ValueError(f"{account} is not a member of {self.account}")
+
+    def cash(self, date: datetime = None) -> float:
+        """
+        Consolidated cash available on given date
+
+        :param date: datetime
+        :return: float
+        """
+        return round(sum(ptf.cash(date=date) for ptf in self._portfolios), 2)
+
+    def dividends(self, start_date: datetime = None, end_date: datetime = None) -> float:
+        """
+        Accumulated dividend over date range for all the member portfolios
+
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :return:
+        """
+        return round(sum(ptf.dividends(start_date=start_date, end_date=end_date) for ptf in self._portfolios), 2)
+
+    def daily_total_pnl(self, start_date: datetime = None, end_date: datetime = None, positions_to_exclude: List[str] = None,
+                        tags: List[str] = None) -> pd.DataFrame:
+        """
+        Consolidated return per position in $ amount for specified date range. A ticker held in many accounts has
+        the sum of its pnl in every account.
+
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param positions_to_exclude: List of ticker to exclude from calculation
+        :param tags: List of tags to compute return for
+        :return:
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+
+        tickers = self._filter_positions(positions_to_exclude=positions_to_exclude, tags=tags)
+        if not tickers:
+            return pd.DataFrame()
+        transactions = self.transactions
+        transactions = transactions.loc[transactions.Ticker.isin(tickers)]
+        transactions = transactions.loc[(transactions.index >= start_date) & (transactions.index <= end_date)]
+        # the pnl of a position is linear in its quantities, the consolidated positions give the sum of the members
+        pnl = {ticker: self._positions[ticker].daily_pnl(start_date, end_date,
+                                                         transactions.loc[transactions.Ticker == ticker],
+                                                         self._fx.rates)['total'] for ticker in tickers}
+        return pd.DataFrame.from_dict(pnl, orient="columns").fillna(0)
+
+    def pct_daily_total_pnl(self, start_date: datetime = None, end_date: datetime = None, include_cash: bool = False,
+                            positions_to_exclude: List[str] = None, tags: List[str] = None) -> pd.Series:
+        """
+        Consolidated return in % of market value
+
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :param tags: Specific position tags to compute
+        :param positions_to_exclude: List of tickers to exlude from computation
+        :return:
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+
+        if positions_to_exclude is not None or tags is not None:
+            market_vals = self.compute_market_value(positions_to_exclude=positions_to_exclude, tags=tags).loc[start_date:end_date]
+        else:
+            market_vals = self.market_value.loc[start_date:end_date]
+
+        if include_cash:
+            market_vals += self._cash_history.loc[start_date:end_date]
+
+        pnl = self.daily_total_pnl(start_date, end_date, positions_to_exclude=positions_to_exclude, tags=tags)
+        if pnl.empty:
+            pnl = pd.Series(index=market_vals.index, data=0.)
+        else:
+            pnl = pnl.sum(axis=1).divide(market_vals)
+        pnl.replace([np.inf, -np.inf], np.nan, inplace=True)
+        pnl = pnl.fillna(0)
+        pnl.name = self.account
+        return pnl
+
+    def scenario_returns(self, scenarios: pd.DataFrame, start_date: datetime = None, end_date: datetime = None,
+                         include_cash: bool = False) -> pd.DataFrame:
+        """
+        Returns in % of market value of many what-if scenarios at once. The positions pnl and market values are
+        computed once, each scenario is then a weighted sum of them.
+
+        :param scenarios: weight of every position in every scenario, scenarios x tickers (1 included, 0 excluded or
+        any multiplier). See scenarios.exclusion_masks, scenarios.leave_one_out and scenarios.tag_masks
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: scenarios x dates
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return scenarios_lib.evaluate(ptf=self, masks=scenarios, start_date=start_date, end_date=end_date,
+                                      include_cash=include_cash)
+
+    def currency_decomposition(self, start_date: datetime = None, end_date: datetime = None,
+                               include_cash: bool = False) -> pd.DataFrame:
+        """
+        Daily pnl and returns split into asset and currency. See currency.pnl_decomposition for the pnl of every
+        position.
+
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: dates x (asset_pnl, currency_pnl, total_pnl, asset, currency, total)
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return currency_lib.portfolio_decomposition(ptf=self, start_date=start_date, end_date=end_date,
+                                                    include_cash=include_cash)
+
+    def hedged_returns(self, hedges: Union[pd.DataFrame, Dict[str, float]], start_date: datetime = None,
+                       end_date: datetime = None, include_cash: bool = False) -> pd.DataFrame:
+        """
+        Returns in % of market value with part of the currency exposure hedged, for many hedge scenarios at once
+
+        :param hedges: hedge ratio of every currency in every scenario, scenarios x currencies (0 unhedged, 1 fully
+        hedged), or a dict of hedge ratio by currency
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: scenarios x dates
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return currency_lib.hedged_returns(ptf=self, hedges=hedges, start_date=start_date, end_date=end_date,
+                                           include_cash=include_cash)
+
+    def reset(self, account: str = None) -> None:
+        """
+        Resets a member portfolio and reloads the consolidated values
+
+        :param account: account of the member portfolio, can be omitted when there is only one member
+        :return: None
+        """
+        self._member(account=account).reset()
+        self._load()
+
+    def corr(self, lookback: str = None, end_date: datetime = None, start_date: datetime = None):
+        """
+        Open positions correlations
+
+        :param lookback:
+        :param start_date:
+        :param end_date:
+        :return:
+        """
+        return self.open_positions_returns(lookback=lookback, end_date=end_date, start_date=start_date).corr()
+
+    def position_weights(self, date: datetime = None) -> pd.Series:
+        """
+        Consolidated position weights in %
+
+        :param date:
+        :return:
+        """
+        if date is None:
+            date = self._datareader.last_data_point(ptf_currency=self.currency)
+
+        values = rebalancing.holdings_values(positions=self._positions, date=date)
+        weights = values.loc[values.round(8) != 0] / self.market_value.asof(date)
+        weights.name = 'Position Allocations'
+        if not 0.99 < weights.sum() < 1.01:
+            logger.logging.error(f"Weights do not add to 1: {weights.sum()}")
+        return weights
+
+    def strategy_weights(self, date: datetime = None) -> pd.Series:
+        """
+        Consolidated strategy tags weights in %
+
+        :param date:
+        :return:
+        """
+        if date is None:
+            date = self._datareader.last_data_point(ptf_currency=self.currency)
+
+        values = rebalancing.holdings_values(positions=self._positions, date=date)
+        tags = pd.Series({k: v.tag for k, v in self._positions.items()})
+        weights = values.groupby(tags).sum().reindex(self.position_tags()).fillna(0) / self.market_value.asof(date)
+        weights.name = 'Strategy Allocations'
+        if not 0.999 < weights.sum() < 1.001:
+            logger.logging.error(f"Weights do not add to 1: {weights.sum()}")
+        return weights
+
+    def open_positions(self, date: datetime) -> Dict[str, Union[IPosition, ITimeSeries]]:
+        """
+        Dict with only active consolidated positions on given date
+
+        :param date: Date to get open positions from
+        :return:
+        """
+        return {k: v for k, v in self.positions.items() if round(v.quantities.asof(date)) != 0.}
+
+    def open_positions_returns(self, lookback: str = None, end_date: datetime = None, start_date: datetime = None):
+        """
+        Get returns from open positions on given date
+
+        :param lookback: ex. 1y or 10m to lookback from given date argument
+        :param start_date: last business day if none
+        :param end_date: last business day if none
+        :return:
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        open_positions = self.open_positions(end_date)
+        prices = {k: time_series.prep_returns(v, lookback=lookback, end_date=end_date, start_date=start_date) for k, v in open_positions.items()}
+        return pd.DataFrame(prices).fillna(0)
+
+    def time_weighted_returns(self, start_date: datetime = None, end_date: datetime = None,
+                              tags: List[str] = None) -> pd.Series:
+        """
+        Daily time-weighted returns: deposits and withdrawals (or the trades of the tags) are taken out of the
+        returns on the day they happen, so chain-linked returns are not distorted by the flows
+
+        :param start_date: start date of series
+        :param end_date: end date of series
+        :param tags: tags to compute the returns of (positions only), the whole account with its cash if None
+        :return:
+        """
+        return performance.portfolio_time_weighted_returns(ptf=self, start_date=start_date, end_date=end_date,
+                                                           tags=tags)
+
+    def returns(self, start_date: datetime, end_date: datetime, **kwargs):
+        """
+        Implementation of the returns method of the ITimeSeries
+
+        :param start_date: datetime
+        :param end_date: datetime
+        :param kwargs: method 'twr' for time-weighted returns (with tags), pct_daily_total_pnl kwargs otherwise
+        :return:
+        """
+        if kwargs.get("method") == "twr":
+            return self.time_weighted_returns(start_date=start_date, end_date=end_date, tags=kwargs.get("tags"))
+
+        include_cash = kwargs.get("include_cash") if kwargs.get("include_cash") is not None else False
+
+        return self.pct_daily_total_pnl(start_date=start_date,
+                                        end_date=end_date,
+                                        include_cash=include_cash,
+                                        positions_to_exclude=kwargs.get("positions_to_exclude"),
+                                        tags=kwargs.get("tags"))
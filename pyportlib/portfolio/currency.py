@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Dict, Tuple, Union
+import numpy as np
+import pandas as pd
+
+from pyportlib.portfolio import scenarios
+from pyportlib.portfolio.iportfolio import IPortfolio
+
+
+def price_matrices(ptf: IPortfolio) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Local currency prices, portfolio currency prices and the fx rates between them of every position, dates x tickers
+    on the market value dates. The rates are the ones the portfolio converted the prices with, 1 for the positions
+    in the portfolio currency.
+
+    :param ptf: Portfolio
+    :return: local prices, base prices, rates
+    """
+    index = ptf.market_value.index
+    local = pd.DataFrame({t: p.local_prices for t, p in ptf.positions.items()}).reindex(index).ffill()
+    base = pd.DataFrame({t: p.prices for t, p in ptf.positions.items()}).reindex(index).ffill()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = base.values / local.values
+    rates = np.where(np.isfinite(rates), rates, 1.)
+    return local, base, pd.DataFrame(rates, index=index, columns=base.columns)
+
+
+def position_returns(ptf: IPortfolio, start_date: datetime = None,
+                     end_date: datetime = None) -> Dict[str, pd.DataFrame]:
+    """
+    Daily price returns of every position in local currency, of its currency and in portfolio currency,
+    dates x tickers. (1 + base) = (1 + local) * (1 + currency)
+
+    :param ptf: Portfolio
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :return: dict of local, currency and base returns
+    """
+    local, base, rates = price_matrices(ptf=ptf)
+    returns = {'local': local.pct_change(), 'currency': rates.pct_change(), 'base': base.pct_change()}
+    return {k: v.replace([np.inf, -np.inf], np.nan).fillna(0.).loc[start_date:end_date] for k, v in returns.items()}
+
+
+def fx_pnl(ptf: IPortfolio, start_date: datetime = None, end_date: datetime = None) -> pd.DataFrame:
+    """
+    Currency pnl of every position in portfolio currency, dates x tickers: the change of the fx rate on the local
+    value of the shares held, quantity * local price * (rate - previous rate). Positions in the portfolio currency
+    have none.
+
+    :param ptf: Portfolio
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :return:
+    """
+    local, _, rates = price_matrices(ptf=ptf)
+    quantities = pd.DataFrame({t: p.quantities.shift(1).fillna(method="backfill") for t, p in ptf.positions.items()})
+    quantities = quantities.reindex(index=local.index, columns=local.columns).ffill().fillna(0.)
+    changes = np.diff(rates.values, axis=0, prepend=rates.values[:1])
+    pnl = np.nan_to_num(quantities.values * local.values * changes)
+    return pd.DataFrame(pnl, index=local.index, columns=local.columns).loc[start_date:end_date]
+
+
+def pnl_decomposition(ptf: IPortfolio, start_date: datetime = None,
+                      end_date: datetime = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Daily pnl of every position split into its asset and currency pnl, dates x tickers. The currency pnl is fx_pnl,
+    the asset pnl is the rest of daily_total_pnl (price change in local currency, realized gains, dividends and
+    fees) so the two add up to daily_total_pnl.
+
+    :param ptf: Portfolio
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :return: asset pnl, currency pnl
+    """
+    total = ptf.daily_total_pnl(start_date=start_date, end_date=end_date)
+    currency = fx_pnl(ptf=ptf).reindex(index=total.index, columns=total.columns).fillna(0.)
+    return total - currency, currency
+
+
+def portfolio_decomposition(ptf: IPortfolio, start_date: datetime = None, end_date: datetime = None,
+                            include_cash: bool = False) -> pd.DataFrame:
+    """
+    Daily pnl and returns of the portfolio split into asset and currency, the returns are in % of the market value
+    as pct_daily_total_pnl
+
+    :param ptf: Portfolio
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :param include_cash: If we include the cash amount at that time to calc the market value
+    :return: dates x (asset_pnl, currency_pnl, total_pnl, asset, currency, total)
+    """
+    asset, currency = pnl_decomposition(ptf=ptf, start_date=start_date, end_date=end_date)
+    pnl = pd.DataFrame({'asset_pnl': asset.sum(axis=1), 'currency_pnl': currency.sum(axis=1)})
+    pnl['total_pnl'] = pnl['asset_pnl'] + pnl['currency_pnl']
+    values = _market_values(ptf=ptf, index=pnl.index, include_cash=include_cash)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = pnl.values / values[:, None]
+    returns = pd.DataFrame(returns, index=pnl.index, columns=['asset', 'currency', 'total'])
+    return pd.concat([pnl, returns.replace([np.inf, -np.inf], np.nan).fillna(0.)], axis=1)
+
+
+def hedge_masks(ptf: IPortfolio, hedges: Union[pd.DataFrame, Dict[str, float]]) -> pd.DataFrame:
+    """
+    Hedge ratio of every position in every scenario from hedge ratios by currency
+
+    :param ptf: Portfolio
+    :param hedges: hedge ratio of every currency in every scenario, scenarios x currencies (0 unhedged, 1 fully
+    hedged), or a dict of hedge ratio by currency for a single scenario. Currencies missing are unhedged.
+    :return: scenarios x tickers
+    """
+    if isinstance(hedges, dict):
+        hedges = pd.DataFrame([hedges], index=['hedged'])
+    currencies = pd.Series({t: p.currency for t, p in ptf.positions.items()})
+    masks = hedges.reindex(columns=currencies.values).fillna(0.)
+    masks.columns = currencies.index
+    return masks
+
+
+def hedged_returns(ptf: IPortfolio, hedges: Union[pd.DataFrame, Dict[str, float]], start_date: datetime = None,
+                   end_date: datetime = None, include_cash: bool = False) -> pd.DataFrame:
+    """
+    Returns of the portfolio with part of its currency exposure hedged, for many scenarios at once. The hedged
+    currency pnl is removed from the pnl of the positions, the cost and carry of the hedges are not included.
+
+    :param ptf: Portfolio
+    :param hedges: hedge ratio of every currency in every scenario, scenarios x currencies, see hedge_masks
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :param include_cash: If we include the cash amount at that time to calc the market value
+    :return: scenarios x dates
+    """
+    asset, currency = pnl_decomposition(ptf=ptf, start_date=start_date, end_date=end_date)
+    masks = hedge_masks(ptf=ptf, hedges=hedges)
+    pnl = (asset + currency).sum(axis=1).values - scenarios.scenario_pnl(pnl=currency, masks=masks)
+    values = _market_values(ptf=ptf, index=asset.index, include_cash=include_cash)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = pnl / values
+    return returns.replace([np.inf, -np.inf], np.nan).fillna(0.)
+
+
+def _market_values(ptf: IPortfolio, index: pd.DatetimeIndex, include_cash: bool) -> np.ndarray:
+    values = ptf.market_value
+    if include_cash:
+        values = values + ptf.cash_history.reindex(values.index).fillna(0.)
+    return values.reindex(index).fillna(0.).values
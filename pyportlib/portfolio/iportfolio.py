@@ -5,6 +5,7 @@ from typing import List, Dict, Union
 import pandas as pd
 
 from pyportlib.position.iposition import IPosition
+from pyportlib.services.data_reader import DataReader
 from pyportlib.utils.time_series import ITimeSeries
 from pyportlib.services.interfaces.itransaction import ITransaction
 from pyportlib.services.interfaces.icash_change import ICashChange
@@ -19,7 +20,12 @@ class IPortfolio(ITimeSeries):
         """
 
     @abstractmethod
-    def update_data(self, fundamentals_and_dividends: bool = False) -> None:
+    def reload(self) -> None:
+        """
+        """
+
+    @abstractmethod
+    def update_data(self, fundamentals_and_dividends: bool = False, force: bool = False) -> None:
         """
         """
 
@@ -45,6 +51,12 @@ class IPortfolio(ITimeSeries):
         """
         """
 
+    @property
+    @abstractmethod
+    def datareader(self) -> DataReader:
+        """
+        """
+
     @abstractmethod
     def add_transaction(self, transactions: Union[ITransaction, List[ITransaction]]) -> None:
         """
@@ -0,0 +1,197 @@
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+
+from pyportlib.data_connections.interfaces.iquote_source import IQuoteSource
+from pyportlib.portfolio.iportfolio import IPortfolio
+from pyportlib.position.iposition import IPosition
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import logger
+from pyportlib.utils.ring_buffer import RingBuffer
+
+
+class LiveValuation:
+    """
+    Intraday valuation of the open positions of a portfolio. Quantities, previous closes and fx rates are taken once
+    from the portfolio, then every tick only updates the positions that received a new quote: the market value and
+    the day pnl are adjusted by the price change instead of being recomputed from the history.
+    """
+    _NAME = "Live Valuation"
+
+    def __init__(self, portfolio: IPortfolio, quote_source: IQuoteSource, datareader: DataReader,
+                 buffer_size: int = 1024):
+        self.portfolio = portfolio
+        self._quote_source = quote_source
+        self._datareader = datareader
+        self._buffer_size = buffer_size
+
+        self.tickers: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._buffers: Dict[str, RingBuffer] = {}
+        self._quantities = np.array([])
+        self._fx = np.array([])
+        self._previous_close = np.array([])
+        self._last = np.array([])
+        self._market_value = 0.
+        self._day_pnl = 0.
+        self.last_update = None
+        self.reset()
+
+    def __repr__(self):
+        return f"{self.portfolio.account} - {self._NAME}"
+
+    def reset(self) -> None:
+        """
+        Takes the open positions, their quantities and previous close from the portfolio and clears the quotes
+
+        :return: None
+        """
+        today = pd.Timestamp(datetime.today().date())
+        open_positions = {k: v for k, v in self.portfolio.positions.items()
+                          if len(v.quantities) and round(v.quantities.iloc[-1], 8) != 0}
+
+        fx, previous_close = {}, {}
+        for ticker, pos in open_positions.items():
+            fx[ticker] = self._fx_rate(pos.currency)
+            previous_close[ticker] = self._previous_close_price(position=pos, fx=fx[ticker], today=today)
+        open_positions = {k: v for k, v in open_positions.items() if not np.isnan(previous_close[k])}
+
+        self.tickers = list(open_positions.keys())
+        self._index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._buffers = {ticker: RingBuffer(capacity=self._buffer_size) for ticker in self.tickers}
+        self._quantities = np.array([pos.quantities.iloc[-1] for pos in open_positions.values()], dtype=float)
+        self._previous_close = np.array([previous_close[ticker] for ticker in self.tickers], dtype=float)
+        self._fx = np.array([fx[ticker] for ticker in self.tickers], dtype=float)
+        self._last = self._previous_close.copy()
+
+        self._market_value = float(np.dot(self._quantities, self._last))
+        self._day_pnl = 0.
+        self.last_update = None
+        logger.logging.debug(f"{self} reset with {len(self.tickers)} open positions")
+
+    def _previous_close_price(self, position: IPosition, fx: float, today: pd.Timestamp) -> float:
+        """
+        Close before today in the portfolio currency. A position opened today has no close yet, the price of its
+        last buy is used instead so the day pnl starts from the fill.
+        """
+        closes = position.prices.loc[:today - pd.Timedelta(days=1)].dropna()
+        if len(closes):
+            return float(closes.iloc[-1])
+        trx = self.portfolio.transactions
+        buys = trx.loc[(trx.Ticker == position.ticker) & (trx.Type == 'Buy')]
+        if len(buys):
+            return float(buys.Price.iloc[-1]) * fx
+        logger.logging.error(f"{self}: no close or fill price for {position.ticker}, position not valued")
+        return np.nan
+
+    def _fx_rate(self, currency: str) -> float:
+        if currency == self.portfolio.currency:
+            return 1.
+        return float(self._datareader.read_fx(currency_pair=f"{currency}{self.portfolio.currency}").iloc[-1])
+
+    def update(self) -> int:
+        """
+        Fetches the quotes of the open positions and applies them
+
+        :return: number of positions with a new price
+        """
+        quotes = self._quote_source.get_quotes(tickers=self.tickers)
+        return self.on_quotes(quotes=quotes)
+
+    def on_quotes(self, quotes: Dict[str, tuple]) -> int:
+        """
+        Applies a batch of quotes, only the positions in the batch are updated
+
+        :param quotes: dict of ticker: (time, price in the position currency)
+        :return: number of positions with a new price
+        """
+        tickers = [ticker for ticker in quotes if ticker in self._index]
+        if not tickers:
+            return 0
+        idx = np.array([self._index[ticker] for ticker in tickers])
+        prices = np.array([quotes[ticker][1] for ticker in tickers], dtype=float) * self._fx[idx]
+        for ticker in tickers:
+            self._buffers[ticker].append(*quotes[ticker])
+
+        change = np.dot(self._quantities[idx], prices - self._last[idx])
+        self._market_value += change
+        self._day_pnl += change
+        self._last[idx] = prices
+        self.last_update = max(quotes[ticker][0] for ticker in tickers)
+        return len(tickers)
+
+    def run(self, interval: float = 5., iterations: int = None, callback: Callable = None) -> None:
+        """
+        Polls the quote source until interrupted or until the number of iterations is reached
+
+        :param interval: seconds between polls
+        :param iterations: number of polls, None to run until interrupted
+        :param callback: called with this object after every poll
+        :return: None
+        """
+        i = 0
+        try:
+            while iterations is None or i < iterations:
+                try:
+                    self.update()
+                except Exception as ex:
+                    logger.logging.error(f"{self} quotes not updated: {ex}")
+                if callback is not None:
+                    callback(self)
+                i += 1
+                if iterations is None or i < iterations:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            logger.logging.info(f"{self} stopped")
+
+    @property
+    def market_value(self) -> float:
+        """
+        Current market value of the open positions in the portfolio currency
+        """
+        return self._market_value
+
+    @property
+    def day_pnl(self) -> float:
+        """
+        Pnl since the previous close in the portfolio currency
+        """
+        return self._day_pnl
+
+    @property
+    def pct_day_pnl(self) -> float:
+        previous = self._market_value - self._day_pnl
+        return self._day_pnl / previous if previous else 0.
+
+    def prices(self) -> pd.Series:
+        """
+        Last price of the open positions in the portfolio currency
+        """
+        return pd.Series(self._last, index=self.tickers, name='Price')
+
+    def position_weights(self) -> pd.Series:
+        """
+        Current position weights in %
+        """
+        weights = pd.Series(self._quantities * self._last / self._market_value, index=self.tickers)
+        weights.name = 'Position Allocations'
+        return weights
+
+    def position_day_pnl(self) -> pd.Series:
+        """
+        Pnl since the previous close of every open position in the portfolio currency
+        """
+        pnl = pd.Series(self._quantities * (self._last - self._previous_close), index=self.tickers)
+        pnl.name = 'Day Pnl'
+        return pnl
+
+    def quotes(self, ticker: str) -> pd.Series:
+        """
+        Quotes kept for a ticker since the last reset, in the position currency
+
+        :param ticker: Stock ticker
+        :return:
+        """
+        return self._buffers[ticker].to_series()
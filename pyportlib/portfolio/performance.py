@@ -0,0 +1,242 @@
+from datetime import datetime
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+from pyportlib.portfolio.iportfolio import IPortfolio
+
+
+def holdings_values(ptf: IPortfolio, tags: List[str] = None) -> pd.DataFrame:
+    """
+    Value of the positions held at the close of every market date, dates x tickers. Unlike the market_value of a
+    Portfolio, the quantities are the ones held after the trades of the day.
+
+    :param ptf: Portfolio
+    :param tags: only the positions of these tags if given
+    :return:
+    """
+    index = ptf.market_value.index
+    positions = {k: v for k, v in ptf.positions.items() if tags is None or v.tag in tags}
+    values = {ticker: position.quantities.reindex(index, method='ffill').fillna(0).multiply(
+        position.prices.reindex(index, method='ffill')) for ticker, position in positions.items()}
+    return pd.DataFrame(values, index=index).fillna(0.)
+
+
+def account_flows(ptf: IPortfolio) -> pd.Series:
+    """
+    Deposits (positive) and withdrawals (negative) of the cash account, on the first market date where they are in
+    the cash history
+
+    :param ptf: Portfolio
+    :return:
+    """
+    index = ptf.market_value.index
+    changes = ptf.cash_changes
+    if changes.empty or not len(index):
+        return pd.Series(0., index=index)
+    return _on_market_dates(dates=changes.index, amounts=changes['Amount'].values.astype(float), index=index)
+
+
+def tag_flows(ptf: IPortfolio, tags: List[str] = None) -> pd.DataFrame:
+    """
+    Money put in (buys and fees, positive) and taken out (sells and dividends, negative) of the positions of every
+    tag, in the portfolio currency
+
+    :param ptf: Portfolio
+    :param tags: tags to compute, all the tags if None
+    :return: dates x tags
+    """
+    index = ptf.market_value.index
+    position_tags = pd.Series({k: v.tag for k, v in ptf.positions.items()}, dtype=object)
+    if tags is None:
+        tags = list(dict.fromkeys(position_tags.values))
+    trx = ptf.transactions
+    trx = trx.loc[trx.Ticker.isin(position_tags.index) & (trx.Type != 'Split')]
+    if trx.empty or not len(index):
+        return pd.DataFrame(0., index=index, columns=tags)
+
+    # rates from the reader of the portfolio, its cached series are shared with the positions
+    fx = pd.Series(1., index=trx.index)
+    for curr in set(trx.Currency):
+        if curr != ptf.currency:
+            rates = ptf.datareader.read_fx(currency_pair=f"{curr}{ptf.currency}")
+            in_curr = (trx.Currency == curr).values
+            fx.iloc[in_curr] = rates.reindex(trx.index[in_curr], method='ffill').values
+    dividend = (trx.Type == 'Dividend').values
+    amounts = np.where(dividend, -trx.Price.values, trx.Quantity.values * trx.Price.values) * fx.values
+    amounts = amounts + trx.Fees.fillna(0).values * fx.values
+
+    trx_tags = position_tags.reindex(trx.Ticker).values
+    return pd.DataFrame({tag: _on_market_dates(dates=trx.index[trx_tags == tag], amounts=amounts[trx_tags == tag],
+                                               index=index) for tag in tags}, index=index)
+
+
+def _on_market_dates(dates: pd.DatetimeIndex, amounts: np.ndarray, index: pd.DatetimeIndex) -> pd.Series:
+    position = np.minimum(index.searchsorted(pd.DatetimeIndex(dates)), len(index) - 1)
+    flows = np.zeros(len(index))
+    np.add.at(flows, position, amounts)
+    return pd.Series(flows, index=index)
+
+
+def books(ptf: IPortfolio, by_tag: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Values and external flows of an account (positions and cash, flows are the cash changes) or of every tag
+    (positions only, flows are the trades and dividends)
+
+    :param ptf: Portfolio
+    :param by_tag: True for one book by tag
+    :return: values (dates x books), flows (dates x books)
+    """
+    if by_tag:
+        flows = tag_flows(ptf=ptf)
+        positions = holdings_values(ptf=ptf)
+        tags = pd.Series({k: v.tag for k, v in ptf.positions.items()})
+        values = positions.T.groupby(tags.reindex(positions.columns).values).sum().T
+        return values.reindex(columns=flows.columns).fillna(0.), flows
+
+    values = holdings_values(ptf=ptf).sum(axis=1) + ptf.cash_history.reindex(ptf.market_value.index).fillna(0.)
+    return values.to_frame(ptf.account), account_flows(ptf=ptf).to_frame(ptf.account)
+
+
+def time_weighted_returns(values: pd.DataFrame, flows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Daily time-weighted returns of many books at once. Net inflows of a day are invested at the start of the day and
+    net outflows leave at the close, so r = (V - V_prev - F) / (V_prev + max(F, 0)). Chain-linking the daily
+    returns gives the return of the period without the effect of the size and timing of the flows.
+
+    :param values: values at the close, dates x books
+    :param flows: external flows, dates x books
+    :return: dates x books
+    """
+    flows = flows.reindex(index=values.index, columns=values.columns).fillna(0.)
+    v, f = values.values, flows.values
+    previous = np.vstack([np.zeros((1, v.shape[1])), v[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = (v - previous - f) / (previous + np.maximum(f, 0.))
+    returns = np.where(np.isfinite(returns), returns, 0.)
+    return pd.DataFrame(returns, index=values.index, columns=values.columns)
+
+
+def xirr(cash_flows: pd.DataFrame, max_iter: int = 50, tol: float = 1e-10) -> pd.Series:
+    """
+    Annual internal rate of return of many cash flow schedules at once (one column each, investor point of view:
+    money invested is negative). Newton steps are taken on all the columns together, the columns that do not
+    converge are solved by bisection.
+
+    :param cash_flows: dates x schedules
+    :param max_iter: maximum number of Newton steps
+    :param tol: convergence tolerance on the npv, relative to the flows
+    :return: rate by schedule, NaN when there is no rate (ex. flows of the same sign)
+    """
+    cf = cash_flows.fillna(0.).values
+    years = ((cash_flows.index - cash_flows.index[0]).days.values / 365.)[:, None]
+    scale = np.maximum(np.abs(cf).sum(axis=0), 1e-12)
+
+    def npv(rate: np.ndarray) -> np.ndarray:
+        return (cf * (1 + rate) ** -years).sum(axis=0) / scale
+
+    rate = np.full(cf.shape[1], 0.1)
+    for _ in range(max_iter):
+        discount = (1 + rate) ** -years
+        value = (cf * discount).sum(axis=0) / scale
+        slope = (-years * cf * discount / (1 + rate)).sum(axis=0) / scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(slope != 0, value / slope, 0.)
+        rate = np.maximum(rate - step, (rate - 1) / 2)
+        if np.all(np.abs(value) < tol):
+            break
+
+    failed = ~(np.abs(npv(rate)) < tol)
+    if np.any(failed):
+        rate[failed] = _bisect(npv=lambda r: npv(_fill(r, failed, rate))[failed], size=failed.sum(), tol=tol)
+    has_both_signs = (cf > 0).any(axis=0) & (cf < 0).any(axis=0)
+    return pd.Series(np.where(has_both_signs, rate, np.nan), index=cash_flows.columns, name='IRR')
+
+
+def _fill(values: np.ndarray, mask: np.ndarray, base: np.ndarray) -> np.ndarray:
+    full = base.copy()
+    full[mask] = values
+    return full
+
+
+def _bisect(npv, size: int, tol: float, low: float = -0.9999, high: float = 100., n_iter: int = 200) -> np.ndarray:
+    low, high = np.full(size, low), np.full(size, high)
+    npv_low = npv(low)
+    bracketed = np.sign(npv_low) != np.sign(npv(high))
+    for _ in range(n_iter):
+        mid = (low + high) / 2
+        npv_mid = npv(mid)
+        same = np.sign(npv_mid) == np.sign(npv_low)
+        low, npv_low = np.where(same, mid, low), np.where(same, npv_mid, npv_low)
+        high = np.where(same, high, mid)
+        if np.all(np.abs(npv_mid) < tol) or np.all(high - low < 1e-14):
+            break
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def money_weighted_cash_flows(values: pd.DataFrame, flows: pd.DataFrame, start_date: datetime = None,
+                              end_date: datetime = None) -> pd.DataFrame:
+    """
+    Cash flows of the investor in many books over a period: the value before the period is invested at the start,
+    the flows of the period are invested (or taken out) when they happen and the value at the end is taken out
+
+    :param values: values at the close, dates x books
+    :param flows: external flows, dates x books
+    :param start_date: first date of the period, first date if None
+    :param end_date: last date of the period, last date if None
+    :return: dates x books
+    """
+    flows = flows.reindex(index=values.index, columns=values.columns).fillna(0.)
+    values, flows = values.loc[:end_date], flows.loc[:end_date]
+    period = values.loc[start_date:].index
+    before = values.index[values.index < period[0]]
+
+    cash_flows = -flows.loc[period].copy()
+    if len(before):
+        cash_flows.iloc[0] -= values.loc[before[-1]]
+    cash_flows.iloc[-1] += values.iloc[-1]
+    return cash_flows
+
+
+def money_weighted_returns(ptfs: List[IPortfolio], start_date: datetime = None, end_date: datetime = None,
+                           by_tag: bool = False) -> pd.Series:
+    """
+    Money-weighted (XIRR) annual return of many accounts, or of every tag of many accounts, solved together
+
+    :param ptfs: portfolios
+    :param start_date: first date of the period, first date of each account if None
+    :param end_date: last date of the period, last date of each account if None
+    :param by_tag: True for the return of every tag of every account
+    :return: rate by account, or by (account, tag)
+    """
+    schedules = {}
+    for ptf in ptfs:
+        values, flows = books(ptf=ptf, by_tag=by_tag)
+        if values.empty:
+            continue
+        cash_flows = money_weighted_cash_flows(values=values, flows=flows, start_date=start_date, end_date=end_date)
+        for book in cash_flows.columns:
+            schedules[(ptf.account, book) if by_tag else ptf.account] = cash_flows[book]
+    if not schedules:
+        return pd.Series(dtype=float, name='IRR')
+    return xirr(cash_flows=pd.DataFrame(schedules).sort_index().fillna(0.))
+
+
+def portfolio_time_weighted_returns(ptf: IPortfolio, start_date: datetime = None, end_date: datetime = None,
+                                    tags: List[str] = None) -> pd.Series:
+    """
+    Daily time-weighted returns of an account (positions and cash) or of some of its tags (positions only)
+
+    :param ptf: Portfolio
+    :param start_date: start date of series
+    :param end_date: end date of series
+    :param tags: tags to compute the returns of together, the whole account if None
+    :return:
+    """
+    values, flows = books(ptf=ptf, by_tag=tags is not None)
+    if tags is not None:
+        values = values.reindex(columns=tags).fillna(0.).sum(axis=1).to_frame(ptf.account)
+        flows = flows.reindex(columns=tags).fillna(0.).sum(axis=1).to_frame(ptf.account)
+    returns = time_weighted_returns(values=values, flows=flows)[values.columns[0]]
+    returns.name = ptf.account
+    return returns.loc[start_date:end_date]
@@ -1,17 +1,23 @@
 from datetime import datetime
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Tuple
 import numpy as np
 import pandas as pd
 
 import pyportlib.create
+from pyportlib import rebalancing
+from pyportlib.portfolio import currency as currency_lib, performance, scenarios as scenarios_lib
 from pyportlib.portfolio.iportfolio import IPortfolio
 from pyportlib.position.iposition import IPosition
 from pyportlib.services.cash_manager import CashManager
 from pyportlib.services.data_reader import DataReader
 from pyportlib.services.fx_rates import FxRates
+from pyportlib.services import data_refresh
+from pyportlib.services.portfolio_snapshot import PortfolioSnapshot
 from pyportlib.services.position_tagging import PositionTagging
+from pyportlib.services.refresh_planner import RefreshPlanner
+from pyportlib.services.tax_lots import TaxLots
 from pyportlib.services.transaction_manager import TransactionManager
-from pyportlib.utils import dates_utils, logger, time_series
+from pyportlib.utils import dates_utils, df_utils, logger, time_series
 from pyportlib.utils.time_series import ITimeSeries
 from pyportlib.services.interfaces.icash_change import ICashChange
 from pyportlib.services.interfaces.itransaction import ITransaction
@@ -23,13 +29,17 @@ class Portfolio(IPortfolio, ITimeSeries):
                  datareader: DataReader,
                  transaction_manager: TransactionManager,
                  cash_manager: CashManager,
-                 fx: FxRates):
+                 fx: FxRates,
+                 snapshot: PortfolioSnapshot = None,
+                 compact: bool = False):
         # attributes
         self.account = account
+        self.compact = compact
         self._positions = {}
         self.currency = currency.upper()
         self._market_value = pd.Series()
         self._cash_history = pd.Series()
+        self._tax_lots: Dict[str, Dict[str, TaxLots]] = {}
 
         # services
         self._cash_manager = cash_manager
@@ -37,11 +47,14 @@ class Portfolio(IPortfolio, ITimeSeries):
         self._transaction_manager = transaction_manager
         self._position_tags: PositionTagging
         self._fx = fx
+        self._snapshot = snapshot
 
         self.start_date = None
-        # load data        
-        self.load_data()
-        self._load_cash_history()
+        # load data
+        if not self._load_snapshot():
+            self.load_data()
+            self._load_cash_history()
+            self._save_snapshot()
 
     def __repr__(self):
         return self.account
@@ -64,16 +77,85 @@ class Portfolio(IPortfolio, ITimeSeries):
 
         logger.logging.debug(f'{self.account} data loaded')
 
-    def update_data(self, fundamentals_and_dividends: bool = False) -> None:
+    def _snapshot_key(self) -> str:
+        return self._snapshot.key(currency=self.currency,
+                                  tickers=self._transaction_manager.all_tickers(),
+                                  currencies=self._transaction_manager.get_currencies())
+
+    def _load_snapshot(self) -> bool:
         """
-        Updates all of the market data of the portfolio (prices, fx)
+        Loads the portfolio from its snapshot if none of the inputs changed since it was saved
 
-        :param fundamentals_and_dividends: True to update all statement and dividend data
-        :return:
+        :return: True if the portfolio was loaded from the snapshot
+        """
+        if self._snapshot is None:
+            return False
+
+        state = self._snapshot.load(key=self._snapshot_key())
+        if state is None:
+            return False
+
+        self.start_date = self._transaction_manager.first_transaction()
+        # the fx rates are not in the snapshot, the pnl needs them to convert the transactions
+        self._fx.set_pairs(pairs=[f"{curr}{self.currency}" for curr in self._transaction_manager.get_currencies()])
+        position_tags = self._position_tags()
+        self._positions = {}
+        for ticker, prices in state["prices"].items():
+            currency = self._transaction_manager.get_currency(ticker=ticker)
+            local_prices = state["local_prices"].get(ticker)
+            if self.compact:
+                # the snapshot keeps float64 prices, they are compacted like the prices of a cold build
+                prices = df_utils.compact_prices(prices)
+                local_prices = None if local_prices is None else df_utils.compact_prices(local_prices)
+            pos = pyportlib.create.position(ticker, local_currency=currency, tag=position_tags.get(ticker), prices=prices,
+                                            compact=self.compact, local_prices=local_prices)
+            pos.quantities = state["quantities"][ticker]
+            self._positions[ticker] = pos
+        self._market_value = state["market_value"]
+        self._cash_history = state["cash_history"]
+
+        logger.logging.debug(f'{self.account} loaded from snapshot')
+        return True
+
+    def _save_snapshot(self) -> None:
+        if self._snapshot is None:
+            return
+        self._snapshot.save(key=self._snapshot_key(),
+                            market_value=self._market_value,
+                            cash_history=self._cash_history,
+                            prices={k: v.prices for k, v in self._positions.items()},
+                            quantities={k: v.quantities for k, v in self._positions.items()},
+                            local_prices={k: v.local_prices for k, v in self._positions.items()
+                                          if v.local_prices is not v.prices})
+
+    def reload(self) -> None:
+        """
+        Loads the portfolio again after its inputs changed and saves the new state in the snapshot
+
+        :return: None
         """
-        self._update_positions(fundamentals_and_dividends=fundamentals_and_dividends)
-        self._update_fx()
         self.load_data()
+        self._load_cash_history()
+        self._save_snapshot()
+
+    def update_data(self, fundamentals_and_dividends: bool = False, force: bool = False) -> None:
+        """
+        Updates the market data of the portfolio (prices, fx) that is stale, see RefreshPlanner
+
+        :param fundamentals_and_dividends: True to update the statement and dividend data
+        :param force: True to update all of the market data
+        :return:
+        """
+        if force:
+            with self._datareader.catalog.batch():
+                self._update_positions(fundamentals_and_dividends=fundamentals_and_dividends)
+                self._update_fx()
+        else:
+            tickers, pairs, closed = data_refresh.holdings([self])
+            RefreshPlanner(datareader=self._datareader).refresh(tickers=tickers, pairs=pairs | set(self._fx.pairs),
+                                                                closed=closed,
+                                                                fundamentals_and_dividends=fundamentals_and_dividends)
+        self.reload()
         logger.logging.info(f'{self.account} updated')
 
     def _update_fx(self) -> None:
@@ -149,25 +231,33 @@ class Portfolio(IPortfolio, ITimeSeries):
         tickers = self._transaction_manager.all_tickers()
         position_tags = self._position_tags()
 
+        foreign = {}
         for ticker in tickers:
             currency = self._transaction_manager.get_currency(ticker=ticker)
-            pos = pyportlib.create.position(ticker, local_currency=currency, tag=position_tags.get(ticker))
-
+            pos = pyportlib.create.position(ticker, local_currency=currency, tag=position_tags.get(ticker),
+                                            compact=self.compact)
             if self.currency != pos.currency:
-                fx = self._fx.get(f"{pos.currency}{self.currency}")
-                prices = pos.prices.multiply(fx, fill_value=None).dropna()
-
-                if pos.prices.index[-1] != fx.index[-1]:
-                    prices.loc[pos.prices.index[-1]] = pos.prices.iloc[-1] * fx.iloc[-1]
-
-                pos.prices = prices
+                foreign.setdefault(pos.currency, []).append(pos)
             self._positions[ticker] = pos
+
+        # positions of the same currency are converted together, their local prices are kept
+        for currency, positions in foreign.items():
+            converted = self._fx.convert(prices={pos.ticker: pos.local_prices for pos in positions},
+                                         currency=currency)
+            for pos in positions:
+                if pos.ticker in converted:
+                    prices = converted[pos.ticker]
+                    pos.prices = df_utils.compact_prices(prices) if self.compact else prices
         logger.logging.debug(f'positions for {self.account} loaded')
 
     @property
     def positions(self) -> Dict[str, Union[IPosition, ITimeSeries]]:
         return self._positions
 
+    @property
+    def datareader(self) -> DataReader:
+        return self._datareader
+
     def _load_position_quantities(self) -> None:
         """
         Based on the transaction data, loads all of the active and closed positions
@@ -214,7 +304,7 @@ class Portfolio(IPortfolio, ITimeSeries):
                         self._transaction_manager.add_split(transaction=trx)
                     else:
                         self._transaction_manager.add(transaction=trx)
-            self.load_data()
+            self.reload()
 
     @property
     def transactions(self) -> pd.DataFrame:
@@ -247,8 +337,7 @@ class Portfolio(IPortfolio, ITimeSeries):
         if cash_changes:
             self._cash_manager.add(cash_changes)
             logger.logging.debug(f'cash change for {self.account} have been added')
-            self.load_data()
-            self._load_cash_history()
+            self.reload()
 
     def cash(self, date: datetime = None) -> float:
         """
@@ -374,6 +463,100 @@ class Portfolio(IPortfolio, ITimeSeries):
         pnl.name = self.account
         return pnl
 
+    def scenario_returns(self, scenarios: pd.DataFrame, start_date: datetime = None, end_date: datetime = None,
+                         include_cash: bool = False) -> pd.DataFrame:
+        """
+        Returns in % of market value of many what-if scenarios at once. The positions pnl and market values are
+        computed once, each scenario is then a weighted sum of them.
+
+        :param scenarios: weight of every position in every scenario, scenarios x tickers (1 included, 0 excluded or
+        any multiplier). See scenarios.exclusion_masks, scenarios.leave_one_out and scenarios.tag_masks
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: scenarios x dates
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return scenarios_lib.evaluate(ptf=self, masks=scenarios, start_date=start_date, end_date=end_date,
+                                      include_cash=include_cash)
+
+    def currency_decomposition(self, start_date: datetime = None, end_date: datetime = None,
+                               include_cash: bool = False) -> pd.DataFrame:
+        """
+        Daily pnl and returns split into asset and currency. See currency.pnl_decomposition for the pnl of every
+        position.
+
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: dates x (asset_pnl, currency_pnl, total_pnl, asset, currency, total)
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return currency_lib.portfolio_decomposition(ptf=self, start_date=start_date, end_date=end_date,
+                                                    include_cash=include_cash)
+
+    def hedged_returns(self, hedges: Union[pd.DataFrame, Dict[str, float]], start_date: datetime = None,
+                       end_date: datetime = None, include_cash: bool = False) -> pd.DataFrame:
+        """
+        Returns in % of market value with part of the currency exposure hedged, for many hedge scenarios at once
+
+        :param hedges: hedge ratio of every currency in every scenario, scenarios x currencies (0 unhedged, 1 fully
+        hedged), or a dict of hedge ratio by currency
+        :param start_date: start date of series (if only param, end_date is last date)
+        :param end_date: start date of series (if only param, end_date the only date given in series)
+        :param include_cash: If we include the cash amount at that time to calc the market value
+        :return: scenarios x dates
+        """
+        if end_date is None:
+            end_date = self._datareader.last_data_point(ptf_currency=self.currency)
+        if start_date is None:
+            start_date = end_date
+        return currency_lib.hedged_returns(ptf=self, hedges=hedges, start_date=start_date, end_date=end_date,
+                                           include_cash=include_cash)
+
+    def tax_lots(self, method: str = "fifo",
+                 specific_lots: Dict[str, Dict[Union[Tuple[datetime, int], datetime], List[int]]] = None) -> Dict[str, TaxLots]:
+        """
+        Acquisition lots of every position. The lots are kept between calls and only the transactions added since
+        the last call are applied.
+
+        :param method: lot relief method, fifo, lifo, average or specific
+        :param specific_lots: by ticker, the lot ids to relieve by sell for the specific method, a sell is identified
+        by its date and its position among the trades of the date, see TaxLots.update
+        :return: TaxLots by ticker
+        """
+        lots = self._tax_lots.setdefault(method.lower(), {})
+        transactions = self.transactions
+        for ticker, position in self.positions.items():
+            if ticker not in lots:
+                fx = None if position.currency == self.currency else self._fx.get(f'{position.currency}{self.currency}')
+                lots[ticker] = TaxLots(ticker=ticker, method=method, fx=fx)
+            lots[ticker].update(transactions=transactions.loc[transactions.Ticker == ticker],
+                                specific_lots=(specific_lots or {}).get(ticker))
+        return lots
+
+    def realized_gains(self, start_date: datetime = None, end_date: datetime = None, method: str = "fifo") -> pd.DataFrame:
+        """
+        Realized gains ledger of all the positions, cost basis from the acquisition lots
+
+        :param start_date: start date of the ledger
+        :param end_date: end date of the ledger
+        :param method: lot relief method, fifo, lifo, average or specific
+        :return: one row per lot relieved, with the Ticker
+        """
+        ledgers = [lots.realized.assign(Ticker=ticker) for ticker, lots in self.tax_lots(method=method).items()]
+        ledgers = [ledger for ledger in ledgers if not ledger.empty]
+        if not ledgers:
+            return pd.DataFrame(columns=['Ticker'] + TaxLots.LEDGER[1:])
+        ledger = pd.concat(ledgers).sort_index()
+        return ledger[['Ticker'] + TaxLots.LEDGER[1:]].loc[start_date:end_date]
+
     def reset(self) -> None:
         """
         Resets transactions and cash flows from the portfolio object and erases the saved csv files associated to
@@ -383,8 +566,11 @@ class Portfolio(IPortfolio, ITimeSeries):
         """
         self._transaction_manager.reset()
         self._cash_manager.reset()
+        self._tax_lots = {}
         self._position_tags().reset()
         self._fx.reset()
+        if self._snapshot is not None:
+            self._snapshot.reset()
         self.load_data()
 
     def corr(self, lookback: str = None, end_date: datetime = None, start_date: datetime = None):
@@ -408,22 +594,9 @@ class Portfolio(IPortfolio, ITimeSeries):
         if date is None:
             date = self._datareader.last_data_point(ptf_currency=self.currency)
 
-        port_mv = self.market_value.loc[date]
-
-        weights = pd.Series(name='Position Allocations')
-        open_positions = self.open_positions(date=date)
-
-        for k, v in open_positions.items():
-            try:
-                weights[k] = v.npv().loc[date]
-            except KeyError:
-                try:
-                    _date = date - dates_utils.bday(1)
-                    weights[k] = v.npv().loc[_date]
-                except KeyError:
-                    logger.logging.error(f"no data for {k}")
-
-        weights /= port_mv
+        quantities, values = rebalancing.holdings(positions=self._positions, date=date)
+        weights = values.loc[quantities.round() != 0] / self.market_value.asof(date)
+        weights.name = 'Position Allocations'
         if not 0.99 < weights.sum() < 1.01:
             logger.logging.error(f"Weights do not add to 1: {weights.sum()}")
         return weights
@@ -438,22 +611,11 @@ class Portfolio(IPortfolio, ITimeSeries):
         if date is None:
             date = self._datareader.last_data_point(ptf_currency=self.currency)
 
-        port_mv = self.market_value.loc[date]
-        tags = self.position_tags()
-        weights = pd.Series(name='Strategy Allocations', index=tags, data=[0 for _ in range(len(tags))])
-
-        open_positions = self.open_positions(date=date)
-        for k, v in open_positions.items():
-            try:
-                weights[v.tag] += v.npv().loc[date]
-            except KeyError:
-                try:
-                    _date = date - dates_utils.bday(1)
-                    weights[v.tag] += v.npv().loc[_date]
-                except KeyError:
-                    pass
-
-        weights /= port_mv
+        quantities, values = rebalancing.holdings(positions=self._positions, date=date)
+        values = values.loc[quantities.round() != 0]
+        tags = pd.Series({k: v.tag for k, v in self._positions.items()}).reindex(values.index)
+        weights = values.groupby(tags).sum().reindex(self.position_tags()).fillna(0) / self.market_value.asof(date)
+        weights.name = 'Strategy Allocations'
         if not 0.999 < weights.sum() < 1.001:
             logger.logging.error(f"Weights do not add to 1: {weights.sum()}")
         return weights
@@ -482,15 +644,31 @@ class Portfolio(IPortfolio, ITimeSeries):
         prices = {k: time_series.prep_returns(v, lookback=lookback, end_date=end_date, start_date=start_date) for k, v in open_positions.items()}
         return pd.DataFrame(prices).fillna(0)
 
+    def time_weighted_returns(self, start_date: datetime = None, end_date: datetime = None,
+                              tags: List[str] = None) -> pd.Series:
+        """
+        Daily time-weighted returns: deposits and withdrawals (or the trades of the tags) are taken out of the
+        returns on the day they happen, so chain-linked returns are not distorted by the flows
+
+        :param start_date: start date of series
+        :param end_date: end date of series
+        :param tags: tags to compute the returns of (positions only), the whole account with its cash if None
+        :return:
+        """
+        return performance.portfolio_time_weighted_returns(ptf=self, start_date=start_date, end_date=end_date,
+                                                           tags=tags)
+
     def returns(self, start_date: datetime, end_date: datetime, **kwargs):
         """
         Implementation of the returns method of the ITimeSeries
 
         :param start_date: datetime
         :param end_date: datetime
-        :param kwargs:
+        :param kwargs: method 'twr' for time-weighted returns (with tags), pct_daily_total_pnl kwargs otherwise
         :return:
         """
+        if kwargs.get("method") == "twr":
+            return self.time_weighted_returns(start_date=start_date, end_date=end_date, tags=kwargs.get("tags"))
 
         include_cash = kwargs.get("include_cash") if kwargs.get("include_cash") is not None else False
 
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+from pyportlib.portfolio.iportfolio import IPortfolio
+
+
+def exclusion_masks(tickers: List[str], exclusions: Dict[str, List[str]]) -> pd.DataFrame:
+    """
+    Scenarios excluding positions, like positions_to_exclude
+
+    :param tickers: tickers of the portfolio
+    :param exclusions: scenario name: tickers to exclude
+    :return: masks, scenarios x tickers
+    """
+    masks = pd.DataFrame(1., index=list(exclusions.keys()), columns=tickers)
+    for name, excluded in exclusions.items():
+        masks.loc[name, masks.columns.isin(excluded)] = 0.
+    return masks
+
+
+def leave_one_out(tickers: List[str]) -> pd.DataFrame:
+    """
+    One scenario per position, excluding only that position
+
+    :param tickers: tickers of the portfolio
+    :return: masks, scenarios x tickers
+    """
+    return pd.DataFrame(1. - np.eye(len(tickers)), index=tickers, columns=tickers)
+
+
+def tag_masks(position_tags: Dict[str, str], tag_sets: Dict[str, List[str]]) -> pd.DataFrame:
+    """
+    Scenarios keeping only the positions of some tags, like tags
+
+    :param position_tags: ticker: tag
+    :param tag_sets: scenario name: tags to keep
+    :return: masks, scenarios x tickers
+    """
+    tags = pd.Series(position_tags)
+    return pd.DataFrame({name: tags.isin(kept).astype(float) for name, kept in tag_sets.items()}).T
+
+
+def position_market_values(ptf: IPortfolio) -> pd.DataFrame:
+    """
+    Daily market value of every position, dates x tickers. Summed over the tickers it is the market value of the
+    portfolio.
+
+    :param ptf: Portfolio
+    :return:
+    """
+    index = ptf.market_value.index
+    values = {}
+    for ticker, position in ptf.positions.items():
+        quantities = position.quantities.shift(1).fillna(method="backfill")
+        values[ticker] = quantities.multiply(position.prices.loc[ptf.start_date:]).reindex(index)
+    return pd.DataFrame(values, index=index).fillna(method='ffill').fillna(0)
+
+
+def scenario_pnl(pnl: pd.DataFrame, masks: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pnl of every scenario from the pnl of the positions, in one matrix product
+
+    :param pnl: daily pnl of the positions, dates x tickers
+    :param masks: weight of every position in every scenario (1 included, 0 excluded, or any multiplier),
+    scenarios x tickers. Tickers missing from the masks are excluded.
+    :return: scenarios x dates
+    """
+    masks = masks.reindex(columns=pnl.columns).fillna(0.)
+    return pd.DataFrame(masks.values @ pnl.values.T, index=masks.index, columns=pnl.index)
+
+
+def scenario_returns(pnl: pd.DataFrame, market_values: pd.DataFrame, masks: pd.DataFrame,
+                     cash: pd.Series = None) -> pd.DataFrame:
+    """
+    Returns of every scenario in % of the scenario market value, as pct_daily_total_pnl
+
+    :param pnl: daily pnl of the positions, dates x tickers
+    :param market_values: daily market value of the positions, dates x tickers
+    :param masks: weight of every position in every scenario, scenarios x tickers
+    :param cash: cash history added to the market value of every scenario, None to exclude the cash
+    :return: scenarios x dates
+    """
+    market_values = market_values.reindex(index=pnl.index, columns=pnl.columns).fillna(0.)
+    values = scenario_pnl(pnl=market_values, masks=masks)
+    if cash is not None:
+        values = values + cash.reindex(pnl.index).fillna(0.).values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = scenario_pnl(pnl=pnl, masks=masks) / values
+    return returns.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+def evaluate(ptf: IPortfolio, masks: pd.DataFrame, start_date: datetime = None, end_date: datetime = None,
+             include_cash: bool = False) -> pd.DataFrame:
+    """
+    Returns of many what-if scenarios of a portfolio. The pnl and market value of the positions are computed once
+    and shared by all the scenarios.
+
+    :param ptf: Portfolio
+    :param masks: weight of every position in every scenario, scenarios x tickers
+    :param start_date: start date of series (if only param, end_date is last date)
+    :param end_date: end date of series
+    :param include_cash: If we include the cash amount at that time to calc the market value
+    :return: scenarios x dates
+    """
+    pnl = ptf.daily_total_pnl(start_date=start_date, end_date=end_date)
+    if pnl.empty:
+        return pd.DataFrame(index=masks.index)
+    market_values = position_market_values(ptf=ptf)
+    cash = ptf.cash_history if include_cash else None
+    return scenario_returns(pnl=pnl, market_values=market_values, masks=masks, cash=cash)
@@ -57,6 +57,18 @@ class IPosition(ABC):
         """
         """
 
+    @property
+    @abstractmethod
+    def local_prices(self) -> pd.Series:
+        """
+        """
+
+    @local_prices.setter
+    @abstractmethod
+    def local_prices(self, prices: pd.Series) -> None:
+        """
+        """
+
     @property
     @abstractmethod
     def quantities(self) -> pd.Series:
@@ -1,9 +1,10 @@
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 from pyportlib.position.iposition import IPosition
 from pyportlib.services.data_reader import DataReader
-from pyportlib.utils import logger, dates_utils
+from pyportlib.utils import logger, dates_utils, df_utils
 from pyportlib.utils.time_series import ITimeSeries
 
 
@@ -13,13 +14,22 @@ class Position(IPosition, ITimeSeries):
                  datareader: DataReader,
                  local_currency: str = None,
                  tag: str = None,
+                 prices: pd.Series = None,
+                 compact: bool = False,
+                 local_prices: pd.Series = None
                  ):
         self.ticker = ticker.upper()
         self._tag = tag
         self._datareader = datareader
+        self._compact = compact
         self._prices = pd.Series()
         self._quantities = pd.Series()
-        self._load_prices()
+        if prices is None:
+            self._load_prices()
+        else:
+            # already computed prices, ex. from a portfolio snapshot
+            self._prices = prices
+        self._local_prices = self._prices if local_prices is None else local_prices
 
         if local_currency is None:
             self.currency = 'CAD' if ticker[-2:] == 'TO' else 'USD'
@@ -88,8 +98,13 @@ class Position(IPosition, ITimeSeries):
         return self._datareader.read_dividends(ticker=self.ticker)
 
     def _load_prices(self):
-        self._prices = self._datareader.read_prices(ticker=self.ticker).astype(float).sort_index()
+        # read_prices already returns a copy, the prices are only copied again when their dtype or order changes
+        prices = self._datareader.read_prices(ticker=self.ticker)
+        if not prices.index.is_monotonic_increasing:
+            prices = prices.sort_index()
+        self._prices = df_utils.compact_prices(prices) if self._compact else prices.astype(float, copy=False)
         self._prices.name = self.ticker
+        self._local_prices = self._prices
 
     def npv(self) -> pd.Series:
         return self.prices.multiply(self.quantities).dropna()
@@ -102,6 +117,17 @@ class Position(IPosition, ITimeSeries):
     def prices(self, prices: pd.Series) -> None:
         self._prices = prices
 
+    @property
+    def local_prices(self) -> pd.Series:
+        """
+        Prices in the currency of the position, the same Series as prices until they are converted by a portfolio
+        """
+        return self._local_prices
+
+    @local_prices.setter
+    def local_prices(self, prices: pd.Series) -> None:
+        self._local_prices = prices
+
     @property
     def quantities(self) -> pd.Series:
         if not self._quantities.empty:
@@ -149,6 +175,7 @@ class Position(IPosition, ITimeSeries):
         if not transactions.empty:
             transactions = transactions[transactions.index <= end_date].reset_index()
             ptf_currency = list(fx.keys())[0][3:]
+            bought = set()
             for trx_idx in range(len(transactions)):
                 trx = transactions.iloc[trx_idx]
                 if trx.Type == "Split":
@@ -167,15 +194,18 @@ class Position(IPosition, ITimeSeries):
                     break
 
                 if trx.Type == 'Buy':
-                    new_qty = (trx.Quantity + start_qty)
-                    daily_avg_cost = (trx.Quantity * (trx.Price * trx_fx) + start_qty * daily_avg_cost) / new_qty
-                    pnl.loc[trx.Date, 'unrealized'] = (self._prices.loc[trx.Date] - daily_avg_cost) * new_qty
+                    # (price - average cost of the day) * new quantity, split into the price change of the quantity
+                    # held at the open and the gain of every buy, so many buys on the same day add up
+                    if trx.Date not in bought:
+                        pnl.loc[trx.Date, 'unrealized'] = (self._prices.loc[trx.Date] - daily_avg_cost) * start_qty
+                        bought.add(trx.Date)
+                    pnl.loc[trx.Date, 'unrealized'] += (self._prices.loc[trx.Date] - trx.Price * trx_fx) * trx.Quantity
                 elif trx.Type == 'Sell':
                     realized = (daily_avg_cost - (trx.Price * trx_fx)) * trx.Quantity
                     pnl.loc[trx.Date, 'realized'] += realized
 
                 elif trx.Type == 'Dividend':
-                    pnl.loc[trx.Date, 'dividend'] = trx.Price * trx_fx
+                    pnl.loc[trx.Date, 'dividend'] += trx.Price * trx_fx
                 pnl.loc[trx.Date, 'total'] -= trx.Fees
         pnl.loc[:, 'total'] = pnl[['unrealized', 'realized', 'dividend', 'total']].sum(axis=1)
 
@@ -203,7 +233,20 @@ class Position(IPosition, ITimeSeries):
         Implementation of the returns method of the ITimeSeries
         :param start_date: datetime
         :param end_date: datetime
-        :param kwargs:
+        :param kwargs: interval: intraday returns at this interval (ex. '5min') from the saved intraday bars,
+        overnight returns are excluded
         :return:
         """
+        interval = kwargs.get("interval")
+        if interval is not None:
+            return self._intraday_returns(start_date=start_date, end_date=end_date, interval=interval)
         return self.prices.loc[start_date:end_date].pct_change().fillna(0)
+
+    def _intraday_returns(self, start_date: datetime, end_date: datetime, interval: str) -> pd.Series:
+        close = self._datareader.read_intraday(ticker=self.ticker, start_date=start_date, end_date=end_date,
+                                               interval=interval)['Close'].astype(float)
+        returns = close.pct_change()
+        days = close.index.normalize().values
+        returns.loc[np.r_[True, days[1:] != days[:-1]]] = 0.
+        returns.name = self.ticker
+        return returns.fillna(0)
@@ -0,0 +1,176 @@
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+
+import pyportlib.create
+from pyportlib.portfolio.iportfolio import IPortfolio
+from pyportlib.position.iposition import IPosition
+from pyportlib.services.interfaces.itransaction import ITransaction
+from pyportlib.utils import logger
+
+
+def holdings_values(positions: Dict[str, IPosition], date: datetime) -> pd.Series:
+    """
+    Value of every position on a date, quantities times prices taken from the holdings matrix in one step
+
+    :param positions: positions by ticker, prices in the portfolio currency
+    :param date: datetime, the last available data before the date is used on non market days
+    :return: values by ticker
+    """
+    return holdings(positions=positions, date=date)[1]
+
+
+def holdings_quantities(positions: Dict[str, IPosition], date: datetime) -> pd.Series:
+    """
+    Quantity of every position on a date
+
+    :param positions: positions by ticker
+    :param date: datetime
+    :return: quantities by ticker
+    """
+    if not positions:
+        return pd.Series(dtype=float)
+    return _asof(positions, 'quantities', date=date)
+
+
+def holdings(positions: Dict[str, IPosition], date: datetime) -> Tuple[pd.Series, pd.Series]:
+    """
+    Quantity and value of every position on a date, the quantities matrix is built once for both
+
+    :param positions: positions by ticker, prices in the portfolio currency
+    :param date: datetime, the last available data before the date is used on non market days
+    :return: quantities by ticker, values by ticker
+    """
+    if not positions:
+        return pd.Series(dtype=float), pd.Series(dtype=float)
+    quantities = holdings_quantities(positions=positions, date=date)
+    return quantities, quantities * _asof(positions, 'prices', date=date)
+
+
+def _asof(positions: Dict[str, IPosition], attribute: str, date: datetime) -> pd.Series:
+    frame = pd.DataFrame({k: getattr(v, attribute) for k, v in positions.items()}).sort_index().ffill()
+    frame = frame.loc[:date]
+    if frame.empty:
+        return pd.Series(0., index=list(positions.keys()))
+    return frame.iloc[-1].fillna(0.)
+
+
+def rebalance(ptf: IPortfolio, target_weights: Union[Dict[str, float], pd.Series], date: datetime = None,
+              by_tag: bool = False, lot_size: Union[int, Dict[str, int]] = 1, fee_per_trade: float = 0.,
+              fee_rate: float = 0., max_turnover: float = None, min_trade_value: float = 0.,
+              cash_buffer: float = 0., include_cash: bool = True) -> List[ITransaction]:
+    """
+    Trades that bring a portfolio to target weights. Positions not in the targets are sold. Sells are returned
+    first so the transactions can be given as is to add_transaction.
+
+    :param ptf: Portfolio
+    :param target_weights: target weight by ticker, or by tag if by_tag
+    :param date: date of the trades, last market value date if None
+    :param by_tag: True if the targets are strategy tags weights, the weight of a tag is split between its positions
+    in proportion of their current value (equally if none are held)
+    :param lot_size: quantities are multiples of the lot size, for all or by ticker
+    :param fee_per_trade: fixed fee of every trade, in the currency of the position
+    :param fee_rate: fee in % of the value of every trade
+    :param max_turnover: maximum value traded in % of the portfolio value, all the trades are scaled down to respect it
+    :param min_trade_value: trades worth less than this value (portfolio currency) are dropped
+    :param cash_buffer: % of the portfolio value kept in cash
+    :param include_cash: True to invest the available cash, False to only reallocate the market value
+    :return: list of Transaction
+    """
+    if date is None:
+        date = ptf.market_value.index[-1]
+
+    target = pd.Series(target_weights, dtype=float)
+    if by_tag:
+        target = _tag_to_position_weights(ptf=ptf, tag_weights=target, date=date)
+
+    tickers = list(dict.fromkeys(list(ptf.positions.keys()) + list(target.index)))
+    currencies, local_prices, prices = [], [], []
+    for ticker in tickers:
+        currency, local_price, price = _prices(ptf=ptf, ticker=ticker, date=date)
+        currencies.append(currency)
+        local_prices.append(local_price)
+        prices.append(price)
+    local_prices, prices = np.array(local_prices, dtype=float), np.array(prices, dtype=float)
+
+    quantities = holdings_quantities(positions=ptf.positions, date=date)
+    quantities = quantities.reindex(tickers).fillna(0.).values
+    fx = np.divide(prices, local_prices, out=np.ones_like(prices), where=local_prices > 0)
+    lots = np.array([lot_size.get(t, 1) if isinstance(lot_size, dict) else lot_size for t in tickers], dtype=float)
+    weights = target.reindex(tickers).fillna(0.).values
+
+    values = quantities * prices
+    cash = ptf.cash(date=date)
+    total = values.sum() + (cash if include_cash else 0.)
+
+    trade_values = weights * total * (1 - cash_buffer) - values
+    trade_values[np.abs(trade_values) < min_trade_value] = 0.
+    turnover = np.abs(trade_values).sum() / total if total else 0.
+    if max_turnover is not None and turnover > max_turnover:
+        trade_values *= max_turnover / turnover
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trades = np.nan_to_num(np.trunc(trade_values / prices / lots)) * lots
+    trades = np.maximum(trades, -quantities)
+    fees = _fees(trades=trades, local_prices=local_prices, fee_per_trade=fee_per_trade, fee_rate=fee_rate)
+
+    spent = (trades * prices).sum() + (fees * fx).sum()
+    available = cash - cash_buffer * total
+    if spent > available:
+        buys = trades > 0
+        sells_cash = -(trades[~buys] * prices[~buys]).sum() - (fees[~buys] * fx[~buys]).sum()
+        buys_cost = (trades[buys] * prices[buys]).sum() + (fees[buys] * fx[buys]).sum()
+        scale = max(available + sells_cash, 0.) / buys_cost if buys_cost else 0.
+        trades[buys] = np.floor(trades[buys] * scale / lots[buys]) * lots[buys]
+        fees = _fees(trades=trades, local_prices=local_prices, fee_per_trade=fee_per_trade, fee_rate=fee_rate)
+        logger.logging.info(f"{ptf.account}: buys scaled down by {scale:.4f}, not enough cash")
+
+    order = np.argsort(trades > 0, kind='stable')
+    transactions = []
+    for i in order:
+        if trades[i] == 0:
+            continue
+        transactions.append(pyportlib.create.transaction(date=pd.Timestamp(date).to_pydatetime(),
+                                                         ticker=tickers[i],
+                                                         transaction_type='Buy' if trades[i] > 0 else 'Sell',
+                                                         quantity=float(trades[i]),
+                                                         price=float(local_prices[i]),
+                                                         fees=float(fees[i]),
+                                                         currency=currencies[i]))
+    return transactions
+
+
+def _fees(trades: np.ndarray, local_prices: np.ndarray, fee_per_trade: float, fee_rate: float) -> np.ndarray:
+    return np.where(trades != 0, fee_per_trade + fee_rate * np.abs(trades) * local_prices, 0.)
+
+
+def _tag_to_position_weights(ptf: IPortfolio, tag_weights: pd.Series, date: datetime) -> pd.Series:
+    values = holdings_values(positions=ptf.positions, date=date)
+    tags = pd.Series({k: v.tag for k, v in ptf.positions.items()})
+    weights = pd.Series(0., index=tags.index)
+    for tag, weight in tag_weights.items():
+        in_tag = tags.loc[tags == tag].index
+        if not len(in_tag):
+            logger.logging.error(f"{ptf.account}: no positions with tag {tag}")
+            continue
+        tag_values = values.reindex(in_tag).fillna(0.).clip(lower=0.)
+        share = tag_values / tag_values.sum() if tag_values.sum() > 0 else pd.Series(1. / len(in_tag), index=in_tag)
+        weights.loc[in_tag] = share * weight
+    return weights
+
+
+def _prices(ptf: IPortfolio, ticker: str, date: datetime) -> Tuple[str, float, float]:
+    """
+    Local currency, local price and portfolio currency price of a ticker on a date. Tickers not held are read with
+    the data reader of the portfolio, their currency is guessed from the ticker (CAD for .TO, else USD).
+    """
+    if ticker in ptf.positions:
+        position = ptf.positions[ticker]
+        return position.currency, position.local_prices.asof(date), position.prices.asof(date)
+    currency = 'CAD' if ticker[-2:] == 'TO' else 'USD'
+    local_price = ptf.datareader.read_prices(ticker=ticker).sort_index().asof(date)
+    if currency == ptf.currency:
+        return currency, local_price, local_price
+    rate = ptf.datareader.read_fx(currency_pair=f"{currency}{ptf.currency}").sort_index().asof(date)
+    return currency, local_price, local_price * rate
@@ -0,0 +1,213 @@
+import hashlib
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+
+from pyportlib.utils import files_utils, logger, time_series
+from pyportlib.utils.time_series import ITimeSeries
+
+CHARTS = ["snapshot", "returns", "distribution", "rolling_beta", "rolling_vol", "rolling_sharpe", "rolling_var",
+          "rolling_skew", "rolling_kurtosis", "excess_returns"]
+BENCHMARK_CHARTS = ["returns", "rolling_beta", "rolling_vol", "rolling_sharpe", "rolling_var", "excess_returns"]
+FORMATS = ["png", "svg"]
+
+
+class ReturnsBundle:
+    """
+    Returns of a portfolio, position or pandas object and of its benchmark, computed once and shared by many charts
+    """
+    def __init__(self, pos: ITimeSeries, benchmark: ITimeSeries = None, start_date: datetime = None,
+                 end_date: datetime = None, lookback: str = None, name: str = None, **kwargs):
+        """
+        :param pos: TimeSeries Object (Portfolio, Position, Pandas DataFrame/Series)
+        :param benchmark: Position, Portfolio or Pandas object
+        :param start_date:
+        :param end_date:
+        :param lookback: String: ex. "1y", "15m". See date_window doc.
+        :param name: name of the bundle, the representation of pos if None
+        :param kwargs: PnL keyword arguments
+        """
+        self.name = name or (pos.name if isinstance(pos, pd.Series) and pos.name is not None else str(pos))
+        self.returns = time_series.prep_returns(pos, lookback=lookback, start_date=start_date, end_date=end_date,
+                                                **kwargs)
+        self.benchmark = None
+        if benchmark is not None:
+            benchmark = time_series.prep_returns(benchmark, lookback=lookback, start_date=start_date,
+                                                 end_date=end_date)
+            self.returns, self.benchmark = time_series.match_index(self.returns, benchmark)
+        self.version = self._version()
+
+    def __repr__(self):
+        return f"{self.name} - Returns Bundle"
+
+    def _version(self) -> str:
+        digest = hashlib.sha1()
+        for series in (self.returns, self.benchmark):
+            if series is not None and len(series):
+                digest.update(pd.util.hash_pandas_object(series, index=True).values)
+            digest.update(b"|")
+        return digest.hexdigest()
+
+
+class FigureCache:
+    """
+    Charts of pyportlib.plots rendered to png or svg files in the outputs directory. Files are keyed by the chart,
+    the version of the returns bundle and the chart arguments, a chart is only rendered again when one of them
+    changes. Charts can be rendered in a pool of processes for headless report generation.
+    """
+    NAME = "Figure Cache"
+    _DIRECTORY = "figures"
+
+    def __init__(self, directory: str = None, fmt: str = "png", workers: int = None):
+        """
+        :param directory: directory of the files, outputs/figures if None
+        :param fmt: png or svg
+        :param workers: number of rendering processes, the number of CPUs if None
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"figure format {fmt} is not supported, must be in {FORMATS}")
+        self.directory = directory or f"{files_utils.get_outputs_dir()}{self._DIRECTORY}"
+        if not files_utils.check_dir(self.directory):
+            files_utils.make_dir(self.directory)
+        self.fmt = fmt
+        self.workers = workers
+        self._pool = None
+        # renders in progress by path, the same chart submitted twice is rendered once
+        self._pending: Dict[str, Future] = {}
+
+    def __repr__(self):
+        return f"{self.NAME} - {self.directory}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def key(self, chart: str, bundle: ReturnsBundle, **kwargs) -> str:
+        """
+        :param chart: name of the chart in CHARTS
+        :param bundle: returns of the chart
+        :param kwargs: chart arguments
+        :return: hex digest of the chart, data version and arguments
+        """
+        arguments = "|".join(f"{k}={kwargs[k]!r}" for k in sorted(kwargs))
+        return hashlib.sha1(f"{chart}|{self.fmt}|{bundle.version}|{arguments}".encode('utf-8')).hexdigest()
+
+    def path(self, chart: str, bundle: ReturnsBundle, **kwargs) -> str:
+        return f"{self.directory}/{chart}_{self.key(chart, bundle, **kwargs)[:16]}.{self.fmt}"
+
+    def render(self, chart: str, bundle: ReturnsBundle, **kwargs) -> str:
+        """
+        Renders a chart in this process if it is not cached
+
+        :param chart: name of the chart in CHARTS
+        :param bundle: returns of the chart
+        :param kwargs: quantstats keyword arguments of the chart
+        :return: path of the file
+        """
+        path, args = self._prepare(chart=chart, bundle=bundle, **kwargs)
+        if not os.path.isfile(path):
+            render_figure(*args, headless=False)
+        return path
+
+    def submit(self, chart: str, bundle: ReturnsBundle, **kwargs) -> Future:
+        """
+        Renders a chart in the background worker pool if it is not cached
+
+        :param chart: name of the chart in CHARTS
+        :param bundle: returns of the chart
+        :param kwargs: quantstats keyword arguments of the chart
+        :return: future of the path of the file
+        """
+        path, args = self._prepare(chart=chart, bundle=bundle, **kwargs)
+        if path in self._pending:
+            return self._pending[path]
+        if os.path.isfile(path):
+            future = Future()
+            future.set_result(path)
+            return future
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self._pool.submit(render_figure, *args)
+        self._pending[path] = future
+        future.add_done_callback(lambda _: self._pending.pop(path, None))
+        return future
+
+    def render_many(self, charts: List[Tuple[str, ReturnsBundle, Dict]]) -> Dict[int, Union[str, None]]:
+        """
+        Renders many charts in the worker pool and waits for them
+
+        :param charts: (chart, bundle, chart keyword arguments) of every chart
+        :return: path of the file by position in charts, None for the charts that failed
+        """
+        futures = [self.submit(chart, bundle, **(kwargs or {})) for chart, bundle, kwargs in charts]
+        paths = {}
+        for i, future in enumerate(futures):
+            try:
+                paths[i] = future.result()
+            except Exception as ex:
+                logger.logging.error(f"{charts[i][0]} of {charts[i][1]} failed: {ex}")
+                paths[i] = None
+        return paths
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pending = {}
+
+    def clear(self) -> None:
+        for file in os.listdir(self.directory):
+            if file.endswith(f".{self.fmt}"):
+                os.remove(f"{self.directory}/{file}")
+
+    def _prepare(self, chart: str, bundle: ReturnsBundle, **kwargs) -> Tuple[str, Tuple]:
+        if chart not in CHARTS:
+            raise ValueError(f"chart {chart} is not supported, must be in {CHARTS}")
+        if bundle.returns.empty:
+            raise ValueError(f"{bundle} has no returns")
+        path = self.path(chart, bundle, **kwargs)
+        benchmark = bundle.benchmark if chart in BENCHMARK_CHARTS else None
+        if chart == "rolling_beta" and benchmark is None:
+            raise ValueError(f"rolling_beta needs a benchmark, {bundle} has none")
+        return path, (chart, bundle.returns, benchmark, path, self.fmt, kwargs)
+
+
+def render_figure(chart: str, returns: pd.Series, benchmark: Union[pd.Series, None], path: str, fmt: str,
+                  kwargs: Dict, headless: bool = True) -> str:
+    """
+    Renders a chart of pyportlib.plots to a file, used by the worker processes of FigureCache
+
+    :param chart: name of the chart in CHARTS
+    :param returns: returns of the chart
+    :param benchmark: benchmark returns, None if the chart has none
+    :param path: file to write
+    :param fmt: png or svg
+    :param kwargs: quantstats keyword arguments of the chart
+    :param headless: True in worker processes, the figures are drawn without a display and closed
+    :return: path of the file
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from pyportlib import plots
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    args = {"benchmark": benchmark} if benchmark is not None else {}
+    try:
+        getattr(plots, chart)(returns, start_date=returns.index[0], end_date=returns.index[-1], show=False,
+                              savefig={"fname": tmp, "format": fmt}, **args, **kwargs)
+        if not os.path.isfile(tmp):
+            raise ValueError(f"{chart} was not rendered")
+        os.replace(tmp, path)
+    finally:
+        if headless:
+            plt.close("all")
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+    return path
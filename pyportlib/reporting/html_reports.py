@@ -1,18 +1,24 @@
-from typing import Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Union
 import pandas as pd
-import quantstats as qs
 
 import pyportlib
 from pyportlib.portfolio.iportfolio import IPortfolio
-from pyportlib.utils import files_utils
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import files_utils, logger
 
 OUT_DIR = files_utils.get_outputs_dir()
 
+# benchmark returns by ticker with the catalog hash of the prices they were computed from, shared by the reports of
+# a session
+_benchmarks: Dict[str, Tuple[Union[str, None], pd.Series]] = {}
+
 
 def full(ptf: Union[IPortfolio, pd.Series, pd.DataFrame],
          benchmark: Union[pd.Series, pd.DataFrame, str, IPortfolio],
          name: str,
-         rf=None) -> None:
+         rf=None,
+         update: bool = True) -> None:
     """
     Produces quantstats html report and saves it to the pyportlib outputs directory.
 
@@ -20,34 +26,120 @@ def full(ptf: Union[IPortfolio, pd.Series, pd.DataFrame],
     :param benchmark: portfolio object or strategy returns from Pandas or a ticker
     :param name: name of saved file
     :param rf: riskfree rate
+    :param update: False to use the market data already loaded instead of updating the portfolio and benchmark
     :return: None
     """
     if isinstance(ptf, IPortfolio):
-        ptf.update_data(fundamentals_and_dividends=False)
+        if update:
+            ptf.update_data(fundamentals_and_dividends=False)
         strategy_returns = ptf.pct_daily_total_pnl(start_date=ptf.start_date)
     else:
         strategy_returns = ptf
 
-    if rf is None:
-        rf = 0.
+    benchmark_returns = _benchmark(benchmark=benchmark, update=update)
+    _render(strategy_returns=strategy_returns, benchmark_returns=benchmark_returns, path=f"{OUT_DIR}{name}.html",
+            rf=rf, align_benchmark=isinstance(benchmark, str))
+
+
+def batch(ptfs: List[IPortfolio],
+          benchmark: Union[pd.Series, pd.DataFrame, str, IPortfolio],
+          names: List[str] = None,
+          rf=None,
+          update: bool = True,
+          workers: int = None) -> Dict[str, str]:
+    """
+    Produces the quantstats html reports of many portfolios. The market data of all the portfolios is updated once
+    (every ticker and fx pair is downloaded once), the returns of every portfolio and of the benchmark are computed
+    once and the reports are rendered by a pool of processes.
+
+    :param ptfs: portfolios
+    :param benchmark: portfolio object or strategy returns from Pandas or a ticker, the same for every report
+    :param names: names of the saved files, the accounts of the portfolios if None
+    :param rf: riskfree rate
+    :param update: False to use the market data already loaded
+    :param workers: number of processes, the number of CPUs if None
+    :return: path of the saved report by name, reports that failed are not included
+    """
+    names = names if names is not None else [ptf.account for ptf in ptfs]
+    if len(names) != len(ptfs):
+        raise ValueError(f"{len(names)} names given for {len(ptfs)} portfolios")
+    if update and ptfs:
+        from pyportlib.services import data_refresh
+        data_refresh.refresh_portfolios(ptfs=ptfs, datareader=pyportlib.create.datareader())
+
+    benchmark_returns = _benchmark(benchmark=benchmark, update=update)
+    returns = {name: ptf.pct_daily_total_pnl(start_date=ptf.start_date) for name, ptf in zip(names, ptfs)}
+
+    paths = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_render, strategy_returns=strategy_returns, benchmark_returns=benchmark_returns,
+                               path=f"{OUT_DIR}{name}.html", rf=rf, align_benchmark=isinstance(benchmark, str)): name
+                   for name, strategy_returns in returns.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                paths[name] = future.result()
+            except Exception as ex:
+                logger.logging.error(f"report {name} failed: {ex}")
+    return paths
+
+
+def benchmark_returns(ticker: str, update: bool = True) -> pd.Series:
+    """
+    Daily returns of a benchmark ticker, kept in memory for the next reports until its prices change
 
+    :param ticker: benchmark ticker
+    :param update: True to update the prices before computing the returns
+    :return:
+    """
+    datareader = pyportlib.create.datareader()
+    if update:
+        datareader.update_prices(ticker=ticker)
+    cached = _benchmarks.get(ticker)
+    if cached is None or cached[0] is None or cached[0] != _prices_hash(datareader, ticker):
+        returns = pyportlib.create.position(ticker=ticker).prices.pct_change()
+        # prices saved before the catalog existed are added to it by their first read
+        _benchmarks[ticker] = (_prices_hash(datareader, ticker), returns)
+    return _benchmarks[ticker][1].copy()
+
+
+def clear_benchmarks() -> None:
+    _benchmarks.clear()
+
+
+def _prices_hash(datareader: DataReader, ticker: str) -> Union[str, None]:
+    entry = datareader.catalog.entry(kind='prices', key=ticker)
+    return None if entry is None else entry['hash']
+
+
+def _benchmark(benchmark: Union[pd.Series, pd.DataFrame, str, IPortfolio],
+               update: bool) -> Union[pd.Series, pd.DataFrame]:
     if isinstance(benchmark, str):
-        pos = pyportlib.create.position(ticker=benchmark)
-        pos.update_data()
-        benchmark_returns = pos.prices.pct_change()
-        benchmark_returns = benchmark_returns.loc[benchmark_returns.index.isin(strategy_returns.index)]
+        return benchmark_returns(ticker=benchmark, update=update)
     elif isinstance(benchmark, IPortfolio):
-        benchmark.update_data()
-        benchmark_returns = benchmark.pct_daily_total_pnl(start_date=benchmark.start_date)
+        if update:
+            benchmark.update_data()
+        return benchmark.pct_daily_total_pnl(start_date=benchmark.start_date)
     elif isinstance(benchmark, pd.Series) or isinstance(benchmark, pd.DataFrame):
-        benchmark_returns = benchmark
+        return benchmark
     else:
         raise ValueError("Benchmark error")
 
-    title = f"{OUT_DIR}{name}.html"
+
+def _render(strategy_returns: Union[pd.Series, pd.DataFrame], benchmark_returns: Union[pd.Series, pd.DataFrame],
+            path: str, rf=None, align_benchmark: bool = False) -> str:
+    # runs in the worker processes of batch, the output path is given since they may not share the client directory
+    import quantstats as qs
+    if rf is None:
+        rf = 0.
+    if align_benchmark:
+        benchmark_returns = benchmark_returns.loc[benchmark_returns.index.isin(strategy_returns.index)]
+
+    title = path
     qs.reports.html(strategy_returns,
                     benchmark=benchmark_returns,
                     output=title,
                     title=title,
                     download_filename=title,
                     rf=rf)
+    return title
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+
+from pyportlib.utils import files_utils, logger
+
+
+class AttributionCache:
+    """
+    Attribution results of closed periods (ex. months) saved next to the account files. Every period is saved with
+    a hash of the inputs it was computed from (prices, benchmark, factors, transactions and cash changes) sliced up
+    to the end of the period, with the parameters of the attribution. New data after a period does not change its
+    key, a past period is only computed again when its own data changes.
+    """
+    NAME = "Attribution Cache"
+    VERSION = 2
+    _ACCOUNTS_DIRECTORY = files_utils.get_accounts_dir()
+    _CACHE_DIRECTORY = "attribution"
+
+    def __init__(self, account: str, name: str, params: dict = None):
+        """
+        :param account: account name
+        :param name: name of the attribution (ex. brinson, factors), one file per name
+        :param params: other arguments of the attribution (ex. groups, frequency, window)
+        """
+        self.account = account
+        self.name = name
+        self.directory = f"{self._ACCOUNTS_DIRECTORY}{self.account}/{self._CACHE_DIRECTORY}"
+        self._params = json.dumps(params or {}, sort_keys=True, default=str)
+        self._periods: Dict[str, Tuple[str, pd.Series]] = {}
+        self._load()
+
+    def __repr__(self):
+        return f"{self.account} - {self.NAME} - {self.name}"
+
+    @property
+    def periods(self) -> List[str]:
+        return sorted(self._periods.keys())
+
+    def key(self, end: datetime, inputs: List[Union[pd.DataFrame, pd.Series]]) -> str:
+        """
+        Hash of the inputs of a period, only their data up to the end of the period is used
+
+        :param end: end of the period
+        :param inputs: data the results are computed from, the data indexed by date is sliced at the end
+        :return: hex digest
+        """
+        end = pd.Timestamp(end)
+        digest = hashlib.sha1(f"{self.name}|{self._params}".encode('utf-8'))
+        for data in inputs:
+            if isinstance(data.index, pd.DatetimeIndex):
+                data = data.loc[data.index <= end]
+            if isinstance(data, pd.DataFrame):
+                digest.update(",".join(map(str, data.columns)).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        return digest.hexdigest()
+
+    def get(self, period: str, key: str) -> Union[pd.Series, None]:
+        """
+        :param period: period label (ex. 2022-01)
+        :param key: hash of the inputs of the period, from the key method
+        :return: cached result, None if the period is not cached or was computed from other data
+        """
+        saved = self._periods.get(period)
+        if saved is None or saved[0] != key:
+            return None
+        return saved[1].copy()
+
+    def put(self, results: Dict[str, Tuple[str, pd.Series]]) -> None:
+        """
+        Adds results of closed periods and saves the cache
+
+        :param results: key of the inputs and result by period label
+        :return: None
+        """
+        if not results:
+            return
+        self._periods.update(results)
+        self._save()
+
+    def reset(self) -> None:
+        self._periods = {}
+        if files_utils.check_file(self.directory, self._filename):
+            os.remove(f"{self.directory}/{self._filename}")
+
+    @property
+    def _filename(self) -> str:
+        return f"{self.name}.json"
+
+    def _load(self) -> None:
+        if not files_utils.check_file(self.directory, self._filename):
+            return
+        try:
+            with open(f"{self.directory}/{self._filename}") as myfile:
+                saved = json.loads(myfile.read())
+        except (IOError, ValueError) as ex:
+            logger.logging.error(f'unable to read {self}: {ex}')
+            return
+        if saved.get("version") != self.VERSION:
+            logger.logging.debug(f'{self} is outdated')
+            return
+        self._periods = {period: (result["key"], self._from_json(result))
+                         for period, result in saved["periods"].items()}
+
+    def _save(self) -> None:
+        if not files_utils.check_dir(self.directory):
+            files_utils.make_dir(self.directory)
+        saved = {"version": self.VERSION,
+                 "periods": {period: {"key": key, **self._to_json(result)}
+                             for period, (key, result) in self._periods.items()}}
+        path = f"{self.directory}/{self._filename}"
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        logger.logging.debug(f'{self} saved')
+
+    @staticmethod
+    def _to_json(result: pd.Series) -> dict:
+        return {"index": [list(label) if isinstance(label, tuple) else label for label in result.index],
+                "values": [None if pd.isna(value) else float(value) for value in result.values]}
+
+    @staticmethod
+    def _from_json(saved: dict) -> pd.Series:
+        labels = [tuple(label) if isinstance(label, list) else label for label in saved["index"]]
+        if labels and all(isinstance(label, tuple) for label in labels):
+            index = pd.MultiIndex.from_tuples(labels)
+        else:
+            index = pd.Index(labels)
+        return pd.Series(saved["values"], index=index, dtype=float)
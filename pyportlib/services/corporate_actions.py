@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from pyportlib.data_connections.base_data_connection import BaseDataConnection
+from pyportlib.utils import logger, files_utils
+
+
+class CorporateActions:
+    """
+    Local store of splits and dividends per ticker. A ticker is only fetched again from the data source when its
+    data is older than the time to live, otherwise it is read from the client data folder (or memory). A read only
+    store never fetches, it reads the saved data whatever its age.
+    """
+    NAME = "Corporate Actions"
+    _MANIFEST_FILENAME = "corporate_actions.json"
+    _TTL = timedelta(days=7)
+
+    def __init__(self, market_data_source: BaseDataConnection):
+        self._market_data_source = market_data_source
+        self._manifest = {}
+        self._splits = {}
+        self._dividends = {}
+        self._lock = threading.Lock()
+        self.read_only = False
+        self._load_manifest()
+
+    def __repr__(self):
+        return self.NAME
+
+    def splits(self, ticker: str) -> pd.Series:
+        """
+        Stock splits of a ticker, ratio indexed by date
+
+        :param ticker: Stock ticker
+        :return:
+        """
+        if not self.read_only and self._is_stale(ticker=ticker, action='splits'):
+            self.update_splits(ticker=ticker)
+        if ticker not in self._splits:
+            self._splits[ticker] = self._read_splits(ticker=ticker)
+        return self._splits[ticker]
+
+    def dividends(self, ticker: str) -> pd.Series:
+        """
+        Dividends of a ticker, amount indexed by date
+
+        :param ticker: Stock ticker
+        :return:
+        """
+        if not self.read_only and self._is_stale(ticker=ticker, action='dividends'):
+            self.update_dividends(ticker=ticker)
+        if ticker not in self._dividends:
+            self._dividends[ticker] = self._read_dividends(ticker=ticker)
+        return self._dividends[ticker]
+
+    def refresh(self, tickers: List[str], force: bool = False) -> None:
+        """
+        Updates the splits and dividends of the tickers that are older than the time to live
+
+        :param tickers: Stock tickers
+        :param force: True to update all the tickers
+        :return: None
+        """
+        for ticker in tickers:
+            if force or self._is_stale(ticker=ticker, action='splits'):
+                self.update_splits(ticker=ticker)
+            if force or self._is_stale(ticker=ticker, action='dividends'):
+                self.update_dividends(ticker=ticker)
+
+    def stale(self, tickers: List[str], action: str, max_age: timedelta = None) -> List[str]:
+        """
+        :param tickers: Stock tickers
+        :param action: 'splits' or 'dividends'
+        :param max_age: maximum time since the last fetch, the time to live if None
+        :return: tickers whose data is missing or older than max_age
+        """
+        return [ticker for ticker in tickers if self._is_stale(ticker=ticker, action=action, max_age=max_age)]
+
+    def _is_stale(self, ticker: str, action: str, max_age: timedelta = None) -> bool:
+        fetched = self._manifest.get(ticker, {}).get(action)
+        if fetched is None:
+            return True
+        if ticker not in (self._splits if action == 'splits' else self._dividends):
+            path = self._splits_path(ticker=ticker) if action == 'splits' else self._dividends_path(ticker=ticker)
+            if not files_utils.check_file(directory="", file=path):
+                return True
+        return datetime.now() - datetime.fromisoformat(fetched) > (self._TTL if max_age is None else max_age)
+
+    def update_splits(self, ticker: str) -> None:
+        splits = self._market_data_source.get_splits(ticker=ticker)
+        if isinstance(splits, list) or splits is None:
+            splits = pd.Series(dtype=float)
+        splits = self._naive_index(pd.Series(splits, dtype=float))
+        splits.index.name = 'Date'
+        splits.name = 'Splits'
+        splits.to_csv(self._splits_path(ticker=ticker))
+        self._splits[ticker] = splits
+        self._set_fetched(ticker=ticker, action='splits')
+        logger.logging.debug(f"{ticker} splits updated")
+
+    def update_dividends(self, ticker: str) -> None:
+        self._market_data_source.get_dividends(ticker=ticker)
+        self._dividends.pop(ticker, None)
+        self._set_fetched(ticker=ticker, action='dividends')
+        logger.logging.debug(f"{ticker} dividends updated")
+
+    def _read_splits(self, ticker: str) -> pd.Series:
+        df = pd.read_csv(self._splits_path(ticker=ticker))
+        if df.empty:
+            return pd.Series(dtype=float, name='Splits')
+        df = df.set_index('Date')
+        df.index = pd.to_datetime(df.index)
+        return df['Splits'].astype(float)
+
+    def _read_dividends(self, ticker: str) -> pd.Series:
+        df = pd.read_csv(self._dividends_path(ticker=ticker))
+        if df.empty:
+            return pd.Series(dtype=float, name='dividend')
+        df = df.set_index('date')
+        df.index = pd.to_datetime(df.index)
+        return df['dividend']
+
+    def _splits_path(self, ticker: str) -> str:
+        return f"{self._market_data_source.statement_dir}/{self._market_data_source.file_prefix}_{ticker.replace('.TO', '_TO')}_splits.csv"
+
+    def _dividends_path(self, ticker: str) -> str:
+        return f"{self._market_data_source.statement_dir}/{self._market_data_source.file_prefix}_{ticker.replace('.TO', '_TO')}_dividends.csv"
+
+    @property
+    def _manifest_path(self) -> str:
+        return f"{self._market_data_source.data_dir}{self._MANIFEST_FILENAME}"
+
+    def _load_manifest(self) -> None:
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self) -> dict:
+        if not files_utils.check_file(directory="", file=self._manifest_path):
+            return {}
+        try:
+            with open(self._manifest_path) as myfile:
+                return json.loads(myfile.read())
+        except (IOError, ValueError) as ex:
+            logger.logging.error(f'unable to read {self._manifest_path}, the corporate actions are fetched again: {ex}')
+            return {}
+
+    def _set_fetched(self, ticker: str, action: str) -> None:
+        """
+        Merges the fetch time into the saved manifest, other processes may have saved fetches since it was read. Tickers
+        are updated from a pool of threads, the manifest is changed and written by one at a time.
+        """
+        fetched = datetime.now().isoformat()
+        with self._lock, files_utils.file_lock(self._manifest_path):
+            manifest = self._read_manifest()
+            actions = manifest.setdefault(ticker, {})
+            if actions.get(action) is None or actions[action] <= fetched:
+                actions[action] = fetched
+            tmp = f"{self._manifest_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self._manifest_path)
+            self._manifest = manifest
+
+    @staticmethod
+    def _naive_index(series: pd.Series) -> pd.Series:
+        series.index = pd.to_datetime(series.index)
+        if series.index.tz is not None:
+            series.index = series.index.tz_localize(None)
+        return series
+
+
+def split_factors(splits: Union[pd.Series, None], dates: Union[List[datetime], pd.DatetimeIndex]) -> np.ndarray:
+    """
+    Cumulative split factor of all the splits on or after each date, computed for all the dates at once
+
+    :param splits: split ratios indexed by date
+    :param dates: trade dates
+    :return: array of factors in the same order as dates, 1 when there was no split after the date
+    """
+    if splits is None or isinstance(splits, list) or len(splits) == 0:
+        return np.ones(len(dates))
+    splits = splits.sort_index()
+    after = np.append(np.cumprod(splits.values[::-1])[::-1], 1.)
+    idx = np.searchsorted(splits.index.values, pd.DatetimeIndex(dates).values, side='left')
+    return after[idx]
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from pyportlib.utils import logger, files_utils
+
+
+class DataCatalog:
+    """
+    Manifest of the market data saved in the client data folder: path, row count, first and last date, source,
+    fetch time and content hash of every price, fx and statement file. Existence and staleness questions are answered
+    from the manifest without touching the files. Many processes can share the manifest: the entries changed by a
+    catalog are merged into the saved manifest under a file lock, the most recently fetched entry of a file wins.
+    Changes are saved as they are made, or once at the end of a batch (ex. a refresh of many tickers).
+    """
+    NAME = "Data Catalog"
+    VERSION = 1
+    KINDS = ['prices', 'fx', 'balance_sheet', 'cash_flow', 'income_statement']
+    _FILENAME = "catalog.json"
+
+    def __init__(self, directory: str):
+        """
+        :param directory: data directory where the manifest is saved
+        """
+        self.path = f"{directory}{self._FILENAME}"
+        self._entries: Dict[str, Dict] = {}
+        # entries recorded (or removed, None) since the last save
+        self._changes: Dict[str, Union[Dict, None]] = {}
+        # number of open batches, changes are only saved by flush while a batch is open
+        self._batches = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __repr__(self):
+        return self.NAME
+
+    def entry(self, kind: str, key: str) -> Union[Dict, None]:
+        """
+        :param kind: kind of data in KINDS
+        :param key: ticker or currency pair
+        :return: entry of the data, None if it is not in the catalog
+        """
+        entry = self._entries.get(self._id(kind, key))
+        return None if entry is None else dict(entry)
+
+    def exists(self, kind: str, key: str) -> bool:
+        return self._id(kind, key) in self._entries
+
+    def last_date(self, kind: str, key: str) -> Union[pd.Timestamp, None]:
+        entry = self._entries.get(self._id(kind, key))
+        return None if entry is None or entry['last'] is None else pd.Timestamp(entry['last'])
+
+    def fetched(self, kind: str, key: str) -> Union[datetime, None]:
+        entry = self._entries.get(self._id(kind, key))
+        return None if entry is None or entry['fetched'] is None else datetime.fromisoformat(entry['fetched'])
+
+    def stale(self, kind: str, keys: List[str], last_date: datetime = None, max_age: timedelta = None,
+              now: datetime = None) -> List[str]:
+        """
+        Keys whose data is missing, ends before a date or was fetched too long ago
+
+        :param kind: kind of data in KINDS
+        :param keys: tickers or currency pairs
+        :param last_date: date the data should reach, ex. the last market day
+        :param max_age: maximum time since the last fetch
+        :param now: time the age is measured at, now if None
+        :return: stale keys, in the order given
+        """
+        now = now or datetime.now()
+        stale = []
+        for key in keys:
+            entry = self._entries.get(self._id(kind, key))
+            if entry is None:
+                stale.append(key)
+            elif last_date is not None and (entry['last'] is None or
+                                            pd.Timestamp(entry['last']) < pd.Timestamp(last_date).normalize()):
+                stale.append(key)
+            elif max_age is not None and (entry['fetched'] is None or
+                                          now - datetime.fromisoformat(entry['fetched']) > max_age):
+                stale.append(key)
+        return stale
+
+    def record(self, kind: str, key: str, path: str, data: Union[pd.DataFrame, pd.Series], source: str,
+               content: bytes, fetched: datetime = None) -> None:
+        """
+        Adds or replaces the entry of a file and saves the catalog, unless a batch is open
+
+        :param kind: kind of data in KINDS
+        :param key: ticker or currency pair
+        :param path: path of the file
+        :param data: data of the file, indexed by date for prices and fx
+        :param source: name of the data source
+        :param content: bytes of the file, for the content hash
+        :param fetched: time the data was fetched, now if None
+        :return: None
+        """
+        dated = isinstance(data.index, pd.DatetimeIndex) and len(data)
+        entry = {'path': path,
+                 'rows': int(len(data)),
+                 'first': data.index.min().isoformat() if dated else None,
+                 'last': data.index.max().isoformat() if dated else None,
+                 'source': source,
+                 'fetched': (fetched or datetime.now()).isoformat(timespec='seconds'),
+                 'hash': hashlib.sha1(content).hexdigest()}
+        with self._lock:
+            self._entries[self._id(kind, key)] = entry
+            self._changes[self._id(kind, key)] = entry
+            if not self._batches:
+                self._save()
+
+    def remove(self, kind: str, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(self._id(kind, key), None) is not None:
+                self._changes[self._id(kind, key)] = None
+                if not self._batches:
+                    self._save()
+
+    @contextmanager
+    def batch(self):
+        """
+        Keeps the changes in memory until the end of the block, they are then saved at once by flush
+
+        :return: None
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batches -= 1
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Saves the changes not saved yet
+
+        :return: None
+        """
+        with self._lock:
+            if self._changes:
+                self._save()
+
+    def entries(self, kind: str = None) -> pd.DataFrame:
+        """
+        :param kind: kind of data in KINDS, all of them if None
+        :return: one row by file, indexed by kind and key
+        """
+        rows = {tuple(k.split('|', 1)): v for k, v in self._entries.items() if kind is None or k.startswith(f"{kind}|")}
+        df = pd.DataFrame.from_dict(rows, orient='index')
+        if not df.empty:
+            df.index = pd.MultiIndex.from_tuples(df.index, names=['Kind', 'Key'])
+        return df
+
+    def _id(self, kind: str, key: str) -> str:
+        if kind not in self.KINDS:
+            raise ValueError(f"data kind {kind} is not supported, must be in {self.KINDS}")
+        return f"{kind}|{key}"
+
+    def _load(self) -> None:
+        self._entries = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        if not files_utils.check_file(directory="", file=self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (IOError, ValueError) as ex:
+            logger.logging.error(f'unable to read {self.path}, the catalog is rebuilt as files are read: {ex}')
+            return {}
+        if saved.get('version') != self.VERSION:
+            return {}
+        return saved.get('entries', {})
+
+    def _save(self) -> None:
+        """
+        Merges the changes into the saved manifest, other processes may have saved entries since it was read
+        """
+        with files_utils.file_lock(self.path):
+            entries = self._read()
+            for id_, entry in self._changes.items():
+                if entry is None:
+                    entries.pop(id_, None)
+                elif id_ not in entries or (entries[id_]['fetched'] or '') <= entry['fetched']:
+                    entries[id_] = entry
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        self._entries = entries
+        self._changes = {}
@@ -1,7 +1,14 @@
-from datetime import datetime
+import io
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List, Union
 import pandas as pd
 
 from pyportlib.data_connections.base_data_connection import BaseDataConnection
+from pyportlib.services.corporate_actions import CorporateActions
+from pyportlib.services.data_catalog import DataCatalog
+from pyportlib.services import intraday_bar_store
+from pyportlib.services.intraday_bar_store import IntradayBarStore
 from pyportlib.utils import logger, files_utils
 
 
@@ -15,10 +22,29 @@ class DataReader:
                  statements_data_source: BaseDataConnection):
         self._market_data_source = market_data_source
         self._statements_data_source = statements_data_source
+        # prices and fx read from disk with the catalog hash of their file, shared by every portfolio and position
+        # using this reader. A series is read again when its catalog entry changed.
+        self._prices_cache = {}
+        self._fx_cache = {}
+        self._corporate_actions = CorporateActions(market_data_source=market_data_source)
+        self._intraday = IntradayBarStore()
+        self._catalog = DataCatalog(directory=market_data_source.data_dir)
+        self._read_only = False
 
     def __repr__(self):
         return self.NAME
 
+    def set_read_only(self, read_only: bool = True) -> None:
+        """
+        A read only reader never fetches data nor writes the manifests shared with other processes (data catalog and
+        corporate actions), it only reads the saved files. Used by worker processes once the data is fetched.
+
+        :param read_only: True to stop fetching and writing
+        :return: None
+        """
+        self._read_only = read_only
+        self._corporate_actions.read_only = read_only
+
     def read_prices(self, ticker: str) -> pd.Series:
         """
         Read prices saved locally in client data folder.
@@ -27,21 +53,46 @@ class DataReader:
         :param ticker: Stock ticker
         :return:
         """
-        directory = self._market_data_source.prices_dir
-        filename = f"{self._market_data_source.file_prefix}_{ticker.replace('.TO', '_TO')}_prices.csv"
-
-        if files_utils.check_file(directory=directory,
-                                  file=filename):
-            df = pd.read_csv(f"{directory}/{filename}")
-            df = df.set_index('Date').dropna()
-            df.index = pd.to_datetime(df.index)
+        path = self.prices_path(ticker=ticker)
+        cached = self._prices_cache.get(ticker)
+        if cached is not None and cached[0] == self._version(kind='prices', key=ticker):
+            return cached[1].copy()
 
-            return df['Close']
+        df = self._read_file(kind='prices', key=ticker, path=path, parse=self._parse_prices)
+        if df is not None:
+            self._prices_cache[ticker] = (self._version(kind='prices', key=ticker), df['Close'])
+            return df['Close'].copy()
+        elif self._read_only:
+            raise FileNotFoundError(f'no price data saved for {ticker}')
         else:
             logger.logging.info(f'no price data to read for {ticker}, fetching new data from api')
             self.update_prices(ticker=ticker)
             return self.read_prices(ticker)
 
+    @property
+    def catalog(self) -> DataCatalog:
+        return self._catalog
+
+    def has_prices(self, ticker: str) -> bool:
+        return self._catalog.exists(kind='prices', key=ticker) or \
+            files_utils.check_file(directory="", file=self.prices_path(ticker=ticker))
+
+    def has_fx(self, currency_pair: str) -> bool:
+        return self._catalog.exists(kind='fx', key=currency_pair) or \
+            files_utils.check_file(directory="", file=self.fx_path(currency_pair=currency_pair))
+
+    def prices_filename(self, ticker: str) -> str:
+        return f"{self._market_data_source.file_prefix}_{ticker.replace('.TO', '_TO')}_prices.csv"
+
+    def fx_filename(self, currency_pair: str) -> str:
+        return f"{self._market_data_source.file_prefix}_{currency_pair}_fx.csv"
+
+    def prices_path(self, ticker: str) -> str:
+        return f"{self._market_data_source.prices_dir}/{self.prices_filename(ticker=ticker)}"
+
+    def fx_path(self, currency_pair: str) -> str:
+        return f"{self._market_data_source.fx_dir}/{self.fx_filename(currency_pair=currency_pair)}"
+
     def read_fx(self, currency_pair: str) -> pd.Series:
         """
         Read fx rates saved locally in client data folder.
@@ -50,15 +101,17 @@ class DataReader:
         :param currency_pair: Fx pair ex. USDCAD or CADUSD
         :return:
         """
-        directory = self._market_data_source.fx_dir
-        filename = f"{self._market_data_source.file_prefix}_{currency_pair}_fx.csv"
+        path = self.fx_path(currency_pair=currency_pair)
+        cached = self._fx_cache.get(currency_pair)
+        if cached is not None and cached[0] == self._version(kind='fx', key=currency_pair):
+            return cached[1].copy()
 
-        if files_utils.check_file(directory=directory,
-                                  file=filename):
-            df = pd.read_csv(f"{directory}/{filename}")
-            df = df.set_index('Date')
-            df.index = pd.to_datetime(df.index)
-            return df['Close']
+        df = self._read_file(kind='fx', key=currency_pair, path=path, parse=self._parse_fx)
+        if df is not None:
+            self._fx_cache[currency_pair] = (self._version(kind='fx', key=currency_pair), df['Close'])
+            return df['Close'].copy()
+        elif self._read_only:
+            raise FileNotFoundError(f'no fx data saved for {currency_pair}')
         else:
             logger.logging.info(f'no fx data to read for {currency_pair}, fetching new data from api')
             self.update_fx(currency_pair=currency_pair)
@@ -76,43 +129,79 @@ class DataReader:
         implemented = {'balance_sheet', 'cash_flow', 'income_statement'}
         if statement_type not in implemented:
             raise ValueError(f'enter valid statement type: {implemented}')
-        directory = self._market_data_source.statement_dir
-        filename = f"{self._market_data_source.file_prefix}_{ticker.replace('.TO', '_TO')}_{statement_type}.csv"
-
-        if files_utils.check_file(directory=directory, file=filename):
-            df = pd.read_csv(f"{directory}/{filename}").set_index("Breakdown")
+        df = self._read_file(kind=statement_type, key=ticker, path=self.statement_path(ticker, statement_type),
+                             parse=self._parse_statement)
+        if df is not None:
             return df
+        elif self._read_only:
+            raise FileNotFoundError(f'no {statement_type} data saved for {ticker}')
         else:
             logger.logging.info(f'no {statement_type} data to read for {ticker}, now fetching new data from api')
             self.update_statement(ticker=ticker, statement_type=statement_type)
             return self.read_fundamentals(ticker=ticker, statement_type=statement_type)
 
-    def read_dividends(self, ticker: str) -> pd.DataFrame:
+    def read_dividends(self, ticker: str) -> pd.Series:
         """
         Read dividends data saved locally in client data folder.
-        If no .csv found, dividends data will be fetched
+        If there is no data or it is older than a week, dividends data will be fetched
 
         :param ticker: Stock Ticker
         :return:
         """
-        directory = self._market_data_source.statement_dir
-        filename = f"{self._market_data_source.file_prefix}_{ticker}_dividends.csv"
+        return self._corporate_actions.dividends(ticker=ticker)
 
-        if files_utils.check_file(directory=directory, file=filename):
-            df = pd.read_csv(f"{directory}/{filename}")
-            df = df.set_index('date')
-            df.index = pd.to_datetime(df.index)
-            return df['dividend']
-        else:
-            logger.logging.info(f'no dividend data to read for {ticker}, now fetching new data from api')
-            self.update_dividends(ticker=ticker)
-            return self.read_dividends(ticker)
+    def read_intraday(self, ticker: str, start_date: datetime = None, end_date: datetime = None,
+                      interval: str = None) -> pd.DataFrame:
+        """
+        Read intraday bars saved locally in client data folder
+
+        :param ticker: Stock ticker
+        :param start_date: first day, first saved day if None
+        :param end_date: last day (included), last saved day if None
+        :param interval: resample the bars to this interval, ex. '5min'. Bars are returned as saved if None
+        :return: DataFrame of Open, High, Low, Close and Volume indexed by bar start time
+        """
+        records = self._intraday.read(ticker=ticker, start_date=start_date, end_date=end_date)
+        if interval is not None:
+            records = intraday_bar_store.resample(records=records, interval=interval)
+        return intraday_bar_store.to_frame(records)
+
+    def write_intraday(self, ticker: str, bars: pd.DataFrame) -> None:
+        """
+        Appends intraday bars to the ones saved locally, bars already saved are ignored
+
+        :param ticker: Stock ticker
+        :param bars: DataFrame of Open, High, Low, Close and Volume indexed by bar start time
+        :return: None
+        """
+        self._intraday.append(ticker=ticker, bars=bars)
 
     def update_prices(self, ticker: str) -> None:
+        if self._skip_update(f"{ticker} prices"):
+            return
+        path = self.prices_path(ticker=ticker)
+        before = self._modified(path)
         self._market_data_source.get_prices(ticker=ticker)
+        self._prices_cache.pop(ticker, None)
+        self._record(kind='prices', key=ticker, path=path, parse=self._parse_prices, before=before)
 
     def update_fx(self, currency_pair: str) -> None:
+        if self._skip_update(f"{currency_pair} fx"):
+            return
+        path = self.fx_path(currency_pair=currency_pair)
+        before = self._modified(path)
         self._market_data_source.get_fx(currency_pair=currency_pair)
+        self._fx_cache.pop(currency_pair, None)
+        self._record(kind='fx', key=currency_pair, path=path, parse=self._parse_fx, before=before)
+
+    def clear_cache(self) -> None:
+        """
+        Drops the prices and fx kept in memory, next reads will be from the locally saved files
+
+        :return: None
+        """
+        self._prices_cache = {}
+        self._fx_cache = {}
 
     def update_statement(self, ticker: str, statement_type: str) -> None:
         """
@@ -122,31 +211,131 @@ class DataReader:
         :param statement_type: 'balance_sheet', 'cash_flow', 'income_statement' or 'all'
         :return:
         """
+        getters = {'balance_sheet': self._statements_data_source.get_balance_sheet,
+                   'cash_flow': self._statements_data_source.get_cash_flow,
+                   'income_statement': self._statements_data_source.get_income_statement}
+        types = list(getters) if statement_type == 'all' else [statement_type]
+        if self._skip_update(f"{ticker} statements"):
+            return
         try:
-            if statement_type == 'balance_sheet' or statement_type == 'all':
-                self._statements_data_source.get_balance_sheet(ticker)
-            if statement_type == 'cash_flow' or statement_type == 'all':
-                self._statements_data_source.get_cash_flow(ticker)
-            if statement_type == 'income_statement' or statement_type == 'all':
-                self._statements_data_source.get_cash_flow(ticker)
-            else:
-                raise NotImplementedError({statement_type})
+            for kind in types:
+                if kind not in getters:
+                    raise NotImplementedError({statement_type})
+                path = self.statement_path(ticker=ticker, statement_type=kind)
+                before = self._modified(path)
+                getters[kind](ticker)
+                self._record(kind=kind, key=ticker, path=path, parse=self._parse_statement, before=before,
+                             source=self._statements_data_source)
         except Exception as ex:
             logger.logging.error(f"unable to update {ticker} - {statement_type} data: {ex}")
 
+    def stale_dividends(self, tickers: List[str], max_age: timedelta = None) -> List[str]:
+        """
+        :param tickers: Stock tickers
+        :param max_age: maximum time since the last fetch, the corporate actions time to live if None
+        :return: tickers whose dividends are missing or older than max_age
+        """
+        return self._corporate_actions.stale(tickers=tickers, action='dividends', max_age=max_age)
 
     def update_dividends(self, ticker: str) -> None:
-        self._market_data_source.get_dividends(ticker=ticker)
+        if self._skip_update(f"{ticker} dividends"):
+            return
+        self._corporate_actions.update_dividends(ticker=ticker)
 
-    def get_splits(self, ticker: str) -> pd.DataFrame:
+    def update_splits(self, ticker: str) -> None:
+        if self._skip_update(f"{ticker} splits"):
+            return
+        self._corporate_actions.update_splits(ticker=ticker)
+
+    def get_splits(self, ticker: str) -> pd.Series:
         """
         Read stock splits data saved locally in client data folder.
-        If no .csv found, splits data will be fetched
+        If there is no data or it is older than a week, splits data will be fetched
 
         :param ticker:
         :return:
         """
-        return self._market_data_source.get_splits(ticker=ticker)
+        return self._corporate_actions.splits(ticker=ticker)
+
+    def statement_path(self, ticker: str, statement_type: str) -> str:
+        return f"{self._market_data_source.statement_dir}/{self._market_data_source.file_prefix}_" \
+               f"{ticker.replace('.TO', '_TO')}_{statement_type}.csv"
+
+    def _read_file(self, kind: str, key: str, path: str,
+                   parse: Callable[[bytes], pd.DataFrame]) -> Union[pd.DataFrame, None]:
+        """
+        Reads a data file listed in the catalog. Files saved before the catalog existed are looked up on disk and
+        added to it, entries of files deleted by the user are removed.
+        """
+        listed = self._catalog.exists(kind=kind, key=key)
+        if not listed and not files_utils.check_file(directory="", file=path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            logger.logging.debug(f'{path} is in the data catalog but not on disk')
+            if not self._read_only:
+                self._catalog.remove(kind=kind, key=key)
+            return None
+        df = parse(content)
+        if not listed and not self._read_only:
+            self._catalog.record(kind=kind, key=key, path=path, data=df, source=self._market_data_source.name,
+                                 content=content, fetched=datetime.fromtimestamp(os.path.getmtime(path)))
+        return df
+
+    def _record(self, kind: str, key: str, path: str, parse: Callable[[bytes], pd.DataFrame],
+                before: Union[int, None], source: BaseDataConnection = None) -> None:
+        """
+        Updates the catalog entry of a file after a fetch. Nothing changes when the data source did not write the
+        file (ex. an api error).
+        """
+        after = self._modified(path)
+        if after is None:
+            self._catalog.remove(kind=kind, key=key)
+            return
+        if after == before and self._catalog.exists(kind=kind, key=key):
+            return
+        with open(path, 'rb') as f:
+            content = f.read()
+        source = source or self._market_data_source
+        self._catalog.record(kind=kind, key=key, path=path, data=parse(content), source=source.name, content=content,
+                             fetched=None if after != before else datetime.fromtimestamp(after / 1e9))
+
+    def _version(self, kind: str, key: str) -> Union[str, None]:
+        # None for the files not in the catalog, a read only reader does not add them
+        entry = self._catalog.entry(kind=kind, key=key)
+        return None if entry is None else entry['hash']
+
+    def _skip_update(self, data: str) -> bool:
+        if self._read_only:
+            logger.logging.debug(f'{data} not updated, {self} is read only')
+        return self._read_only
+
+    @staticmethod
+    def _modified(path: str) -> Union[int, None]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _parse_prices(content: bytes) -> pd.DataFrame:
+        df = pd.read_csv(io.BytesIO(content))
+        df = df.set_index('Date').dropna()
+        df.index = pd.to_datetime(df.index)
+        return df
+
+    @staticmethod
+    def _parse_fx(content: bytes) -> pd.DataFrame:
+        df = pd.read_csv(io.BytesIO(content))
+        df = df.set_index('Date')
+        df.index = pd.to_datetime(df.index)
+        return df
+
+    @staticmethod
+    def _parse_statement(content: bytes) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(content)).set_index("Breakdown")
 
     def last_data_point(self, ptf_currency: str = 'CAD') -> datetime:
         """
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+
+from pyportlib.portfolio.iportfolio import IPortfolio
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import logger
+
+
+def download(datareader: DataReader, tickers: Iterable[str], pairs: Iterable[str] = (), workers: int = 8,
+             fundamentals_and_dividends: bool = False) -> Dict[str, str]:
+    """
+    Updates the prices of many tickers and fx pairs with a pool of threads, the downloads are network bound
+
+    :param datareader: DataReader
+    :param tickers: tickers to update
+    :param pairs: currency pairs to update
+    :param workers: number of threads
+    :param fundamentals_and_dividends: True to also update the statements and dividends of the tickers
+    :return: error by ticker or pair that could not be updated
+    """
+    def update_ticker(ticker: str) -> None:
+        if fundamentals_and_dividends:
+            datareader.update_statement(ticker=ticker, statement_type='all')
+            datareader.update_dividends(ticker=ticker)
+        datareader.update_prices(ticker=ticker)
+
+    tasks = {ticker: (lambda t=ticker: update_ticker(t)) for ticker in sorted(set(tickers))}
+    tasks.update({pair: (lambda p=pair: datareader.update_fx(currency_pair=p)) for pair in sorted(set(pairs))})
+    # the catalog entries of the downloads are saved once at the end
+    with datareader.catalog.batch():
+        return run(tasks=tasks, workers=workers)
+
+
+def run(tasks: Dict[str, Callable[[], None]], workers: int = 8) -> Dict[str, str]:
+    """
+    Runs update tasks with a pool of threads, a task that fails does not stop the others
+
+    :param tasks: update function by ticker or pair
+    :param workers: number of threads
+    :return: error by ticker or pair that could not be updated
+    """
+    def attempt(key: str) -> str:
+        try:
+            tasks[key]()
+        except Exception as ex:
+            logger.logging.error(f"unable to update {key}: {ex}")
+            return f"{type(ex).__name__}: {ex}"
+
+    keys = list(tasks)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        errors = list(pool.map(attempt, keys))
+    return {key: error for key, error in zip(keys, errors) if error is not None}
+
+
+def holdings(ptfs: List[IPortfolio]) -> Tuple[Set[str], Set[str], Dict[str, datetime]]:
+    """
+    Tickers, fx pairs and closed positions of many portfolios
+
+    :param ptfs: portfolios
+    :return: tickers, currency pairs and the last date held by ticker of the positions closed in every portfolio
+    """
+    tickers, pairs, last_held = set(), set(), {}
+    for ptf in ptfs:
+        pairs.add(f"{ptf.currency}{ptf.currency}")
+        for ticker, pos in ptf.positions.items():
+            tickers.add(ticker)
+            pairs.add(f"{pos.currency}{ptf.currency}")
+            last_held.setdefault(ticker, []).append(_last_held(pos.quantities))
+    closed = {ticker: max(dates) for ticker, dates in last_held.items() if None not in dates}
+    return tickers, pairs, closed
+
+
+def refresh_portfolios(ptfs: List[IPortfolio], datareader: DataReader, workers: int = 8,
+                       fundamentals_and_dividends: bool = False, force: bool = False) -> Dict[str, str]:
+    """
+    Updates the market data of many portfolios: every stale ticker and fx pair held by any of them is downloaded
+    once, then the portfolios are loaded again from the new files and their snapshots saved
+
+    :param ptfs: portfolios
+    :param datareader: DataReader shared by the portfolios
+    :param workers: number of download threads
+    :param fundamentals_and_dividends: True to also update the statements and dividends
+    :param force: True to download everything, even the data that is not stale
+    :return: error by ticker or pair that could not be updated
+    """
+    from pyportlib.services.refresh_planner import RefreshPlanner
+
+    tickers, pairs, closed = holdings(ptfs)
+    if force:
+        errors = download(datareader=datareader, tickers=tickers, pairs=pairs, workers=workers,
+                          fundamentals_and_dividends=fundamentals_and_dividends)
+    else:
+        errors = RefreshPlanner(datareader=datareader).refresh(tickers=tickers, pairs=pairs, closed=closed,
+                                                               fundamentals_and_dividends=fundamentals_and_dividends,
+                                                               workers=workers)
+    for ptf in ptfs:
+        ptf.reload()
+    logger.logging.info(f"{len(ptfs)} portfolios updated, {len(tickers)} tickers and {len(pairs)} fx pairs")
+    return errors
+
+
+def _last_held(quantities: pd.Series):
+    # last date with shares held, None while the position is open
+    if quantities is None or not len(quantities) or quantities.iloc[-1] != 0:
+        return None
+    held = quantities[quantities != 0]
+    return held.index[-1] if len(held) else quantities.index[0]
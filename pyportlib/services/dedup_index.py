@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from pyportlib.services.interfaces.icash_change import ICashChange
+from pyportlib.services.interfaces.itransaction import ITransaction
+from pyportlib.utils import files_utils, logger
+
+
+def transaction_fingerprint(date: datetime, ticker: str, transaction_type: str, quantity: float, price: float,
+                            fees: float, currency: str) -> str:
+    """
+    Stable fingerprint of a transaction
+    :return: hex digest
+    """
+    key = f"{pd.Timestamp(date):%Y-%m-%d}|{str(ticker).upper()}|{str(transaction_type).title()}|" \
+          f"{_number(quantity)}|{_number(price)}|{_number(fees)}|{str(currency).upper()}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def cash_change_fingerprint(date: datetime, direction: str, amount: float) -> str:
+    """
+    Stable fingerprint of a cash change
+    :return: hex digest
+    """
+    key = f"{pd.Timestamp(date):%Y-%m-%d}|{str(direction).title()}|{_number(amount)}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _number(value: float) -> str:
+    value = round(float(value), 6)
+    return f"{value + 0.:.6f}"
+
+
+class DedupIndex:
+    """
+    Count of every transaction and cash change fingerprint of an account, persisted with the account.
+    Membership checks are O(1) and counting lets genuinely repeated identical fills on the same day be told apart
+    from duplicates: a fill is only new if it appears more often than it already does in the account.
+    """
+    NAME = "Dedup Index"
+    _ACCOUNTS_DIRECTORY = files_utils.get_accounts_dir()
+    _INDEX_FILENAME = "dedup_index.json"
+    _TRANSACTION_FILENAME = "transactions.csv"
+    _CASH_FILENAME = "cash.csv"
+
+    def __init__(self, account: str):
+        self.account = account
+        self.directory = f"{self._ACCOUNTS_DIRECTORY}{self.account}"
+        self._transactions: Dict[str, int] = {}
+        self._cash_changes: Dict[str, int] = {}
+        self._sources: Union[Dict[str, str], None] = None
+
+    def __repr__(self):
+        return f"{self.account} - {self.NAME}"
+
+    def sync(self, transactions: pd.DataFrame, cash_changes: pd.DataFrame) -> None:
+        """
+        Loads the saved index, it is rebuilt from the account data if the account files changed since it was saved
+
+        :param transactions: account transactions
+        :param cash_changes: account cash changes
+        :return: None
+        """
+        self._load()
+        sources = self._file_hashes()
+        if sources != self._sources:
+            logger.logging.debug(f"rebuilding dedup index of {self.account}")
+            self._transactions = self._count([transaction_fingerprint(date, *row) for date, row in zip(
+                transactions.index, transactions[['Ticker', 'Type', 'Quantity', 'Price', 'Fees', 'Currency']].values)])
+            self._cash_changes = self._count([cash_change_fingerprint(date, *row) for date, row in zip(
+                cash_changes.index, cash_changes[['Direction', 'Amount']].values)])
+            self._sources = sources
+            self._save()
+
+    def new_transactions(self, transactions: List[ITransaction]) -> List[ITransaction]:
+        """
+        Transactions that are not already in the account
+
+        :param transactions: transactions from the account source
+        :return:
+        """
+        fingerprints = [transaction_fingerprint(trx.date, trx.ticker, trx.type, trx.quantity, trx.price, trx.fees,
+                                                trx.currency) for trx in transactions]
+        return self._new(transactions, fingerprints, self._transactions)
+
+    def new_cash_changes(self, cash_changes: List[ICashChange]) -> List[ICashChange]:
+        """
+        Cash changes that are not already in the account
+
+        :param cash_changes: cash changes from the account source
+        :return:
+        """
+        fingerprints = [cash_change_fingerprint(cc.info["Date"], cc.info["Direction"], cc.info["Amount"]) for cc in cash_changes]
+        return self._new(cash_changes, fingerprints, self._cash_changes)
+
+    def record(self, transactions: List[ITransaction], cash_changes: List[ICashChange], complete: bool = True) -> None:
+        """
+        Adds the transactions and cash changes written to the account to the index, without reading the account back
+
+        :param transactions: transactions added to the account
+        :param cash_changes: cash changes added to the account
+        :param complete: False if the account did not accept all of them, the index is then rebuilt on next sync
+        :return: None
+        """
+        if not complete:
+            self._sources = None
+        else:
+            for trx in transactions:
+                fingerprint = transaction_fingerprint(trx.date, trx.ticker, trx.type, trx.quantity, trx.price, trx.fees,
+                                                      trx.currency)
+                self._transactions[fingerprint] = self._transactions.get(fingerprint, 0) + 1
+            for cc in cash_changes:
+                fingerprint = cash_change_fingerprint(cc.info["Date"], cc.info["Direction"], cc.info["Amount"])
+                self._cash_changes[fingerprint] = self._cash_changes.get(fingerprint, 0) + 1
+            self._sources = self._file_hashes()
+        self._save()
+
+    @staticmethod
+    def _new(items: list, fingerprints: List[str], existing: Dict[str, int]) -> list:
+        seen = {}
+        new = []
+        for item, fingerprint in zip(items, fingerprints):
+            seen[fingerprint] = seen.get(fingerprint, 0) + 1
+            if seen[fingerprint] > existing.get(fingerprint, 0):
+                new.append(item)
+        return new
+
+    @staticmethod
+    def _count(fingerprints: List[str]) -> Dict[str, int]:
+        counts = {}
+        for fingerprint in fingerprints:
+            counts[fingerprint] = counts.get(fingerprint, 0) + 1
+        return counts
+
+    def _file_hashes(self) -> Dict[str, str]:
+        hashes = {}
+        for filename in [self._TRANSACTION_FILENAME, self._CASH_FILENAME]:
+            if files_utils.check_file(self.directory, filename):
+                with open(f"{self.directory}/{filename}", 'rb') as f:
+                    hashes[filename] = hashlib.sha1(f.read()).hexdigest()
+        return hashes
+
+    @property
+    def _filename(self) -> str:
+        return f"{self.directory}/{self._INDEX_FILENAME}"
+
+    def _load(self) -> None:
+        if files_utils.check_file(self.directory, self._INDEX_FILENAME):
+            with open(self._filename) as myfile:
+                index = json.loads(myfile.read())
+            self._transactions = index.get("transactions", {})
+            self._cash_changes = index.get("cash_changes", {})
+            self._sources = index.get("sources")
+
+    def _save(self) -> None:
+        index = {"sources": self._sources,
+                 "transactions": self._transactions,
+                 "cash_changes": self._cash_changes}
+        # written next to the index then swapped in, an interrupted save leaves the previous index readable
+        tmp = f"{self._filename}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp, self._filename)
+        logger.logging.debug(f"{self.account} dedup index saved")
@@ -1,4 +1,7 @@
-from typing import List, Set
+from typing import Dict, List, Set
+
+import numpy as np
+import pandas as pd
 
 from pyportlib.services.data_reader import DataReader
 from pyportlib.utils import logger
@@ -19,8 +22,19 @@ class FxRates:
         return self._NAME
 
     def set_pairs(self, pairs: List[str]):
-        self.pairs = pairs
-        self.refresh()
+        """
+        Adds currency pairs to the object. Only pairs that are not already loaded are fetched, so the same object
+        can be shared by many portfolios with the same currency. Loaded pairs are read again from the data reader,
+        which only goes to disk when their file was updated.
+        :param pairs: currency pairs ex. USDCAD
+        :return:
+        """
+        new_pairs = [pair for pair in pairs if pair not in self.rates]
+        self.pairs = list(dict.fromkeys(self.pairs + pairs))
+        for pair in new_pairs:
+            self.datareader.update_fx(currency_pair=pair)
+        for pair in pairs:
+            self.rates[pair] = self.datareader.read_fx(currency_pair=pair)
 
     def reset(self):
         self.pairs = []
@@ -49,11 +63,52 @@ class FxRates:
             self.set_pairs([pair])
             logger.logging.debug(f'setting pairs')
         elif pair not in self.pairs:
+            # only the new pair is read, the loaded ones are unchanged
             self.pairs.append(pair)
-            self._load()
+            self.rates[pair] = self.datareader.read_fx(currency_pair=pair)
 
         return self.rates.get(pair)
 
+    def convert(self, prices: Dict[str, pd.Series], currency: str) -> Dict[str, pd.Series]:
+        """
+        Converts the prices of many positions of the same currency to the portfolio currency. All the prices are
+        aligned on the rates in one lookup and converted into one preallocated array, the converted prices of
+        every position are slices of that array. Dates without a rate are dropped and the last price of each
+        position is converted at the last rate.
+
+        :param prices: local currency prices by ticker, sorted by date
+        :param currency: currency of the prices
+        :return: portfolio currency prices by ticker
+        """
+        prices = {ticker: p for ticker, p in prices.items() if len(p)}
+        if not prices:
+            return {}
+        rates = self.get(f"{currency}{self.ptf_currency}")
+        # a rate file can repeat a date (ex. two fetches appended), the last rate of the date is used
+        rates = rates[~rates.index.duplicated(keep='last')]
+        series = list(prices.values())
+        offsets = np.cumsum([0] + [len(p) for p in series])
+        dates = np.concatenate([p.index.values for p in series])
+
+        positions = rates.index.get_indexer(dates)
+        aligned = np.where(positions >= 0, rates.values[positions], np.nan)
+        last = offsets[1:] - 1
+        aligned[last[dates[last] != rates.index.values[-1]]] = rates.values[-1]
+
+        converted = np.empty(len(dates), dtype=float)
+        np.multiply(np.concatenate([p.values for p in series]), aligned, out=converted)
+        valid = ~np.isnan(converted)
+
+        out = {}
+        for i, (ticker, local) in enumerate(prices.items()):
+            start, end = offsets[i], offsets[i + 1]
+            mask = valid[start:end]
+            if mask.all():
+                out[ticker] = pd.Series(converted[start:end], index=local.index, name=local.name)
+            else:
+                out[ticker] = pd.Series(converted[start:end][mask], index=local.index[mask], name=local.name)
+        return out
+
     def _load(self):
         for pair in self.pairs:
             self.rates[pair] = self.datareader.read_fx(currency_pair=pair)
@@ -0,0 +1,148 @@
+import os
+from datetime import datetime
+from typing import List
+import numpy as np
+import pandas as pd
+
+from pyportlib.utils import files_utils, logger
+
+BAR_DTYPE = np.dtype([('ts', '<i8'),
+                      ('open', '<f4'),
+                      ('high', '<f4'),
+                      ('low', '<f4'),
+                      ('close', '<f4'),
+                      ('volume', '<i8')])
+_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+
+class IntradayBarStore:
+    """
+    Append only store of intraday bars. Bars are saved as fixed size binary records in one file per symbol and day,
+    so a day is read with a single np.fromfile and new bars are appended without rewriting the file.
+    """
+    NAME = "Intraday Bar Store"
+
+    def __init__(self, directory: str = None):
+        self.directory = directory if directory is not None else files_utils.get_intraday_data_dir()
+
+    def __repr__(self):
+        return self.NAME
+
+    def append(self, ticker: str, bars: pd.DataFrame) -> int:
+        """
+        Appends bars to the store, bars that are not after the last stored bar of their day are ignored
+
+        :param ticker: Stock ticker
+        :param bars: DataFrame indexed by bar start time with Open, High, Low, Close and Volume columns
+        :return: number of bars written
+        """
+        if bars.empty:
+            return 0
+        records = to_records(bars)
+        days = records['ts'].astype('datetime64[ns]').astype('datetime64[D]')
+        directory = self._ticker_dir(ticker=ticker)
+        if not files_utils.check_dir(directory):
+            files_utils.make_dir(directory)
+
+        written = 0
+        for day in np.unique(days):
+            day_records = records[days == day]
+            path = self._path(ticker=ticker, day=pd.Timestamp(day))
+            last = self._last_ts(path=path)
+            if last is not None:
+                day_records = day_records[day_records['ts'] > last]
+            if len(day_records):
+                with open(path, 'ab') as f:
+                    day_records.tofile(f)
+                written += len(day_records)
+        logger.logging.debug(f"{written} {ticker} intraday bars saved")
+        return written
+
+    def read(self, ticker: str, start_date: datetime = None, end_date: datetime = None) -> np.ndarray:
+        """
+        Stored bars of a ticker between two dates, both days included
+
+        :param ticker: Stock ticker
+        :param start_date: first day, first stored day if None
+        :param end_date: last day, last stored day if None
+        :return: structured array of BAR_DTYPE sorted by time
+        """
+        days = self.days(ticker=ticker)
+        if start_date is not None:
+            days = [day for day in days if day >= pd.Timestamp(start_date).normalize()]
+        if end_date is not None:
+            days = [day for day in days if day <= pd.Timestamp(end_date).normalize()]
+        if not days:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.concatenate([np.fromfile(self._path(ticker=ticker, day=day), dtype=BAR_DTYPE) for day in days])
+
+    def days(self, ticker: str) -> List[pd.Timestamp]:
+        """
+        Days with stored bars for a ticker
+        """
+        directory = self._ticker_dir(ticker=ticker)
+        if not files_utils.check_dir(directory):
+            return []
+        return sorted(pd.Timestamp(f[:-4]) for f in os.listdir(directory) if f.endswith('.bin'))
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return f"{self.directory}{ticker.replace('.TO', '_TO')}"
+
+    def _path(self, ticker: str, day: pd.Timestamp) -> str:
+        return f"{self._ticker_dir(ticker=ticker)}/{day:%Y-%m-%d}.bin"
+
+    @staticmethod
+    def _last_ts(path: str):
+        if not files_utils.check_file(directory="", file=path) or os.path.getsize(path) < BAR_DTYPE.itemsize:
+            return None
+        with open(path, 'rb') as f:
+            f.seek(-BAR_DTYPE.itemsize, os.SEEK_END)
+            return np.frombuffer(f.read(BAR_DTYPE.itemsize), dtype=BAR_DTYPE)['ts'][0]
+
+
+def to_records(bars: pd.DataFrame) -> np.ndarray:
+    """
+    Converts a DataFrame of bars to a sorted structured array of BAR_DTYPE
+    """
+    bars = bars.sort_index()
+    records = np.empty(len(bars), dtype=BAR_DTYPE)
+    records['ts'] = pd.DatetimeIndex(bars.index).values.astype('datetime64[ns]').astype(np.int64)
+    for field, column in _COLUMNS.items():
+        records[field] = bars[column].values
+    return records
+
+
+def to_frame(records: np.ndarray) -> pd.DataFrame:
+    """
+    Converts a structured array of BAR_DTYPE to a DataFrame indexed by bar start time
+    """
+    df = pd.DataFrame({column: records[field] for field, column in _COLUMNS.items()},
+                      index=pd.DatetimeIndex(records['ts'].astype('datetime64[ns]'), name='Date'))
+    return df
+
+
+def resample(records: np.ndarray, interval: str) -> np.ndarray:
+    """
+    Aggregates bars to a longer interval in one pass over the arrays. Buckets are aligned on the clock
+    (ex. 09:30, 09:35 for '5min') and empty buckets are omitted.
+
+    :param records: structured array of BAR_DTYPE sorted by time
+    :param interval: pandas offset alias of a fixed duration, ex. '5min', '1h'
+    :return: structured array of BAR_DTYPE, ts is the start of each bucket
+    """
+    if not len(records):
+        return records
+    step = pd.Timedelta(interval).value
+    buckets = records['ts'] // step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(records)] - 1
+
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out['ts'] = buckets[starts] * step
+    out['open'] = records['open'][starts]
+    out['high'] = np.maximum.reduceat(records['high'], starts)
+    out['low'] = np.minimum.reduceat(records['low'], starts)
+    out['close'] = records['close'][ends]
+    out['volume'] = np.add.reduceat(records['volume'], starts)
+    return out
+
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Set, Union
+
+import numpy as np
+import pandas as pd
+
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import logger, files_utils
+
+
+class PortfolioSnapshot:
+    """
+    Computed state of a portfolio (market value, cash history, position quantities, converted and local prices) saved
+    next to the account files. The snapshot is keyed by a hash of every file used to build it and is memory-mapped
+    back on the next start when none of them changed.
+    """
+    NAME = "Portfolio Snapshot"
+    VERSION = 2
+    _ACCOUNTS_DIRECTORY = files_utils.get_accounts_dir()
+    _SNAPSHOT_DIRECTORY = "snapshot"
+    _META_FILENAME = "meta.json"
+    _ACCOUNT_FILES = ["transactions.csv", "cash.csv", "position_tags.json"]
+
+    def __init__(self, account: str, datareader: DataReader):
+        self.account = account
+        self.directory = f"{self._ACCOUNTS_DIRECTORY}{self.account}/{self._SNAPSHOT_DIRECTORY}"
+        self._datareader = datareader
+
+    def __repr__(self):
+        return f"{self.account} - {self.NAME}"
+
+    def key(self, currency: str, tickers: List[str], currencies: Set[str]) -> str:
+        """
+        Hash of all the inputs of a portfolio build: account files, price files and fx files
+
+        :param currency: portfolio currency
+        :param tickers: tickers of the portfolio
+        :param currencies: currencies of the portfolio transactions
+        :return: hex digest
+        """
+        files = [f"{self._ACCOUNTS_DIRECTORY}{self.account}/{filename}" for filename in self._ACCOUNT_FILES]
+        files += [self._datareader.prices_path(ticker=ticker) for ticker in sorted(tickers)]
+        pairs = {f"{curr}{currency}" for curr in currencies} | {f"{currency}{currency}"}
+        files += [self._datareader.fx_path(currency_pair=pair) for pair in sorted(pairs)]
+
+        digest = hashlib.sha1(f"{self.VERSION}|{currency}".encode('utf-8'))
+        for file in files:
+            digest.update(file.encode('utf-8'))
+            digest.update(self._file_hash(file))
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Union[Dict, None]:
+        """
+        Loads the saved state if it was built from the same inputs
+
+        :param key: input hash from the key method
+        :return: dict of market_value, cash_history, prices, quantities and local_prices (of the positions whose
+        currency is not the portfolio currency). None if there is no valid snapshot
+        """
+        meta = self._read_meta()
+        if meta is None or meta.get("version") != self.VERSION or meta.get("key") != key:
+            logger.logging.debug(f'no valid snapshot for {self.account}')
+            return None
+
+        try:
+            dates = self._load_array("dates")
+            state = {"market_value": pd.Series(self._load_array("market_value"), index=pd.DatetimeIndex(dates)),
+                     "cash_history": pd.Series(self._load_array("cash_history"), index=pd.DatetimeIndex(dates)),
+                     "prices": self._load_ragged("prices", meta["tickers"]),
+                     "quantities": self._load_ragged("quantities", meta["tickers"]),
+                     "local_prices": self._load_ragged("local_prices", meta["local_tickers"])}
+        except (IOError, ValueError) as ex:
+            logger.logging.error(f'unable to read snapshot for {self.account}: {ex}')
+            return None
+
+        logger.logging.debug(f'{self.account} snapshot loaded')
+        return state
+
+    def save(self, key: str, market_value: pd.Series, cash_history: pd.Series,
+             prices: Dict[str, pd.Series], quantities: Dict[str, pd.Series],
+             local_prices: Dict[str, pd.Series] = None) -> None:
+        """
+        Saves the computed state of a portfolio
+
+        :param key: input hash from the key method
+        :param market_value: portfolio market value
+        :param cash_history: portfolio cash history, on the market value index
+        :param prices: position prices in portfolio currency by ticker
+        :param quantities: position quantities by ticker
+        :param local_prices: local currency prices by ticker of the positions whose currency is not the portfolio
+        currency
+        :return: None
+        """
+        if files_utils.check_dir(self.directory):
+            shutil.rmtree(self.directory)
+        files_utils.make_dir(self.directory)
+
+        tickers = list(prices.keys())
+        self._save_array("dates", market_value.index.values.astype('datetime64[ns]'))
+        self._save_array("market_value", market_value.values.astype(float))
+        self._save_array("cash_history", cash_history.reindex(market_value.index).values.astype(float))
+        self._save_ragged("prices", [prices[ticker] for ticker in tickers])
+        self._save_ragged("quantities", [quantities[ticker] for ticker in tickers])
+        local_prices = local_prices or {}
+        self._save_ragged("local_prices", list(local_prices.values()))
+
+        # meta is written last, a snapshot without it is never read
+        meta = {"version": self.VERSION,
+                "key": key,
+                "account": self.account,
+                "tickers": tickers,
+                "local_tickers": list(local_prices.keys()),
+                "created": datetime.now().isoformat()}
+        with open(f"{self.directory}/{self._META_FILENAME}", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        logger.logging.debug(f'{self.account} snapshot saved')
+
+    def reset(self) -> None:
+        if files_utils.check_dir(self.directory):
+            shutil.rmtree(self.directory)
+
+    def _read_meta(self) -> Union[dict, None]:
+        if not files_utils.check_file(self.directory, self._META_FILENAME):
+            return None
+        with open(f"{self.directory}/{self._META_FILENAME}") as myfile:
+            return json.loads(myfile.read())
+
+    def _save_array(self, name: str, array: np.ndarray) -> None:
+        np.save(f"{self.directory}/{name}.npy", array)
+
+    def _load_array(self, name: str) -> np.ndarray:
+        # copy on write, arrays are usable by pandas without touching the file
+        return np.load(f"{self.directory}/{name}.npy", mmap_mode='c')
+
+    def _save_ragged(self, name: str, series: List[pd.Series]) -> None:
+        """
+        Series of different lengths are saved end to end with their offsets so each one is read back as a
+        contiguous slice of the memory-mapped file
+        """
+        offsets = np.cumsum([0] + [len(s) for s in series]).astype(np.int64)
+        if series:
+            values = np.concatenate([s.values.astype(float) for s in series])
+            dates = np.concatenate([s.index.values.astype('datetime64[ns]') for s in series])
+        else:
+            values = np.array([], dtype=float)
+            dates = np.array([], dtype='datetime64[ns]')
+        self._save_array(f"{name}_values", values)
+        self._save_array(f"{name}_dates", dates)
+        self._save_array(f"{name}_offsets", offsets)
+
+    def _load_ragged(self, name: str, tickers: List[str]) -> Dict[str, pd.Series]:
+        values = self._load_array(f"{name}_values")
+        dates = self._load_array(f"{name}_dates")
+        offsets = self._load_array(f"{name}_offsets")
+        return {ticker: pd.Series(values[offsets[i]:offsets[i + 1]],
+                                  index=pd.DatetimeIndex(dates[offsets[i]:offsets[i + 1]], name='Date'),
+                                  name=ticker)
+                for i, ticker in enumerate(tickers)}
+
+    @staticmethod
+    def _file_hash(file: str) -> bytes:
+        if not os.path.isfile(file):
+            return b"missing"
+        with open(file, 'rb') as f:
+            return hashlib.sha1(f.read()).digest()
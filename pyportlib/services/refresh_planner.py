@@ -0,0 +1,167 @@
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List
+
+from pyportlib.services import data_refresh
+from pyportlib.services.data_reader import DataReader
+from pyportlib.utils import dates_utils, logger
+
+STATEMENTS = ['balance_sheet', 'cash_flow', 'income_statement']
+
+
+class RefreshPlan:
+    """
+    Market data to fetch: tickers whose prices, statements or dividends are stale and stale fx pairs
+    """
+    def __init__(self, prices: List[str], fx: List[str], statements: List[str], dividends: List[str],
+                 skipped: List[str]):
+        """
+        :param prices: tickers whose prices are fetched
+        :param fx: currency pairs whose rates are fetched
+        :param statements: tickers whose statements are fetched
+        :param dividends: tickers whose dividends are fetched
+        :param skipped: tickers of closed positions whose prices already cover the holding period
+        """
+        self.prices = prices
+        self.fx = fx
+        self.statements = statements
+        self.dividends = dividends
+        self.skipped = skipped
+
+    def __repr__(self):
+        return f"Refresh Plan - {len(self.prices)} prices, {len(self.fx)} fx, {len(self.statements)} statements, " \
+               f"{len(self.dividends)} dividends"
+
+    def __len__(self):
+        return len(self.prices) + len(self.fx) + len(self.statements) + len(self.dividends)
+
+
+class RefreshPlanner:
+    """
+    Fetches only the market data that is stale. Prices and fx rates are stale when they end before the last market
+    day whose close is published (their time to live is the delay before fetching again a series the data source
+    could not bring to that day), statements and dividends when they were fetched longer ago than their time to
+    live. Closed positions are skipped once their prices cover the holding period. The last stored dates and fetch
+    times come from the data catalog and the corporate actions manifest, no file is read to build a plan.
+    """
+    NAME = "Refresh Planner"
+    TTL = {'prices': timedelta(days=1),
+           'fx': timedelta(days=1),
+           'statements': timedelta(days=91),
+           'dividends': timedelta(days=7)}
+    # time of the day after which the close of a market day is expected from the data source
+    PUBLISHED = time(18, 0)
+
+    def __init__(self, datareader: DataReader, ttl: Dict[str, timedelta] = None, calendar: str = 'NYSE'):
+        """
+        :param datareader: DataReader
+        :param ttl: time to live by dataset, overrides the defaults of TTL
+        :param calendar: market calendar as in pandas_market_calendars
+        """
+        self._datareader = datareader
+        self.ttl = {**self.TTL, **(ttl or {})}
+        self.calendar = calendar
+
+    def __repr__(self):
+        return self.NAME
+
+    def plan(self, tickers: Iterable[str], pairs: Iterable[str] = (), closed: Dict[str, datetime] = None,
+             fundamentals_and_dividends: bool = False, now: datetime = None) -> RefreshPlan:
+        """
+        :param tickers: tickers held
+        :param pairs: currency pairs ex. USDCAD
+        :param closed: last date held by ticker of the closed positions
+        :param fundamentals_and_dividends: True to also plan the statements and dividends
+        :param now: time of the plan, now if None
+        :return:
+        """
+        now = now or datetime.now()
+        closed = closed or {}
+        catalog = self._datareader.catalog
+        tickers, pairs = sorted(set(tickers)), sorted(set(pairs))
+        last_day = self.last_market_day(now=now)
+
+        skipped = [ticker for ticker in tickers if ticker in closed
+                   and not catalog.stale(kind='prices', keys=[ticker], last_date=closed[ticker])]
+        open_tickers = [ticker for ticker in tickers if ticker not in skipped]
+        prices = self._stale_series(kind='prices', keys=open_tickers, last_day=last_day, now=now)
+        fx = self._stale_series(kind='fx', keys=pairs, last_day=last_day, now=now)
+
+        statements, dividends = [], []
+        if fundamentals_and_dividends:
+            statements = sorted({ticker for kind in STATEMENTS
+                                 for ticker in catalog.stale(kind=kind, keys=open_tickers,
+                                                             max_age=self.ttl['statements'], now=now)})
+            dividends = self._datareader.stale_dividends(tickers=open_tickers, max_age=self.ttl['dividends'])
+
+        plan = RefreshPlan(prices=prices, fx=fx, statements=statements, dividends=dividends, skipped=skipped)
+        logger.logging.debug(f"{plan}, {len(skipped)} closed positions skipped")
+        return plan
+
+    def execute(self, plan: RefreshPlan, workers: int = 8) -> Dict[str, str]:
+        """
+        Fetches the data of a plan with a pool of threads, the statements, dividends and prices of a ticker are
+        fetched by the same thread
+
+        :param plan: RefreshPlan
+        :param workers: number of threads
+        :return: error by ticker or pair that could not be updated
+        """
+        def update_ticker(ticker: str) -> None:
+            if ticker in plan.statements:
+                self._datareader.update_statement(ticker=ticker, statement_type='all')
+            if ticker in plan.dividends:
+                self._datareader.update_dividends(ticker=ticker)
+            if ticker in plan.prices:
+                self._datareader.update_prices(ticker=ticker)
+
+        tickers = sorted(set(plan.prices) | set(plan.statements) | set(plan.dividends))
+        tasks = {ticker: (lambda t=ticker: update_ticker(t)) for ticker in tickers}
+        tasks.update({pair: (lambda p=pair: self._datareader.update_fx(currency_pair=p)) for pair in plan.fx})
+        with self._datareader.catalog.batch():
+            return data_refresh.run(tasks=tasks, workers=workers)
+
+    def refresh(self, tickers: Iterable[str], pairs: Iterable[str] = (), closed: Dict[str, datetime] = None,
+                fundamentals_and_dividends: bool = False, workers: int = 8) -> Dict[str, str]:
+        """
+        Plans and fetches the stale market data
+
+        :param tickers: tickers held
+        :param pairs: currency pairs ex. USDCAD
+        :param closed: last date held by ticker of the closed positions
+        :param fundamentals_and_dividends: True to also refresh the statements and dividends
+        :param workers: number of threads
+        :return: error by ticker or pair that could not be updated
+        """
+        plan = self.plan(tickers=tickers, pairs=pairs, closed=closed,
+                         fundamentals_and_dividends=fundamentals_and_dividends)
+        if not len(plan):
+            return {}
+        return self.execute(plan=plan, workers=workers)
+
+    def last_market_day(self, now: datetime = None) -> datetime:
+        """
+        :param now: time of the plan, now if None
+        :return: last market day whose close should be available
+        """
+        now = now or datetime.now()
+        days = dates_utils.get_market_days(start=now - timedelta(days=10), end=now, market=self.calendar)
+        if days and days[-1].date() == now.date() and now.time() < self.PUBLISHED:
+            days = days[:-1]
+        if not days:
+            return dates_utils.last_bday(as_of=now - timedelta(days=1), calendar=self.calendar)
+        return days[-1]
+
+    def _stale_series(self, kind: str, keys: List[str], last_day: datetime, now: datetime) -> List[str]:
+        """
+        Keys missing from the catalog or ending before last_day. A series that was already fetched after the close
+        of last_day without reaching it (ex. a holiday of another exchange) is only fetched again after its time to
+        live.
+        """
+        catalog = self._datareader.catalog
+        published = datetime.combine(last_day.date(), self.PUBLISHED)
+        stale = []
+        for key in catalog.stale(kind=kind, keys=keys, last_date=last_day):
+            fetched = catalog.fetched(kind=kind, key=key)
+            if fetched is None or fetched < published or now - fetched > self.ttl[kind]:
+                stale.append(key)
+        return stale
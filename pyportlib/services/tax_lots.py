@@ -0,0 +1,245 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+
+from pyportlib.utils import logger
+
+
+class TaxLots:
+    """
+    Acquisition lots of a position, built from its transactions. Lots are kept in numpy arrays (date, quantity, unit
+    cost) that grow with the buys, sells relieve them with the FIFO, LIFO, average cost or specific identification
+    method and every relief is written in the realized gains ledger. Costs include the fees and are converted to the
+    portfolio currency at the rate of the trade date.
+    """
+    NAME = "Tax Lots"
+    METHODS = ["fifo", "lifo", "average", "specific"]
+    LEDGER = ['Date', 'Lot', 'Acquired', 'Quantity', 'Proceeds', 'Cost', 'Gain']
+
+    def __init__(self, ticker: str, method: str = "fifo", fx: pd.Series = None, capacity: int = 16):
+        """
+        :param ticker: ticker of the position
+        :param method: lot relief method, fifo, lifo, average or specific
+        :param fx: rate from the currency of the transactions to the portfolio currency, 1 if None
+        :param capacity: initial number of lots of the arrays
+        """
+        method = method.lower()
+        if method not in self.METHODS:
+            raise ValueError(f"lot method {method} is not supported, must be in {self.METHODS}")
+        self.ticker = ticker
+        self.method = method
+        self._fx = fx
+        self._capacity = capacity
+        self.reset()
+
+    def __repr__(self):
+        return f"{self.ticker} - {self.NAME} - {self.method.upper()}"
+
+    def reset(self) -> None:
+        self._dates = np.zeros(self._capacity, dtype='datetime64[ns]')
+        self._quantities = np.zeros(self._capacity)
+        self._unit_costs = np.zeros(self._capacity)
+        self._size = 0
+        self._ledger = []
+        self._history = []
+        self._realized = 0.
+        self._processed = 0
+        self._digest = hashlib.sha1().hexdigest()
+        self._lots_digest = self._hash_lots(None)
+
+    def update(self, transactions: pd.DataFrame,
+               specific_lots: Dict[Union[Tuple[datetime, int], datetime], List[int]] = None) -> None:
+        """
+        Applies the transactions of the position that were not applied yet. If transactions before the last one
+        applied or the specific lots changed, the lots are built again from the start.
+
+        :param transactions: transactions of the position indexed by date, with Type, Quantity, Price and Fees
+        :param specific_lots: lot ids to relieve by sell, for the specific method. A sell is identified by its date and
+        its position among the trades (buys and sells) of that date, ex. (2022-01-05, 1) for the second trade of the
+        day. A date alone applies to all the sells of the date.
+        :return: None
+        """
+        trades = transactions.loc[transactions.Type.isin(['Buy', 'Sell'])].sort_index(kind='stable')
+        lots_digest = self._hash_lots(specific_lots)
+        if len(trades) < self._processed or self._hash(trades.iloc[:self._processed]) != self._digest \
+                or lots_digest != self._lots_digest:
+            logger.logging.debug(f"{self}: transactions or specific lots changed, rebuilding lots")
+            self.reset()
+
+        specific_lots = {(pd.Timestamp(k[0]), k[1]) if isinstance(k, tuple) else pd.Timestamp(k): v
+                         for k, v in (specific_lots or {}).items()}
+        # position of every trade among the trades of its date
+        positions = trades.groupby(level=0).cumcount().values
+        new = trades.iloc[self._processed:]
+        for date, position, trx_type, quantity, price, fees in zip(new.index, positions[self._processed:],
+                                                                   new.Type.values, new.Quantity.values,
+                                                                   new.Price.values, new.Fees.fillna(0).values):
+            if trx_type == 'Buy':
+                self.buy(date=date, quantity=quantity, price=price, fees=fees)
+            else:
+                timestamp = pd.Timestamp(date)
+                lot_ids = specific_lots.get((timestamp, int(position)), specific_lots.get(timestamp))
+                self.sell(date=date, quantity=-quantity, price=price, fees=fees, lot_ids=lot_ids)
+        self._processed = len(trades)
+        self._digest = self._hash(trades)
+        self._lots_digest = lots_digest
+
+    def buy(self, date: datetime, quantity: float, price: float, fees: float = 0.) -> int:
+        """
+        Opens a lot
+
+        :param date: trade date
+        :param quantity: quantity bought
+        :param price: price in the currency of the transaction
+        :param fees: fees in the currency of the transaction
+        :return: id of the lot
+        """
+        if self._size == len(self._quantities):
+            self._grow()
+        rate = self._rate(date)
+        lot = self._size
+        self._dates[lot] = np.datetime64(pd.Timestamp(date), 'ns')
+        self._quantities[lot] = quantity
+        self._unit_costs[lot] = (quantity * price + fees) * rate / quantity
+        self._size += 1
+        self._record(date)
+        return lot
+
+    def sell(self, date: datetime, quantity: float, price: float, fees: float = 0., lot_ids: List[int] = None) -> float:
+        """
+        Relieves lots with the method of the object, or the given lots first for the specific method
+
+        :param date: trade date
+        :param quantity: quantity sold, positive
+        :param price: price in the currency of the transaction
+        :param fees: fees in the currency of the transaction
+        :param lot_ids: lots to relieve in order (specific method), the remaining quantity is relieved FIFO
+        :return: realized gain in the portfolio currency
+        """
+        quantities = self._quantities[:self._size]
+        held = quantities.sum()
+        if quantity > held + 1e-9:
+            logger.logging.error(f"{self.ticker}: selling {quantity} with {held} held on {pd.Timestamp(date).date()},"
+                                 f" only the held quantity is relieved")
+        quantity = min(quantity, held)
+        if quantity <= 0:
+            return 0.
+
+        if self.method == "average":
+            # pooled cost: every lot is relieved in proportion, the unit cost of the pool does not change
+            relieved = quantities * (quantity / held)
+        else:
+            relieved = np.zeros(self._size)
+            order = self._relief_order(lot_ids=lot_ids)
+            open_qty = quantities[order]
+            before = np.cumsum(open_qty) - open_qty
+            relieved[order] = np.clip(quantity - before, 0., open_qty)
+
+        rate = self._rate(date)
+        proceeds = (quantity * price - fees) * rate
+        lots = np.flatnonzero(relieved > 0)
+        costs = relieved[lots] * self._unit_costs[lots]
+        lot_proceeds = proceeds * relieved[lots] / quantity
+        timestamp = pd.Timestamp(date)
+        for lot, qty, cost, lot_proceed in zip(lots, relieved[lots], costs, lot_proceeds):
+            self._ledger.append((timestamp, -1 if self.method == "average" else int(lot),
+                                 pd.Timestamp(self._dates[lot]), qty, lot_proceed, cost, lot_proceed - cost))
+
+        self._quantities[:self._size] = np.where(np.isclose(quantities, relieved), 0., quantities - relieved)
+        gain = float(proceeds - costs.sum())
+        self._realized += gain
+        self._record(date)
+        return gain
+
+    @property
+    def quantity(self) -> float:
+        return float(self._quantities[:self._size].sum())
+
+    @property
+    def cost_basis(self) -> float:
+        """
+        Adjusted cost base of the open lots
+        """
+        return float(self._quantities[:self._size] @ self._unit_costs[:self._size])
+
+    @property
+    def average_cost(self) -> float:
+        quantity = self.quantity
+        return self.cost_basis / quantity if quantity else 0.
+
+    @property
+    def open_lots(self) -> pd.DataFrame:
+        open_ = np.flatnonzero(self._quantities[:self._size] > 0)
+        return pd.DataFrame({'Acquired': self._dates[open_],
+                             'Quantity': self._quantities[open_],
+                             'Unit Cost': self._unit_costs[open_],
+                             'Cost': self._quantities[open_] * self._unit_costs[open_]},
+                            index=pd.Index(open_, name='Lot'))
+
+    @property
+    def realized(self) -> pd.DataFrame:
+        """
+        Realized gains ledger, one row per lot relieved by a sell
+        """
+        return pd.DataFrame(self._ledger, columns=self.LEDGER).set_index('Date')
+
+    def daily(self, prices: pd.Series) -> pd.DataFrame:
+        """
+        Quantity, adjusted cost base, realized and unrealized gains of every date
+
+        :param prices: prices in the portfolio currency
+        :return: dates x (Quantity, Cost Basis, Market Value, Unrealized, Realized)
+        """
+        if not self._history:
+            state = pd.DataFrame(0., index=prices.index, columns=['Quantity', 'Cost Basis', 'Cumulative Realized'])
+        else:
+            state = pd.DataFrame(self._history, columns=['Date', 'Quantity', 'Cost Basis', 'Cumulative Realized'])
+            state = state.groupby('Date').last().reindex(prices.index, method='ffill').fillna(0.)
+        daily = state[['Quantity', 'Cost Basis']].copy()
+        daily['Market Value'] = daily['Quantity'] * prices
+        daily['Unrealized'] = daily['Market Value'] - daily['Cost Basis']
+        daily['Realized'] = state['Cumulative Realized'].diff().fillna(state['Cumulative Realized'])
+        return daily
+
+    def _relief_order(self, lot_ids: List[int] = None) -> np.ndarray:
+        open_ = np.flatnonzero(self._quantities[:self._size] > 0)
+        if self.method == "lifo":
+            return open_[::-1]
+        if self.method == "specific":
+            if not lot_ids:
+                logger.logging.warning(f"{self.ticker}: no lots given for a specific identification sell, FIFO used")
+                return open_
+            chosen = np.array([lot for lot in lot_ids if lot in set(open_)], dtype=int)
+            return np.concatenate([chosen, open_[~np.isin(open_, chosen)]])
+        return open_
+
+    def _record(self, date: datetime) -> None:
+        self._history.append((pd.Timestamp(date), self.quantity, self.cost_basis, self._realized))
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._quantities)
+        self._dates = np.resize(self._dates, capacity)
+        self._quantities = np.concatenate([self._quantities, np.zeros(capacity - len(self._quantities))])
+        self._unit_costs = np.concatenate([self._unit_costs, np.zeros(capacity - len(self._unit_costs))])
+
+    def _rate(self, date: datetime) -> float:
+        if self._fx is None:
+            return 1.
+        rate = self._fx.asof(pd.Timestamp(date))
+        return 1. if pd.isna(rate) else float(rate)
+
+    @staticmethod
+    def _hash(trades: pd.DataFrame) -> str:
+        digest = hashlib.sha1()
+        if len(trades):
+            digest.update(pd.util.hash_pandas_object(trades[['Type', 'Quantity', 'Price', 'Fees']], index=True).values)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_lots(specific_lots: Dict[Union[Tuple[datetime, int], datetime], List[int]] = None) -> str:
+        lots = {f"{pd.Timestamp(k[0]).isoformat()}|{k[1]}" if isinstance(k, tuple) else pd.Timestamp(k).isoformat():
+                [int(lot) for lot in v] for k, v in (specific_lots or {}).items()}
+        return hashlib.sha1(json.dumps(lots, sort_keys=True).encode('utf-8')).hexdigest()
@@ -9,8 +9,13 @@ class TransactionManager:
     _ACCOUNTS_DIRECTORY = files_utils.get_accounts_dir()
     _TRANSACTION_FILENAME = "transactions.csv"
 
-    def __init__(self, account):
+    def __init__(self, account, compact: bool = False):
+        """
+        :param account: name of the account
+        :param compact: True to store the ticker, type and currency of the transactions as categoricals
+        """
         self.account = account
+        self.compact = compact
         self.directory = f"{self._ACCOUNTS_DIRECTORY}{self.account}"
         self._transactions = pd.DataFrame()
         self.load()
@@ -34,7 +39,7 @@ class TransactionManager:
                     trx.set_index('Date', inplace=True)
                     trx.index.name = 'Date'
                     trx.index = pd.to_datetime(trx.index)
-                    self._transactions = trx
+                    self._transactions = df_utils.compact_transactions(trx) if self.compact else trx
 
                 else:
                     logger.logging.error(f'transactions do not match requirements for account: {self.account}')
@@ -50,6 +55,9 @@ class TransactionManager:
     def _write_trx(self, transaction: Transaction) -> None:
         new = transaction.df
         self._transactions = pd.concat([self._transactions, new])
+        if self.compact:
+            # categories of the new rows are merged in
+            df_utils.compact_transactions(self._transactions)
 
         self._transactions.to_csv(f"{self.directory}/{self._TRANSACTION_FILENAME}")
         logger.logging.debug('transactions file updated')
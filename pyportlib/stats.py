@@ -1,9 +1,6 @@
 from datetime import datetime
-import scipy.cluster.hierarchy as sch
 import numpy as np
 import pandas as pd
-from scipy.stats import norm
-import quantstats as qs
 
 from pyportlib.utils.time_series import ITimeSeries
 from pyportlib.utils import time_series
@@ -120,6 +117,7 @@ def annualized_volatility(pos: ITimeSeries, lookback: str = None, start_date: da
     :param kwargs: Portfolio PnL or Position PnL kwargs
     :return:
     """
+    import quantstats as qs
     returns = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end_date=end_date, **kwargs)
     return qs.stats.volatility(returns=returns, prepare_returns=False, annualize=True)
 
@@ -137,6 +135,7 @@ def value_at_risk(pos, lookback: str, start_date: datetime = None, end_date: dat
     :param kwargs: Portfolio PnL or Position PnL kwargs
     :return:
     """
+    import quantstats as qs
 
     returns = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end_date=end_date, **kwargs)
     if method == "gaussian":
@@ -165,6 +164,7 @@ def rolling_var(pos, lookback: str = None, start_date: datetime = None, end_date
     :param kwargs: Portfolio PnL or Position PnL kwargs
     :return:
     """
+    from scipy.stats import norm
 
     returns = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end_date=end_date, **kwargs)
     mean = returns.rolling(rolling_period).mean()
@@ -173,6 +173,60 @@ def rolling_var(pos, lookback: str = None, start_date: datetime = None, end_date
     return pd.Series(stat, index=returns.index).dropna() * -1
 
 
+def intraday_volatility(pos: ITimeSeries, interval: str = '5min', lookback: str = None, start_date: datetime = None,
+                        end_date: datetime = None, annualize: bool = True, **kwargs) -> float:
+    """
+    Compute the volatility of intraday returns from a TimeSeries object with saved intraday bars
+
+    :param pos: TimeSeries Object (Position or Pandas Series of intraday returns)
+    :param interval: Interval of the returns, ex. '5min', '1h'
+    :param lookback: String: ex. "1y", "15m". Only m and y is supported to generate look back. See date_window doc.
+    :param start_date:
+    :param end_date:
+    :param annualize: True to scale by the number of intervals in a trading year, else volatility per interval
+    :param kwargs: Position returns kwargs
+    :return:
+    """
+    returns = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end_date=end_date,
+                                       interval=interval, **kwargs)
+    vol = returns.std()
+    if annualize:
+        vol *= np.sqrt(_intervals_per_day(returns) * 252)
+    return vol
+
+
+def intraday_value_at_risk(pos: ITimeSeries, interval: str = '5min', lookback: str = None, start_date: datetime = None,
+                           end_date: datetime = None, quantile=0.95, method: str = "gaussian", **kwargs) -> float:
+    """
+    Compute the value at risk over one interval of the intraday returns distribution from a TimeSeries object
+
+    :param pos: TimeSeries Object (Position or Pandas Series of intraday returns)
+    :param interval: Interval of the returns, ex. '5min', '1h'
+    :param lookback: String: ex. "1y", "15m". Only m and y is supported to generate look back. See date_window doc.
+    :param start_date:
+    :param end_date:
+    :param quantile: Quantile on which to compite VaR
+    :param method: VaR compute method. 'gaussian' and 'historical' are implemented
+    :param kwargs: Position returns kwargs
+    :return:
+    """
+    from scipy.stats import norm
+    returns = time_series.prep_returns(ts=pos, lookback=lookback, start_date=start_date, end_date=end_date,
+                                       interval=interval, **kwargs)
+    if method == "gaussian":
+        return abs(norm.ppf(1 - quantile, returns.mean(), returns.std()))
+
+    if method == "historical":
+        return abs(returns.quantile(q=1 - quantile))
+
+    raise NotImplementedError(f"{method}")
+
+
+def _intervals_per_day(returns: pd.Series) -> float:
+    days = returns.index.normalize().nunique()
+    return len(returns) / days if days else 0.
+
+
 def cluster_corr(corr_array, inplace=False):
     """
     Rearranges the correlation matrix, corr_array, so that groups of highly
@@ -182,9 +236,9 @@ def cluster_corr(corr_array, inplace=False):
     :param inplace: bool
     :return:
     """
+    import scipy.cluster.hierarchy as sch
 
-    pairwise_distances = sch.distance.pdist(corr_array)
-    linkage = sch.linkage(pairwise_distances, method='complete')
+    pairwise_distances, linkage = correlation_linkage(corr_array)
     cluster_distance_threshold = pairwise_distances.max() / 2
     idx_to_cluster_array = sch.fcluster(linkage, cluster_distance_threshold,
                                         criterion='distance')
@@ -196,3 +250,32 @@ def cluster_corr(corr_array, inplace=False):
     if isinstance(corr_array, pd.DataFrame):
         return corr_array.iloc[idx, :].T.iloc[idx, :]
     return corr_array[idx, :][:, idx]
+
+
+def correlation_linkage(corr_array, method: str = 'complete'):
+    """
+    Hierarchical clustering of the variables of a correlation matrix, on the distances between their rows
+
+    :param corr_array: pandas.DataFrame or numpy.ndarray a NxN correlation matrix
+    :param method: scipy linkage method
+    :return: condensed pairwise distances and the scipy linkage matrix
+    """
+    import scipy.cluster.hierarchy as sch
+    pairwise_distances = sch.distance.pdist(corr_array)
+    linkage = sch.linkage(pairwise_distances, method=method)
+    return pairwise_distances, linkage
+
+
+def cluster_order(corr_array, method: str = 'complete') -> np.ndarray:
+    """
+    Order of the variables of a correlation matrix that puts similar variables next to eachother (dendrogram leaves)
+
+    :param corr_array: pandas.DataFrame or numpy.ndarray a NxN correlation matrix
+    :param method: scipy linkage method
+    :return: positions of the variables in their new order
+    """
+    import scipy.cluster.hierarchy as sch
+    if len(corr_array) < 2:
+        return np.arange(len(corr_array))
+    _, linkage = correlation_linkage(corr_array, method=method)
+    return sch.leaves_list(linkage)
@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta
 from typing import List
-import pandas_market_calendars as mcal
 from dateutil.relativedelta import relativedelta
 from pandas._libs.tslibs.offsets import BDay
 import warnings
@@ -18,6 +17,7 @@ def get_market_days(start: datetime, end: datetime = None, market: str = 'NYSE')
     :param market: Market calendar as in pandas_market_calendars. Default is "NYSE".
     :return:
     """
+    import pandas_market_calendars as mcal
     if end is None:
         end = datetime.today()
     if start is None:
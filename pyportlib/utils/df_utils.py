@@ -1,4 +1,11 @@
 from typing import List
+import numpy as np
+import pandas as pd
+
+# largest price stored as float32, float32 numbers are 2 ** -8 apart just below it so a price is rounded by at most
+# 2 ** -9 (under a fifth of a cent), the rounding stays under a hundredth of a cent below 2 ** 10
+FLOAT32_PRICE_LIMIT = 2 ** 16
+CATEGORY_COLUMNS = ['Ticker', 'Type', 'Currency']
 
 
 def check_df_columns(df, columns: List[str]) -> bool:
@@ -32,3 +39,29 @@ def red_green_cmap(value):
         color = 'black'
 
     return 'color: %s' % color
+
+
+def compact_prices(prices: pd.Series) -> pd.Series:
+    """
+    Stores prices as float32 when their precision allows it (finite and below FLOAT32_PRICE_LIMIT), float64 otherwise.
+    No copy is made when the prices already have the right dtype.
+    :param prices: Pandas Series of prices
+    :return:
+    """
+    values = prices.values
+    if len(values) and (not np.isfinite(values[~np.isnan(values)]).all()
+                        or np.nanmax(np.abs(values), initial=0.) >= FLOAT32_PRICE_LIMIT):
+        return prices.astype(float, copy=False)
+    return prices.astype(np.float32, copy=False)
+
+
+def compact_transactions(transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ticker, Type and Currency of transactions as categorical columns, in place
+    :param transactions: Pandas Dataframe of transactions
+    :return: the same Dataframe
+    """
+    for column in CATEGORY_COLUMNS:
+        if column in transactions.columns and not isinstance(transactions[column].dtype, pd.CategoricalDtype):
+            transactions[column] = transactions[column].astype('category')
+    return transactions
@@ -1,4 +1,5 @@
 import os
+from contextlib import contextmanager
 from pathlib import Path
 
 from pyportlib.utils.config_utils import create_default_config
@@ -43,25 +44,50 @@ def make_dir(path) -> None:
     os.makedirs(path)
 
 
-_client_dir: str
-_data_dir: str
-_accounts_dir: str
-_price_data_dir: str
-_fx_data_dir: str
-_statements_data_dir: str
-_config_dir: str
-_outputs_dir: str
+@contextmanager
+def file_lock(path: str):
+    """
+    Lock held by one process at a time on a file shared by many processes, on the lock file path.lock
+    :param path: String of the path of the shared file
+    :return: None
+    """
+    with open(f"{path}.lock", 'a+') as lock:
+        if os.name == 'nt':
+            import msvcrt
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+_client_dir: str = None
+_data_dir: str = None
+_accounts_dir: str = None
+_price_data_dir: str = None
+_fx_data_dir: str = None
+_statements_data_dir: str = None
+_intraday_data_dir: str = None
+_config_dir: str = None
+_outputs_dir: str = None
 
 
 def _check_client_dir():
     """
-    Raise an exception if the user has not set the data-directory.
-    This is used instead of a really strange Python error-message.
+    Sets the default data-directory the first time a directory is needed if the user has not set one.
+    Nothing is created on disk when pyportlib is imported.
     """
     if _data_dir is None:
-        msg = 'The pyportlib data directory has not been set by the user. ' \
-              'Please call the function pyportlib.set_client_dir() first.'
-        raise Exception(msg)
+        set_client_dir()
 
 
 def set_client_dir(data_dir="") -> None:
@@ -73,7 +99,7 @@ def set_client_dir(data_dir="") -> None:
     """
     data_dir = f'~{data_dir}/pyportlib_client_data'
     global _client_dir, _data_dir, _accounts_dir, _price_data_dir, \
-        _fx_data_dir, _statements_data_dir, _config_dir, _outputs_dir
+        _fx_data_dir, _statements_data_dir, _intraday_data_dir, _config_dir, _outputs_dir
 
     # Expand directory if it begins with ~
     _client_dir = os.path.expanduser(data_dir)
@@ -83,6 +109,7 @@ def set_client_dir(data_dir="") -> None:
     _price_data_dir = os.path.join(_data_dir, 'prices/')
     _fx_data_dir = os.path.join(_data_dir, 'fx/')
     _statements_data_dir = os.path.join(_data_dir, 'statements/')
+    _intraday_data_dir = os.path.join(_data_dir, 'intraday/')
 
     _config_dir = os.path.join(_client_dir, 'config/')
     _outputs_dir = os.path.join(_client_dir, 'outputs/')
@@ -97,6 +124,8 @@ def set_client_dir(data_dir="") -> None:
         os.makedirs(_fx_data_dir)
     if not os.path.exists(_statements_data_dir):
         os.makedirs(_statements_data_dir)
+    if not os.path.exists(_intraday_data_dir):
+        os.makedirs(_intraday_data_dir)
 
     if not os.path.exists(_accounts_dir):
         os.makedirs(_accounts_dir)
@@ -114,7 +143,7 @@ def get_client_dir() -> str:
     Get the full path for the main data directory where datasets are saved on disk.
     :return: String with the path for the data-directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _client_dir
 
@@ -126,7 +155,7 @@ def get_data_dir() -> str:
 
     :return: String with the path for the download directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _data_dir
 
@@ -138,7 +167,7 @@ def get_accounts_dir() -> str:
 
     :return: String with the path for the accounts directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _accounts_dir
 
@@ -150,7 +179,7 @@ def get_config_dir() -> str:
 
     :return: String with the path for the accounts directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _config_dir
 
@@ -162,7 +191,7 @@ def get_price_data_dir() -> str:
 
     :return: String with the path for the price directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _price_data_dir
 
@@ -174,7 +203,7 @@ def get_fx_data_dir() -> str:
 
     :return: String with the path for the fx directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _fx_data_dir
 
@@ -186,17 +215,29 @@ def get_statements_data_dir() -> str:
 
     :return: String with the path for the statements directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _statements_data_dir
 
 
+def get_intraday_data_dir() -> str:
+    """
+    Get the full path for the intraday bars directory where
+    the files are stored.
+
+    :return: String with the path for the intraday directory.
+    """
+    # Ensure the data-directory has been set
+    _check_client_dir()
+    return _intraday_data_dir
+
+
 def get_outputs_dir() -> str:
     """
     Get the full path for the outputs directory
 
     :return: String with the path for the outputs directory.
     """
-    # Ensure the data-directory has been set by the user.
+    # Ensure the data-directory has been set
     _check_client_dir()
     return _outputs_dir
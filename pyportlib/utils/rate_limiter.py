@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket. acquire() blocks until a call is allowed.
+    """
+
+    def __init__(self, rate: float, per: float = 1.):
+        """
+        :param rate: number of calls allowed
+        :param per: period in seconds on which the rate applies
+        """
+        self._capacity = float(rate)
+        self._fill_rate = float(rate) / per
+        self._tokens = float(rate)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"RateLimiter - {self._fill_rate}/s"
+
+    def acquire(self) -> None:
+        """
+        Waits until a token is available and consumes it
+        :return: None
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._fill_rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._fill_rate
+            time.sleep(wait)
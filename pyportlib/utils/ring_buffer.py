@@ -0,0 +1,48 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer:
+    """
+    Fixed size buffer of timestamped values backed by numpy arrays. Appending overwrites the oldest value once the
+    buffer is full, so memory does not grow with the number of ticks.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float64):
+        self._capacity = capacity
+        self._times = np.zeros(capacity, dtype='datetime64[ns]')
+        self._values = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __repr__(self):
+        return f"RingBuffer - {self._size}/{self._capacity}"
+
+    def __len__(self):
+        return self._size
+
+    def append(self, time: datetime, value: float) -> None:
+        end = (self._start + self._size) % self._capacity
+        self._times[end] = np.datetime64(time, 'ns')
+        self._values[end] = value
+        if self._size < self._capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self._capacity
+
+    def last(self) -> float:
+        if not self._size:
+            return np.nan
+        return self._values[(self._start + self._size - 1) % self._capacity]
+
+    def values(self) -> np.ndarray:
+        """
+        Values from oldest to newest
+        """
+        idx = (self._start + np.arange(self._size)) % self._capacity
+        return self._values[idx]
+
+    def to_series(self) -> pd.Series:
+        idx = (self._start + np.arange(self._size)) % self._capacity
+        return pd.Series(self._values[idx], index=pd.DatetimeIndex(self._times[idx]))
@@ -24,7 +24,8 @@ def prep_returns(ts: Union[ITimeSeries, pd.DataFrame, pd.Series], start_date: da
     :param lookback: string determining the start date. ex: '1y'
     :param start_date: start date of observation
     :param end_date: end date of observation
-    :param kwargs: PnL keyword arguments for Portfolio (tags, positions_to_exclude, include_cash)
+    :param kwargs: PnL keyword arguments for Portfolio (tags, positions_to_exclude, include_cash) or interval for
+    intraday returns of a Position
     :return:
     """
     if lookback is not None:
@@ -40,6 +41,9 @@ def prep_returns(ts: Union[ITimeSeries, pd.DataFrame, pd.Series], start_date: da
         end_date = dates_utils.last_bday(end_date)
 
     if isinstance(ts, pd.Series) or isinstance(ts, pd.DataFrame):
+        if kwargs.get("interval") is not None:
+            # intraday returns, the whole end date is included
+            end_date = pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
         series = ts.loc[start_date:end_date].fillna(0)
     else:
         series = ts.returns(start_date=start_date, end_date=end_date, **kwargs)
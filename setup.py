@@ -71,7 +71,7 @@ setup(
     install_requires=requirements,
     entry_points={
         'console_scripts': [
-            'sample=sample:main',
+            'pyportlib=pyportlib.main:main',
         ],
     },
 
@@ -0,0 +1,125 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pyportlib.account_sources.questrade_api.http_client import HttpClient
+from pyportlib.account_sources.questrade_api.questrade import Questrade, AsyncQuestrade
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    fail_next = 0
+    # requests received then dropped without a response, like an idle connection closed by the server
+    drop_next = 0
+    posts = 0
+
+    def _drop(self):
+        if StubHandler.drop_next:
+            StubHandler.drop_next -= 1
+            self.close_connection = True
+            return True
+        return False
+
+    def do_GET(self):
+        StubHandler.connections.add(self.client_address)
+        if self._drop():
+            return
+        if StubHandler.fail_next:
+            StubHandler.fail_next -= 1
+            self._send(503, {"code": 1, "message": "unavailable"})
+            return
+        self._send(200, {"path": self.path, "auth": self.headers.get("Authorization")})
+
+    def do_POST(self):
+        StubHandler.posts += 1
+        if self._drop():
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self._send(200, {"path": self.path, "body": body})
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestQuestradeClient:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    def client(self, tmp_path):
+        token = {"api_server": self.url, "token_type": "Bearer", "access_token": "abc", "refresh_token": "def",
+                 "expires_at": str(int(time.time()) + 3600)}
+        token_path = tmp_path / "questrade.json"
+        token_path.write_text(json.dumps(token))
+        return Questrade(token_path=str(token_path), http_client=HttpClient(backoff=0.01))
+
+    def test_keep_alive(self, tmp_path):
+        StubHandler.connections = set()
+        q = self.client(tmp_path)
+        for _ in range(5):
+            result = q.time
+
+        assert result == {"path": "/v1/time", "auth": "Bearer abc"}
+        assert len(StubHandler.connections) == 1
+
+    def test_retry_on_5xx(self, tmp_path):
+        q = self.client(tmp_path)
+        StubHandler.fail_next = 2
+        result = q.account_activities(123, startTime="2022-01-01")
+
+        assert result["path"] == "/v1/accounts/123/activities?startTime=2022-01-01&"
+        assert StubHandler.fail_next == 0
+
+    def test_post(self, tmp_path):
+        q = self.client(tmp_path)
+        result = q.markets_options(filters=[{"underlyingId": 1}])
+
+        assert result == {"path": "/v1/markets/quotes/options", "body": {"filters": [{"underlyingId": 1}]}}
+
+    def test_async(self, tmp_path):
+        q = AsyncQuestrade(client=self.client(tmp_path))
+
+        async def fetch():
+            return await asyncio.gather(q.accounts, q.symbol(8049))
+
+        accounts, symbol = asyncio.run(fetch())
+
+        assert accounts["path"] == "/v1/accounts"
+        assert symbol["path"] == "/v1/symbols/8049"
+
+    def test_stale_connection(self):
+        client = HttpClient(max_retries=0, backoff=0.01)
+        client.request('GET', f"{self.url}v1/time")
+
+        # the request may have reached the server, only the GET is sent again on a new connection
+        StubHandler.drop_next = 1
+        status, _ = client.request('GET', f"{self.url}v1/time")
+        assert status == 200
+
+        StubHandler.drop_next, StubHandler.posts = 1, 0
+        with pytest.raises((http.client.HTTPException, OSError)):
+            client.request('POST', f"{self.url}v1/markets/quotes/options", body=b'{}',
+                           headers={'Content-Type': 'application/json'})
+        assert StubHandler.posts == 1
+
+        # a retried POST counts as an attempt
+        client = HttpClient(max_retries=1, backoff=0.01)
+        client.request('GET', f"{self.url}v1/time")
+        StubHandler.drop_next, StubHandler.posts = 1, 0
+        status, _ = client.request('POST', f"{self.url}v1/markets/quotes/options", body=b'{}',
+                                   headers={'Content-Type': 'application/json'})
+        assert status == 200 and StubHandler.posts == 2
@@ -0,0 +1,95 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from pyportlib.account_sources.questrade_connection import QuestradeConnection
+from pyportlib.utils import files_utils
+from pyportlib.utils.rate_limiter import RateLimiter
+
+
+class FakeConnection(QuestradeConnection):
+    def __init__(self):
+        # no call to the api, only the activities are faked
+        self.account_id = '123'
+        self._rate_limiter = RateLimiter(rate=1000)
+        self.calls = []
+        self.fail = set()
+
+    def account_activities(self, account_id, startTime, endTime):
+        start, end = startTime[:10], endTime[:10]
+        self.calls.append((start, end))
+        if start in self.fail:
+            return {'code': 1, 'message': 'unavailable'}
+        return {'activities': [{'start': start, 'end': end}]}
+
+
+class TestDateWindows:
+    def test_windows(self):
+        windows = QuestradeConnection._date_windows(start_date=datetime(2022, 1, 3, 15), end_date=datetime(2022, 3, 20),
+                                                    days=30)
+
+        assert windows[0][0] == datetime(2022, 1, 3) and windows[-1][1] == datetime(2022, 3, 20)
+        assert all((end - start).days < 30 for start, end in windows)
+        assert all(windows[i + 1][0] - windows[i][1] == timedelta(days=1) for i in range(len(windows) - 1))
+        assert QuestradeConnection._date_windows(start_date=datetime(2022, 1, 3), end_date=datetime(2022, 1, 3),
+                                                 days=30) == [(datetime(2022, 1, 3), datetime(2022, 1, 3))]
+        assert QuestradeConnection._date_windows(start_date=datetime(2022, 1, 4), end_date=datetime(2022, 1, 3),
+                                                 days=30) == []
+
+    def test_anchor(self):
+        anchor = datetime(2000, 1, 1)
+        first = QuestradeConnection._date_windows(start_date=datetime(2022, 1, 3), end_date=datetime(2022, 6, 1),
+                                                  days=30, anchor=anchor)
+        second = QuestradeConnection._date_windows(start_date=datetime(2022, 1, 20), end_date=datetime(2022, 6, 15),
+                                                   days=30, anchor=anchor)
+
+        # only the first and last windows depend on the range
+        assert set(first) & set(second) == set(first[2:-1])
+        assert first[2:-1] == second[1:4]
+        assert all((end - start).days < 30 for start, end in first + second)
+        assert all((end + timedelta(days=1) - anchor).days % 30 == 0 for _, end in first[:-1])
+
+
+class TestCheckpoint:
+    @pytest.fixture(autouse=True)
+    def config_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(files_utils, 'get_config_dir', lambda: f"{tmp_path}/")
+
+    def test_resume(self):
+        connection = FakeConnection()
+        windows = connection._date_windows(start_date=datetime(2022, 1, 3), end_date=datetime(2022, 4, 29), days=30,
+                                           anchor=connection._WINDOW_ANCHOR)
+        connection.fail = {windows[1][0].date().isoformat()}
+
+        with pytest.raises(ConnectionError):
+            connection.get_transactions(start_date=datetime(2022, 1, 3), end_date=datetime(2022, 4, 29))
+        assert len(connection._load_checkpoint()) == len(windows) - 1
+
+        # the backfill resumes a few days later from a later start, only the windows that changed are requested
+        connection.fail, connection.calls = set(), []
+        activities = connection.get_transactions(start_date=datetime(2022, 1, 4), end_date=datetime(2022, 5, 3))
+        assert sorted(connection.calls) == [('2022-01-04', windows[0][1].date().isoformat()),
+                                            (windows[1][0].date().isoformat(), windows[1][1].date().isoformat()),
+                                            (windows[-1][0].date().isoformat(), '2022-05-03')]
+        assert [a['start'] for a in activities] == ['2022-01-04'] + [w[0].date().isoformat() for w in windows[1:]]
+        assert activities[-1]['end'] == '2022-05-03'
+        assert connection._load_checkpoint() == {}
+
+
+class TestRateLimiter:
+    def test_rate(self):
+        limiter = RateLimiter(rate=50)
+        start = time.monotonic()
+        for _ in range(50):
+            limiter.acquire()
+        # the bucket starts full
+        assert time.monotonic() - start < 0.2
+
+        threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert time.monotonic() - start >= 0.35
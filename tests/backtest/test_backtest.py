@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.backtest.engine import Backtest
+from pyportlib.backtest.istrategy import IStrategy
+
+
+class BuyAndHold(IStrategy):
+    def __init__(self, weights: dict):
+        self.weights = weights
+
+    def on_day(self, date, context):
+        if context.i == 0:
+            return self.weights
+
+
+class MovingAverage(IStrategy):
+    def __init__(self, window: int):
+        self.window = window
+
+    def on_day(self, date, context):
+        history = context.history(self.window)
+        if len(history) < self.window:
+            return None
+        return (context.prices > history.mean(axis=0)) / len(context.tickers)
+
+
+def _prices() -> pd.DataFrame:
+    dates = pd.bdate_range('2022-01-03', periods=60)
+    return pd.DataFrame({'AAA': np.linspace(100, 160, 60), 'BBB': np.linspace(50, 40, 60)}, index=dates)
+
+
+class TestBacktest:
+
+    def test_buy_and_hold(self):
+        bt = Backtest(prices=_prices(), currency='CAD', initial_cash=10000., execution_lag=0)
+        result = bt.run(BuyAndHold({'AAA': 0.5, 'BBB': 0.5}))
+
+        assert list(result.holdings.iloc[-1]) == [50, 100]
+        assert result.cash_history.iloc[0] == 0
+        assert round(result.equity.iloc[-1], 2) == 50 * 160 + 100 * 40
+        assert round((1 + result.returns(None, None)).prod() * 10000, 2) == round(result.equity.iloc[-1], 2)
+
+    def test_fees_lots_and_lag(self):
+        bt = Backtest(prices=_prices(), currency='CAD', initial_cash=10000., fee_per_trade=5., lot_size=10,
+                      execution_lag=1)
+        result = bt.run(BuyAndHold({'AAA': 1.}))
+        trx = result.transactions
+
+        assert len(trx) == 1
+        assert trx.index[0] == _prices().index[1]
+        assert trx.Quantity.iloc[0] == 90
+        assert result.total_fees == 5.
+        assert result.cash_history.iloc[-1] >= 0
+
+    def test_target_weights_with_lag(self):
+        class Target(IStrategy):
+            def on_day(self, date, context):
+                return {'A': 0.5}
+
+        prices = pd.DataFrame({'A': 10.}, index=pd.bdate_range('2022-01-03', periods=8))
+        for lag in [1, 2, 3]:
+            bt = Backtest(prices=prices, currency='CAD', initial_cash=1000., execution_lag=lag)
+            holdings = bt.run(Target()).holdings.A
+
+            assert list(holdings.iloc[:lag]) == [0] * lag
+            assert (holdings.iloc[lag:] == 50).all()
+
+    def test_fx(self):
+        fx = pd.DataFrame({'AAA': 1.25, 'BBB': 1.}, index=_prices().index)
+        bt = Backtest(prices=_prices(), currency='CAD', currencies={'AAA': 'USD'}, fx=fx, initial_cash=12500.,
+                      execution_lag=0)
+        result = bt.run(BuyAndHold({'AAA': 1.}))
+
+        assert result.transactions.Currency.iloc[0] == 'USD'
+        assert result.holdings.AAA.iloc[-1] == 100
+
+    def test_run_many(self):
+        bt = Backtest(prices=_prices(), currency='CAD', initial_cash=10000.)
+        strategies = [MovingAverage(window) for window in [5, 10, 20]]
+        results = bt.run_many(strategies, processes=2)
+
+        assert len(results) == 3
+        assert results[1].equity.iloc[-1] == bt.run(strategies[1]).equity.iloc[-1]
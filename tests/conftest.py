@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyportlib.services.data_catalog import DataCatalog
+from pyportlib.utils import dates_utils
+
+
+class FakeReader:
+    """
+    DataReader of the tests: prices and fx rates are kept in memory, the reads and updates are recorded. An update
+    adds the data to the catalog as a fetch would, keys in fail raise instead.
+    """
+    def __init__(self, directory, prices: dict = None, fx: dict = None):
+        self.directory = directory
+        self.prices = prices or {}
+        self.fx = fx or {}
+        self.catalog = DataCatalog(directory=f"{directory}/")
+        self.price_reads = []
+        self.fx_reads = []
+        self.calls = []
+        self.fail = set()
+        self.fresh_dividends = set()
+        self.read_only = False
+
+    def read_prices(self, ticker):
+        self.price_reads.append(ticker)
+        return self.prices[ticker].copy()
+
+    def read_fx(self, currency_pair):
+        self.fx_reads.append(currency_pair)
+        return self.fx[currency_pair].copy()
+
+    def update_prices(self, ticker):
+        self._update(kind='prices', key=ticker, data=self.prices, path=self.prices_path(ticker))
+
+    def update_fx(self, currency_pair):
+        self._update(kind='fx', key=currency_pair, data=self.fx, path=self.fx_path(currency_pair))
+
+    def update_statement(self, ticker, statement_type):
+        self.calls.append(('statements', ticker))
+
+    def update_dividends(self, ticker):
+        self.calls.append(('dividends', ticker))
+
+    def stale_dividends(self, tickers, max_age=None):
+        return [ticker for ticker in tickers if ticker not in self.fresh_dividends]
+
+    def set_read_only(self, read_only=True):
+        self.read_only = read_only
+
+    def last_data_point(self, ptf_currency='CAD'):
+        return max(rates.index[-1] for rates in self.fx.values())
+
+    def prices_path(self, ticker):
+        return f"{self.directory}/{ticker}_prices.csv"
+
+    def fx_path(self, currency_pair):
+        return f"{self.directory}/{currency_pair}_fx.csv"
+
+    def save(self):
+        for ticker, prices in self.prices.items():
+            prices.to_csv(self.prices_path(ticker))
+        for pair, rates in self.fx.items():
+            rates.to_csv(self.fx_path(pair))
+
+    def add(self, kind, key, last, fetched):
+        data = pd.DataFrame({'Close': range(3)}, index=pd.date_range(end=last, periods=3, freq='B'))
+        self.catalog.record(kind=kind, key=key, path=f"{key}.csv", data=data, source='Test', content=b'',
+                            fetched=fetched)
+
+    def _update(self, kind, key, data, path):
+        if key in self.fail:
+            raise ValueError('no data')
+        self.calls.append((kind, key))
+        if key in data:
+            self.catalog.record(kind=kind, key=key, path=path, data=data[key], source='Test',
+                                content=data[key].to_csv().encode())
+
+
+@pytest.fixture
+def fake_reader(tmp_path):
+    return FakeReader(directory=tmp_path)
+
+
+@pytest.fixture
+def market_reader(fake_reader):
+    """
+    Random walk prices of AAA.TO (CAD) and BBB (USD) on the market days of the first two months of 2022, saved to
+    disk. The dates are in reader.dates.
+    """
+    # market days, the portfolio dates skip the exchange holidays
+    dates = pd.DatetimeIndex(dates_utils.get_market_days(start=datetime(2022, 1, 3), end=datetime(2022, 3, 1)),
+                             name='Date')
+    rng = np.random.default_rng(0)
+    fake_reader.dates = dates
+    fake_reader.prices = {ticker: pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates)))), index=dates)
+                          for ticker in ['AAA.TO', 'BBB']}
+    fake_reader.fx = {'CADCAD': pd.Series(1., index=dates),
+                      'USDCAD': pd.Series(1.25 + np.cumsum(rng.normal(0, 0.002, len(dates))), index=dates)}
+    fake_reader.save()
+    return fake_reader
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib import attribution
+from pyportlib.services.attribution_cache import AttributionCache
+
+
+class TestAttribution:
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range('2022-01-03', periods=60)
+    weights = pd.DataFrame(rng.dirichlet(np.ones(3), len(dates)), index=dates, columns=['AAA', 'BBB', 'CCC'])
+    returns = pd.DataFrame(rng.normal(0, 0.01, (len(dates), 3)), index=dates, columns=['AAA', 'BBB', 'CCC'])
+    benchmark_weights = pd.Series({'AAA': 0.5, 'BBB': 0.25, 'DDD': 0.25})
+    benchmark_returns = pd.DataFrame(rng.normal(0, 0.01, (len(dates), 3)), index=dates, columns=['AAA', 'BBB', 'DDD'])
+    groups = {'AAA': 'growth', 'BBB': 'value', 'CCC': 'growth', 'DDD': 'value'}
+
+    def test_brinson_sums_to_active_return(self):
+        effects = attribution.brinson(self.weights, self.returns, self.benchmark_weights, self.benchmark_returns,
+                                      self.groups)
+        rp = (self.weights * self.returns).sum(axis=1)
+        rb = attribution.benchmark_return(self.benchmark_weights, self.benchmark_returns, self.dates)
+
+        assert list(effects.columns.get_level_values(0).unique()) == ['Allocation', 'Selection', 'Interaction']
+        assert np.allclose(effects.sum(axis=1), rp - rb)
+
+        linked = attribution.link(effects, rp, rb)
+        assert np.isclose(linked.sum(), np.prod(1 + rp) - np.prod(1 + rb))
+
+    def test_rolling_betas(self):
+        factors = pd.DataFrame(self.rng.normal(0, 0.01, (len(self.dates), 2)), index=self.dates, columns=['M', 'S'])
+        returns = 0.001 + 1.5 * factors['M'] - 0.5 * factors['S']
+        betas = attribution.rolling_betas(returns, factors, window=20)
+
+        assert betas.iloc[:19].isna().all().all()
+        assert np.allclose(betas.iloc[19:], [0.001, 1.5, -0.5])
+
+        contributions = attribution.factor_attribution(returns, factors, window=20)
+        assert contributions.index[0] == self.dates[20]
+        assert np.allclose(contributions.sum(axis=1), returns.loc[contributions.index])
+
+    def test_cache_keyed_by_inputs(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(AttributionCache, '_ACCOUNTS_DIRECTORY', f"{tmp_path}/")
+        result = pd.Series([0.01, -0.02], index=pd.MultiIndex.from_tuples([('Allocation', 'growth'),
+                                                                             ('Total', 'Active')]))
+        cache = AttributionCache(account='acc', name='brinson', params={'freq': 'M'})
+        key = cache.key(end=self.dates[20], inputs=[self.benchmark_returns])
+        cache.put({'2022-01': (key, result)})
+
+        reloaded = AttributionCache(account='acc', name='brinson', params={'freq': 'M'})
+        pd.testing.assert_series_equal(reloaded.get('2022-01', key=key), result)
+        # data after the end of the period does not change its key
+        assert reloaded.key(end=self.dates[20], inputs=[self.benchmark_returns.iloc[:30]]) == key
+
+        assert reloaded.get('2022-01', key=reloaded.key(end=self.dates[20], inputs=[self.benchmark_returns * 2])) is None
+        other_params = AttributionCache(account='acc', name='brinson', params={'freq': 'Q'})
+        assert other_params.get('2022-01', key=other_params.key(end=self.dates[20],
+                                                                 inputs=[self.benchmark_returns])) is None
+
+    def test_closed_periods_stay_cached(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(AttributionCache, '_ACCOUNTS_DIRECTORY', f"{tmp_path}/")
+        dates = pd.bdate_range('2022-02-01', periods=51)
+        ptf = FakePortfolio(dates[:50])
+        computed = []
+
+        def compute(start, end):
+            computed.append(start)
+            days = ptf.market_value.loc[start:end]
+            return {str(period): pd.Series({'Total': float(len(values))})
+                    for period, values in days.groupby(days.index.to_period('M'))}
+
+        def by_period():
+            return attribution._by_period(ptf=ptf, name='test', compute=compute, start_date=None, end_date=None,
+                                          freq='M', cache=True, inputs=[self.benchmark_returns], params={})
+
+        first = by_period()
+        assert list(first.index) == ['2022-02', '2022-03', '2022-04']
+
+        # a new day of prices and a new trade only change the current month
+        ptf.extend(dates)
+        second = by_period()
+        assert computed[-1] == pd.Timestamp('2022-04-01')
+        assert second.loc['2022-04', 'Total'] == first.loc['2022-04', 'Total'] + 1
+        pd.testing.assert_frame_equal(second.loc[['2022-02', '2022-03']], first.loc[['2022-02', '2022-03']])
+
+        # a corrected february price computes february again
+        ptf.positions['AAA'].prices.iloc[5] += 1.
+        by_period()
+        assert computed[-1] == dates[0]
+
+
+class FakePosition:
+    def __init__(self, prices):
+        self.prices = prices
+
+
+class FakePortfolio:
+    account = 'acc'
+
+    def __init__(self, dates):
+        self.start_date = dates[0]
+        self.extend(dates)
+
+    def extend(self, dates):
+        self.market_value = pd.Series(100., index=dates)
+        self.positions = {'AAA': FakePosition(pd.Series(np.linspace(10., 20., 60)[:len(dates)], index=dates))}
+        self.transactions = pd.DataFrame({'Ticker': 'AAA', 'Quantity': 1.}, index=dates[::20])
+        self.cash_changes = pd.DataFrame({'Amount': [100.]}, index=dates[:1])
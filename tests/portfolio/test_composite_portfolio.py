@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.portfolio.composite_portfolio import CompositePortfolio
+from pyportlib.portfolio.portfolio import Portfolio
+
+DATES = pd.bdate_range('2022-01-03', periods=10)
+PRICES = {'AAA': pd.Series(np.linspace(100., 109., 10), index=DATES),
+          'BBB': pd.Series(np.linspace(50., 41., 10), index=DATES)}
+FX = {'CADCAD': pd.Series(1., index=DATES)}
+
+
+class FakeFx:
+    pairs = ['CADCAD']
+    rates = FX
+
+
+class FakeMember:
+    def __init__(self, account, trades):
+        self.account = account
+        self.added = []
+        self.transactions = pd.DataFrame(trades, columns=['Date', 'Ticker', 'Type', 'Quantity', 'Price', 'Fees',
+                                                          'Currency']).set_index('Date')
+        self.start_date = self.transactions.index.min()
+        self.positions = {}
+        for ticker, trx in self.transactions.groupby('Ticker'):
+            pos = create.position(ticker, local_currency='CAD', tag='core', prices=PRICES[ticker])
+            pos.quantities = trx.Quantity.groupby(level=0).sum().reindex(DATES).fillna(0).cumsum()
+            self.positions[ticker] = pos
+        self.market_value = sum((p.quantities.shift(1).fillna(method="backfill") * p.prices).loc[self.start_date:]
+                                for p in self.positions.values())
+        self.cash_history = pd.Series(0., index=DATES)
+
+    def daily_total_pnl(self, start_date=None, end_date=None, positions_to_exclude=None, tags=None):
+        return Portfolio._pnl_pos_apply(positions_dict=self.positions, start_date=start_date, end_date=end_date,
+                                        transactions=self.transactions, fx=FX)
+
+    def position_tags(self):
+        return ['core']
+
+    def add_transaction(self, transactions):
+        self.added.append(transactions)
+
+
+class TestCompositePortfolio:
+    @pytest.fixture(autouse=True)
+    def reader(self):
+        with create._datareader_container.datareader.override(providers.Object(None)):
+            yield
+
+    def members(self):
+        # both accounts buy AAA on the same day
+        first = FakeMember('TFSA', [(DATES[1], 'AAA', 'Buy', 10, 100.5, 1., 'CAD'),
+                                    (DATES[5], 'AAA', 'Dividend', 0, 4., 0., 'CAD')])
+        second = FakeMember('RRSP', [(DATES[1], 'AAA', 'Buy', 5, 101., 1., 'CAD'),
+                                     (DATES[3], 'BBB', 'Buy', 20, 47., 1., 'CAD'),
+                                     (DATES[6], 'AAA', 'Sell', -2, 107., 1., 'CAD')])
+        return [first, second]
+
+    def test_sum_of_members(self):
+        members = self.members()
+        composite = CompositePortfolio(account='Household', currency='CAD', portfolios=members, datareader=None,
+                                       fx=FakeFx())
+
+        market_value = pd.concat([m.market_value for m in members], axis=1).fillna(0).sum(axis=1)
+        assert np.allclose(composite.market_value.reindex(market_value.index), market_value)
+
+        pnl = composite.daily_total_pnl(start_date=DATES[1], end_date=DATES[-1])
+        members_pnl = pd.concat([m.daily_total_pnl(DATES[1], DATES[-1]) for m in members], axis=1).fillna(0)
+        members_pnl = members_pnl.groupby(level=0, axis=1).sum()
+        assert np.allclose(pnl.reindex(index=members_pnl.index, columns=members_pnl.columns).fillna(0), members_pnl)
+
+        without_bbb = composite.compute_market_value(positions_to_exclude=['BBB'])
+        assert np.allclose(without_bbb, composite.market_value - composite.positions['BBB'].quantities.shift(1)
+                           .fillna(0).multiply(PRICES['BBB']).reindex(without_bbb.index).fillna(0))
+
+    def test_route_to_member(self):
+        members = self.members()
+        composite = CompositePortfolio(account='Household', currency='CAD', portfolios=members, datareader=None,
+                                       fx=FakeFx())
+
+        with pytest.raises(ValueError):
+            composite.add_transaction('trx')
+        with pytest.raises(ValueError):
+            composite.add_transaction('trx', account='Margin')
+        composite.add_transaction('trx', account='RRSP')
+        assert members[1].added == ['trx'] and members[0].added == []
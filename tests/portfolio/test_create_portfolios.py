@@ -0,0 +1,29 @@
+import os
+
+from dependency_injector import providers
+
+from pyportlib import create
+
+parent = os.getpid()
+
+
+def fake_portfolio(account, currency, use_snapshot=False, compact=False):
+    if account == 'BAD':
+        raise ValueError('no transactions')
+    # the workers only read the market data, the parent process fetches and writes it
+    assert create.datareader().read_only == (os.getpid() != parent)
+    return account
+
+
+class TestPortfolios:
+    def test_pool(self, monkeypatch, fake_reader):
+        fetched = []
+        monkeypatch.setattr(create, 'portfolio', fake_portfolio)
+        monkeypatch.setattr(create, '_fetch_missing_data', lambda accounts, currency: fetched.extend(accounts))
+
+        with create._datareader_container.datareader.override(providers.Object(fake_reader)):
+            built = create.portfolios(accounts=['AAA', 'BAD', 'CCC'], currency='CAD', processes=2)
+
+        assert fetched == ['AAA', 'BAD', 'CCC']
+        assert built == ['AAA', 'CCC']
+        assert not fake_reader.read_only
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.portfolio import currency
+
+
+class FakePosition:
+    def __init__(self, currency, local_prices, rates, quantities):
+        self.currency = currency
+        self.local_prices = local_prices
+        self.prices = local_prices * rates
+        self.quantities = quantities
+
+
+class FakePortfolio:
+    dates = pd.bdate_range('2022-01-03', periods=3)
+
+    def __init__(self):
+        rates = pd.Series([1.25, 1.30, 1.20], index=self.dates)
+        quantities = pd.Series([10., 10., 10.], index=self.dates)
+        self.positions = {'AAA': FakePosition('USD', pd.Series([100., 110., 110.], index=self.dates), rates,
+                                              quantities),
+                          'BBB': FakePosition('CAD', pd.Series([50., 50., 55.], index=self.dates), 1., quantities)}
+        self.market_value = sum(p.prices * p.quantities for p in self.positions.values())
+        self.cash_history = pd.Series(0., index=self.dates)
+
+    def daily_total_pnl(self, start_date=None, end_date=None):
+        return pd.DataFrame({t: (p.prices.diff() * p.quantities).fillna(0.) for t, p in self.positions.items()})
+
+
+class TestCurrency:
+    def test_returns(self):
+        returns = currency.position_returns(FakePortfolio())
+
+        assert np.allclose(returns['currency']['AAA'], [0., 0.04, -1 / 13])
+        assert np.allclose(returns['currency']['BBB'], 0.)
+        assert np.allclose((1 + returns['local']) * (1 + returns['currency']) - 1, returns['base'])
+
+    def test_pnl_decomposition(self):
+        ptf = FakePortfolio()
+        asset, fx = currency.pnl_decomposition(ptf)
+
+        # 10 shares at 110 USD when the rate goes from 1.30 to 1.20
+        assert np.isclose(fx.loc[ptf.dates[2], 'AAA'], -110.)
+        assert np.isclose(asset.loc[ptf.dates[1], 'AAA'], 10 * 10 * 1.25)
+        assert np.allclose(asset + fx, ptf.daily_total_pnl())
+        assert (fx['BBB'] == 0).all()
+
+    def test_hedged_returns(self):
+        ptf = FakePortfolio()
+        returns = currency.hedged_returns(ptf, pd.DataFrame({'USD': [0., 1.]}, index=['unhedged', 'hedged']))
+        decomposition = currency.portfolio_decomposition(ptf)
+
+        assert np.allclose(returns.loc['unhedged'], decomposition['total'])
+        assert np.allclose(returns.loc['hedged'], decomposition['asset'])
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.data_connections.interfaces.iquote_source import IQuoteSource
+from pyportlib.portfolio.live_valuation import LiveValuation
+
+TODAY = pd.Timestamp(datetime.today().date())
+DATES = pd.date_range(end=TODAY - pd.Timedelta(days=1), periods=5)
+
+
+class FakeQuoteSource(IQuoteSource):
+    def __init__(self):
+        self.quotes = {}
+
+    def get_quotes(self, tickers):
+        return {k: v for k, v in self.quotes.items() if k in tickers}
+
+
+class FakePortfolio:
+    account = 'Test'
+    currency = 'CAD'
+
+    def __init__(self):
+        positions = {'AAA': ('CAD', 10., pd.Series(100., index=DATES)),
+                     'BBB': ('USD', 4., pd.Series(25., index=DATES)),
+                     # bought today, no close yet
+                     'CCC': ('CAD', 3., pd.Series(dtype=float)),
+                     'DDD': ('CAD', 0., pd.Series(10., index=DATES))}
+        self.positions = {}
+        for ticker, (currency, quantity, prices) in positions.items():
+            pos = create.position(ticker, local_currency=currency, prices=prices)
+            pos.quantities = pd.Series(quantity, index=[TODAY])
+            self.positions[ticker] = pos
+        self.transactions = pd.DataFrame([(DATES[0], 'AAA', 'Buy', 10., 90.),
+                                          (DATES[0], 'BBB', 'Buy', 4., 18.),
+                                          (TODAY, 'CCC', 'Buy', 3., 30.)],
+                                         columns=['Date', 'Ticker', 'Type', 'Quantity', 'Price']).set_index('Date')
+
+
+class TestLiveValuation:
+    @pytest.fixture(autouse=True)
+    def reader(self, fake_reader):
+        fake_reader.fx = {'USDCAD': pd.Series(1.25, index=DATES)}
+        self.reader = fake_reader
+        with create._datareader_container.datareader.override(providers.Object(None)):
+            yield
+
+    def test_reset(self):
+        live = LiveValuation(portfolio=FakePortfolio(), quote_source=FakeQuoteSource(), datareader=self.reader)
+
+        assert live.tickers == ['AAA', 'BBB', 'CCC']
+        assert np.allclose(live.prices()[['AAA', 'BBB', 'CCC']], [100., 25., 30.])
+        assert live.market_value == 10 * 100. + 4 * 25. + 3 * 30.
+        assert live.day_pnl == 0.
+
+    def test_position_without_price(self):
+        ptf = FakePortfolio()
+        ptf.transactions = ptf.transactions.iloc[:2]
+        live = LiveValuation(portfolio=ptf, quote_source=FakeQuoteSource(), datareader=self.reader)
+
+        assert live.tickers == ['AAA', 'BBB']
+
+    def test_on_quotes(self):
+        source = FakeQuoteSource()
+        live = LiveValuation(portfolio=FakePortfolio(), quote_source=source, datareader=self.reader)
+        start = live.market_value
+
+        source.quotes = {'AAA': (datetime(2022, 1, 3, 10), 101.), 'BBB': (datetime(2022, 1, 3, 11), 21.),
+                         'ZZZ': (datetime(2022, 1, 3, 12), 1.)}
+        assert live.update() == 2
+        # BBB is quoted in USD
+        day_pnl = 10 * 1. + 4 * (21. * 1.25 - 25.)
+        assert np.isclose(live.day_pnl, day_pnl)
+        assert np.isclose(live.market_value, start + day_pnl)
+        assert live.last_update == datetime(2022, 1, 3, 11)
+
+        assert live.on_quotes({'CCC': (datetime(2022, 1, 3, 12), 29.)}) == 1
+        assert np.isclose(live.day_pnl, day_pnl - 3.)
+        assert np.isclose(live.position_day_pnl()['CCC'], -3.)
+        assert np.isclose(live.pct_day_pnl, live.day_pnl / start)
+        assert list(live.quotes('AAA').values) == [101.]
+        assert live.on_quotes({'ZZZ': (datetime(2022, 1, 3, 12), 1.)}) == 0
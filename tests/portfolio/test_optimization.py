@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib import optimization
+
+
+class TestOptimization:
+    tickers = ['AAA', 'BBB', 'CCC', 'DDD']
+    std = np.array([0.1, 0.2, 0.15, 0.3])
+    corr = np.array([[1., 0.5, 0.2, 0.1],
+                     [0.5, 1., 0.3, 0.2],
+                     [0.2, 0.3, 1., 0.6],
+                     [0.1, 0.2, 0.6, 1.]])
+    cov = pd.DataFrame(corr * np.outer(std, std), index=tickers, columns=tickers)
+
+    def test_min_variance(self):
+        weights = optimization.min_variance(self.cov)
+        unconstrained = optimization.min_variance(self.cov, long_only=False)
+
+        assert np.isclose(weights.sum(), 1.)
+        assert (weights >= 0).all()
+        if (unconstrained >= 0).all():
+            assert np.allclose(weights, unconstrained, atol=1e-6)
+
+    def test_max_sharpe(self):
+        expected_returns = pd.Series([0.05, 0.08, 0.06, -0.01], index=self.tickers)
+        weights = optimization.max_sharpe(self.cov, expected_returns)
+
+        def sharpe(w):
+            return w @ expected_returns / np.sqrt(w @ self.cov.values @ w)
+
+        assert np.isclose(weights.sum(), 1.)
+        assert (weights >= 0).all()
+        assert sharpe(weights) >= sharpe(optimization.min_variance(self.cov)) - 1e-9
+        assert sharpe(weights) >= sharpe(pd.Series(0.25, index=self.tickers)) - 1e-9
+
+    def test_risk_parity(self):
+        weights = optimization.risk_parity(self.cov)
+        contributions = optimization.risk_contributions(weights, self.cov)
+
+        assert np.isclose(weights.sum(), 1.)
+        assert np.allclose(contributions, 0.25)
+
+    def test_hierarchical_risk_parity(self):
+        weights = optimization.hierarchical_risk_parity(self.cov)
+
+        assert np.isclose(weights.sum(), 1.)
+        assert (weights > 0).all()
+        assert weights['AAA'] > weights['DDD']
+
+    def test_shrunk_covariance(self):
+        returns = pd.DataFrame(np.random.default_rng(0).normal(0, 0.01, (250, 4)), columns=self.tickers)
+        sample = returns.cov(ddof=0)
+
+        assert np.allclose(optimization.shrunk_covariance(returns, shrinkage=0.), sample)
+        shrunk = optimization.shrunk_covariance(returns)
+        assert np.abs(shrunk.values[~np.eye(4, dtype=bool)]).max() <= np.abs(sample.values[~np.eye(4, dtype=bool)]).max()
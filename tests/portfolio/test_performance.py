@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.portfolio import performance
+
+
+class TestPerformance:
+    dates = pd.bdate_range('2022-01-03', periods=4)
+
+    def test_time_weighted_returns(self):
+        # 10% gain, a deposit doubling the account, then 10% gain
+        values = pd.DataFrame({'ptf': [100., 110., 220., 242.]}, index=self.dates)
+        flows = pd.DataFrame({'ptf': [100., 0., 110., 0.]}, index=self.dates)
+        returns = performance.time_weighted_returns(values, flows)['ptf']
+
+        assert np.allclose(returns, [0., 0.1, 0., 0.1])
+        assert np.isclose((1 + returns).prod() - 1, 0.21)
+
+    def test_withdrawal_at_close(self):
+        values = pd.DataFrame({'ptf': [100., 0.]}, index=self.dates[:2])
+        flows = pd.DataFrame({'ptf': [100., -105.]}, index=self.dates[:2])
+        returns = performance.time_weighted_returns(values, flows)['ptf']
+
+        assert np.isclose(returns.iloc[-1], 0.05)
+
+    def test_xirr(self):
+        dates = pd.DatetimeIndex(['2021-01-01', '2021-07-02', '2022-01-01'])
+        cash_flows = pd.DataFrame({'one year': [-100., 0., 110.],
+                                   'two flows': [-100., -100., 215.],
+                                   'large loss': [-100., 0., 1.],
+                                   'no investment': [0., 0., 10.]}, index=dates)
+        rates = performance.xirr(cash_flows)
+
+        assert np.isclose(rates['one year'], 0.1)
+        npv = (cash_flows['two flows'] * (1 + rates['two flows']) ** -((dates - dates[0]).days / 365.)).sum()
+        assert np.isclose(npv, 0.)
+        assert np.isclose(rates['large loss'], -0.99)
+        assert np.isnan(rates['no investment'])
+
+    def test_tag_flows(self, fake_reader):
+        fake_reader.fx = {'USDCAD': pd.Series(1.25, index=self.dates)}
+
+        class Position:
+            def __init__(self, tag):
+                self.tag = tag
+
+        class Ptf:
+            currency = 'CAD'
+            datareader = fake_reader
+            market_value = pd.Series(0., index=self.dates)
+            positions = {'AAA.TO': Position('core'), 'BBB': Position('growth')}
+            transactions = pd.DataFrame([('AAA.TO', 'Buy', 10, 10., 1., 'CAD'),
+                                         ('BBB', 'Buy', 2, 100., 0., 'USD'),
+                                         ('BBB', 'Dividend', 0, 4., 0., 'USD')],
+                                        columns=['Ticker', 'Type', 'Quantity', 'Price', 'Fees', 'Currency'],
+                                        index=self.dates[[0, 1, 3]])
+
+        flows = performance.tag_flows(Ptf())
+        assert list(flows['core']) == [101., 0., 0., 0.]
+        assert list(flows['growth']) == [0., 250., 0., -5.]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create, rebalancing
+
+DATES = pd.bdate_range('2022-01-03', periods=5)
+
+
+class FakePortfolio:
+    account = 'Test'
+    currency = 'CAD'
+
+    def __init__(self, datareader):
+        self.datareader = datareader
+        aaa = create.position('AAA', local_currency='CAD', tag='growth', prices=pd.Series(10., index=DATES))
+        bbb = create.position('BBB', local_currency='USD', tag='value', prices=pd.Series(25., index=DATES),
+                              local_prices=pd.Series(20., index=DATES))
+        aaa.quantities = pd.Series(100., index=DATES)
+        bbb.quantities = pd.Series(40., index=DATES)
+        self.positions = {'AAA': aaa, 'BBB': bbb}
+        self.market_value = pd.Series(2000., index=DATES)
+
+    def cash(self, date=None):
+        return 1000.
+
+
+def trades(transactions):
+    return [(t.type, t.ticker, t.quantity) for t in transactions]
+
+
+class TestRebalance:
+    @pytest.fixture(autouse=True)
+    def reader(self, fake_reader):
+        fake_reader.prices = {'CCC.TO': pd.Series(5., index=DATES)}
+        fake_reader.fx = {'USDCAD': pd.Series(1.25, index=DATES)}
+        self.reader = fake_reader
+        with create._datareader_container.datareader.override(providers.Object(None)):
+            yield
+
+    def test_holdings(self):
+        quantities, values = rebalancing.holdings(positions=FakePortfolio(self.reader).positions, date=DATES[-1])
+        assert quantities.to_dict() == {'AAA': 100., 'BBB': 40.}
+        assert values.to_dict() == {'AAA': 1000., 'BBB': 1000.}
+
+    def test_lot_size(self):
+        ptf = FakePortfolio(self.reader)
+        # 1500 CAD in each position: 50 AAA and 20 BBB to buy
+        assert trades(rebalancing.rebalance(ptf, {'AAA': .5, 'BBB': .5})) == [('Buy', 'AAA', 50.), ('Buy', 'BBB', 20.)]
+        assert trades(rebalancing.rebalance(ptf, {'AAA': .5, 'BBB': .5}, lot_size=30)) == [('Buy', 'AAA', 30.)]
+        assert trades(rebalancing.rebalance(ptf, {'AAA': .5, 'BBB': .5}, lot_size={'BBB': 15})) == \
+            [('Buy', 'AAA', 50.), ('Buy', 'BBB', 15.)]
+
+    def test_cash_scaling(self):
+        ptf = FakePortfolio(self.reader)
+        transactions = rebalancing.rebalance(ptf, {'CCC.TO': 1.}, fee_per_trade=5.)
+
+        # the new ticker is priced with the reader of the portfolio, the buy is scaled down to pay the fees
+        assert trades(transactions) == [('Sell', 'AAA', -100.), ('Sell', 'BBB', -40.), ('Buy', 'CCC.TO', 596.)]
+        assert [t.currency for t in transactions] == ['CAD', 'USD', 'CAD']
+        assert transactions[1].price == 20.
+        spent = sum((t.quantity * t.price + t.fees) * (1.25 if t.currency == 'USD' else 1.) for t in transactions)
+        assert spent <= ptf.cash()
+
+    def test_max_turnover(self):
+        ptf = FakePortfolio(self.reader)
+        transactions = rebalancing.rebalance(ptf, {'AAA': .5, 'BBB': .5}, max_turnover=.1)
+
+        assert trades(transactions) == [('Buy', 'AAA', 15.), ('Buy', 'BBB', 6.)]
+        traded = transactions[0].quantity * 10. + transactions[1].quantity * 25.
+        assert traded <= .1 * 3000.
+
+    def test_by_tag(self):
+        ptf = FakePortfolio(self.reader)
+        transactions = rebalancing.rebalance(ptf, {'growth': 1.}, by_tag=True, include_cash=False)
+        assert trades(transactions) == [('Sell', 'BBB', -40.), ('Buy', 'AAA', 100.)]
+
+        weights = rebalancing._tag_to_position_weights(ptf, pd.Series({'growth': .6, 'value': .4}), date=DATES[-1])
+        assert np.allclose(weights[['AAA', 'BBB']], [.6, .4])
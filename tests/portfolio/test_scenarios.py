@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.portfolio import scenarios
+from pyportlib.portfolio.portfolio import Portfolio
+from pyportlib.services.cash_manager import CashManager
+from pyportlib.services.fx_rates import FxRates
+from pyportlib.services.position_tagging import PositionTagging
+from pyportlib.services.transaction_manager import TransactionManager
+
+
+class TestScenarios:
+    dates = pd.bdate_range('2022-01-03', periods=3)
+    pnl = pd.DataFrame({'AAA': [1., 2., 3.], 'BBB': [10., 20., 30.]}, index=dates)
+    market_values = pd.DataFrame({'AAA': [100., 100., 100.], 'BBB': [100., 100., 100.]}, index=dates)
+
+    def test_leave_one_out(self):
+        masks = scenarios.leave_one_out(['AAA', 'BBB'])
+        returns = scenarios.scenario_returns(self.pnl, self.market_values, masks)
+
+        assert list(returns.loc['AAA']) == [0.1, 0.2, 0.3]
+        assert list(returns.loc['BBB']) == [0.01, 0.02, 0.03]
+
+    def test_exclusions_and_weights(self):
+        masks = pd.concat([scenarios.exclusion_masks(['AAA', 'BBB'], {'all': []}),
+                           pd.DataFrame({'AAA': [2.]}, index=['double AAA only'])])
+        pnl = scenarios.scenario_pnl(self.pnl, masks)
+
+        assert list(pnl.loc['all']) == [11., 22., 33.]
+        assert list(pnl.loc['double AAA only']) == [2., 4., 6.]
+
+    def test_tag_masks(self):
+        masks = scenarios.tag_masks({'AAA': 'growth', 'BBB': 'value'}, {'growth': ['growth']})
+
+        assert list(masks.loc['growth']) == [1., 0.]
+
+
+class TestPortfolioScenarios:
+    @pytest.fixture(autouse=True)
+    def portfolio(self, tmp_path, monkeypatch, market_reader):
+        for cls, attribute in [(TransactionManager, '_ACCOUNTS_DIRECTORY'), (CashManager, 'ACCOUNTS_DIRECTORY'),
+                               (PositionTagging, '_ACCOUNTS_DIRECTORY')]:
+            monkeypatch.setattr(cls, attribute, f"{tmp_path}/")
+        (tmp_path / 'Test').mkdir()
+        self.dates = dates = market_reader.dates
+        pd.DataFrame([(dates[2], 'AAA.TO', 'Buy', 10, 100., 1., 'CAD'),
+                      (dates[5], 'BBB', 'Buy', 5, 100., 1., 'USD'),
+                      (dates[20], 'AAA.TO', 'Sell', -4, 105., 1., 'CAD'),
+                      (dates[25], 'BBB', 'Sell', -5, 103., 1., 'USD')],
+                     columns=['Date', 'Ticker', 'Type', 'Quantity', 'Price', 'Fees', 'Currency']
+                     ).to_csv(tmp_path / 'Test' / 'transactions.csv', index=False)
+        pd.DataFrame([(dates[0], 'Deposit', 5000.)], columns=['Date', 'Direction', 'Amount']
+                     ).to_csv(tmp_path / 'Test' / 'cash.csv', index=False)
+
+        with create._datareader_container.datareader.override(providers.Object(market_reader)):
+            self.ptf = Portfolio(account='Test', currency='CAD', datareader=market_reader,
+                                 transaction_manager=TransactionManager('Test'), cash_manager=CashManager('Test'),
+                                 fx=FxRates(ptf_currency='CAD', currencies=set(), datareader=market_reader))
+            yield
+
+    def test_same_as_exclusion(self):
+        masks = scenarios.exclusion_masks(list(self.ptf.positions), {'without BBB': ['BBB'], 'all': []})
+        for include_cash in [False, True]:
+            returns = self.ptf.scenario_returns(masks, start_date=self.dates[3], end_date=self.dates[-1],
+                                                include_cash=include_cash)
+            expected = self.ptf.pct_daily_total_pnl(start_date=self.dates[3], end_date=self.dates[-1],
+                                                    include_cash=include_cash, positions_to_exclude=['BBB'])
+
+            assert list(returns.columns) == list(expected.index)
+            assert np.allclose(returns.loc['without BBB'], expected)
+            assert np.allclose(returns.loc['all'],
+                               self.ptf.pct_daily_total_pnl(start_date=self.dates[3], end_date=self.dates[-1],
+                                                            include_cash=include_cash))
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.portfolio.portfolio import Portfolio
+from pyportlib.services.cash_manager import CashManager
+from pyportlib.services.fx_rates import FxRates
+from pyportlib.services.portfolio_snapshot import PortfolioSnapshot
+from pyportlib.services.position_tagging import PositionTagging
+from pyportlib.services.transaction_manager import TransactionManager
+
+
+class TestPortfolioSnapshot:
+    @pytest.fixture(autouse=True)
+    def accounts(self, tmp_path, monkeypatch, market_reader):
+        for cls, attribute in [(TransactionManager, '_ACCOUNTS_DIRECTORY'), (CashManager, 'ACCOUNTS_DIRECTORY'),
+                               (PositionTagging, '_ACCOUNTS_DIRECTORY'), (PortfolioSnapshot, '_ACCOUNTS_DIRECTORY')]:
+            monkeypatch.setattr(cls, attribute, f"{tmp_path}/")
+        (tmp_path / 'Test').mkdir()
+        self.reader = market_reader
+        self.dates = dates = market_reader.dates
+        pd.DataFrame([(dates[2], 'AAA.TO', 'Buy', 10, 100., 1., 'CAD'),
+                      (dates[5], 'BBB', 'Buy', 5, 100., 1., 'USD'),
+                      (dates[20], 'AAA.TO', 'Sell', -4, 105., 1., 'CAD')],
+                     columns=['Date', 'Ticker', 'Type', 'Quantity', 'Price', 'Fees', 'Currency']
+                     ).to_csv(tmp_path / 'Test' / 'transactions.csv', index=False)
+        pd.DataFrame([(dates[0], 'Deposit', 5000.)], columns=['Date', 'Direction', 'Amount']
+                     ).to_csv(tmp_path / 'Test' / 'cash.csv', index=False)
+
+        with create._datareader_container.datareader.override(providers.Object(self.reader)):
+            yield
+
+    def portfolio(self, use_snapshot=True, compact=False):
+        return Portfolio(account='Test', currency='CAD', datareader=self.reader,
+                         transaction_manager=TransactionManager('Test', compact=compact),
+                         cash_manager=CashManager('Test'),
+                         fx=FxRates(ptf_currency='CAD', currencies=set(), datareader=self.reader),
+                         snapshot=PortfolioSnapshot(account='Test', datareader=self.reader) if use_snapshot else None,
+                         compact=compact)
+
+    def assert_same(self, ptf, cold):
+        pd.testing.assert_series_equal(ptf.market_value, cold.market_value, check_freq=False)
+        pd.testing.assert_series_equal(ptf.cash_history, cold.cash_history, check_freq=False)
+        pnl = ptf.daily_total_pnl(start_date=self.dates[1], end_date=self.dates[-1])
+        cold_pnl = cold.daily_total_pnl(start_date=self.dates[1], end_date=self.dates[-1])
+        # only the name of the date index can differ, the quantities of a cold build have an unnamed index
+        pd.testing.assert_frame_equal(pnl.sort_index(axis=1), cold_pnl.sort_index(axis=1), check_freq=False,
+                                      check_names=False)
+
+    def test_round_trip(self):
+        saved = self.portfolio()
+        self.reader.price_reads = []
+        loaded = self.portfolio()
+
+        assert self.reader.price_reads == []
+        self.assert_same(loaded, self.portfolio(use_snapshot=False))
+        self.assert_same(loaded, saved)
+
+    def test_compact(self):
+        self.portfolio()
+        self.reader.price_reads = []
+        loaded = self.portfolio(compact=True)
+
+        assert self.reader.price_reads == []
+        assert all(pos.prices.dtype == np.float32 for pos in loaded.positions.values())
+        assert loaded.positions['BBB'].local_prices.dtype == np.float32
+        cold = self.portfolio(use_snapshot=False, compact=True)
+        assert all(pos.prices.dtype == np.float32 for pos in cold.positions.values())
+        assert np.allclose(loaded.market_value, cold.market_value)
+
+    def test_refresh_on_changes(self):
+        ptf = self.portfolio()
+        ptf.add_transaction(create.transaction(date=self.dates[25].to_pydatetime(), ticker='AAA.TO', transaction_type='Buy',
+                                               quantity=2, price=101., fees=1., currency='CAD'))
+        ptf.add_cash_change(create.cash_change(date=self.dates[30].to_pydatetime(), direction='Deposit', amount=1000.))
+
+        self.reader.price_reads = []
+        loaded = self.portfolio()
+        assert self.reader.price_reads == []
+        assert loaded.positions['AAA.TO'].quantities.iloc[-1] == 8
+        self.assert_same(loaded, self.portfolio(use_snapshot=False))
+        assert loaded.cash(self.dates[-1]) == ptf.cash(self.dates[-1])
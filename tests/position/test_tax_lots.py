@@ -0,0 +1,74 @@
+import pandas as pd
+
+from pyportlib.services.tax_lots import TaxLots
+
+
+class TestTaxLots:
+    transactions = pd.DataFrame([['Buy', 10, 100., 1.],
+                                 ['Buy', 10, 120., 1.],
+                                 ['Sell', -15, 130., 1.]],
+                                columns=['Type', 'Quantity', 'Price', 'Fees'],
+                                index=pd.to_datetime(['2022-01-03', '2022-01-04', '2022-01-05']))
+
+    def test_methods(self):
+        gains = {}
+        for method in TaxLots.METHODS:
+            lots = TaxLots('AAA', method=method)
+            lots.update(self.transactions, specific_lots={pd.Timestamp('2022-01-05'): [1]})
+            gains[method] = lots.realized.Gain.sum()
+            assert lots.quantity == 5
+
+        # proceeds of 1949 less the cost of the lots relieved, fees included
+        assert round(gains['fifo'], 6) == 1949 - 1001 - 600.5
+        assert round(gains['lifo'], 6) == 1949 - 1201 - 500.5
+        assert round(gains['average'], 6) == 1949 - 2202 * 0.75
+        assert round(gains['specific'], 6) == round(gains['lifo'], 6)
+
+    def test_incremental_update(self):
+        lots = TaxLots('AAA', capacity=1)
+        lots.update(self.transactions.iloc[:2])
+        assert lots.cost_basis == 2202
+
+        lots.update(self.transactions)
+        assert len(lots.realized) == 2
+        assert list(lots.open_lots.index) == [1]
+
+        changed = self.transactions.copy()
+        changed.iloc[0, 2] = 90.
+        lots.update(changed)
+        assert round(lots.realized.Gain.sum(), 6) == 1949 - 901 - 600.5
+
+    def test_daily(self):
+        lots = TaxLots('AAA')
+        lots.update(self.transactions)
+        prices = pd.Series([100., 110., 125., 130.], index=pd.bdate_range('2022-01-03', periods=4))
+        daily = lots.daily(prices)
+
+        assert list(daily['Quantity']) == [10, 20, 5, 5]
+        assert list(daily['Realized']) == [0, 0, 347.5, 0]
+        assert daily.loc['2022-01-06', 'Unrealized'] == 650 - 600.5
+
+    def test_specific_lots_change(self):
+        lots = TaxLots('AAA', method='specific')
+        lots.update(self.transactions, specific_lots={(pd.Timestamp('2022-01-05'), 0): [0]})
+        assert round(lots.realized.Gain.sum(), 6) == 1949 - 1001 - 600.5
+
+        # other lots for the same sell build the lots again, as a new object would
+        lots.update(self.transactions, specific_lots={(pd.Timestamp('2022-01-05'), 0): [1]})
+        fresh = TaxLots('AAA', method='specific')
+        fresh.update(self.transactions, specific_lots={(pd.Timestamp('2022-01-05'), 0): [1]})
+        assert round(lots.realized.Gain.sum(), 6) == round(fresh.realized.Gain.sum(), 6) == 1949 - 1201 - 500.5
+
+    def test_specific_lots_same_day(self):
+        transactions = pd.DataFrame([['Buy', 10, 100., 0.],
+                                     ['Buy', 10, 120., 0.],
+                                     ['Sell', -5, 130., 0.],
+                                     ['Sell', -5, 130., 0.]],
+                                    columns=['Type', 'Quantity', 'Price', 'Fees'],
+                                    index=pd.to_datetime(['2022-01-03', '2022-01-04', '2022-01-05', '2022-01-05']))
+        lots = TaxLots('AAA', method='specific')
+        lots.update(transactions, specific_lots={(pd.Timestamp('2022-01-05'), 0): [1],
+                                                 (pd.Timestamp('2022-01-05'), 1): [0]})
+
+        assert list(lots.realized.Lot) == [1, 0]
+        assert list(lots.open_lots.Quantity) == [5, 5]
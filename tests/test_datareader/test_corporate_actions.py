@@ -0,0 +1,79 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from pyportlib.services.corporate_actions import CorporateActions, split_factors
+
+
+class FakeSource:
+    file_prefix = 'Fake'
+
+    def __init__(self, directory):
+        self.data_dir = f"{directory}/"
+        self.statement_dir = f"{directory}"
+        self.calls = []
+
+    def get_splits(self, ticker):
+        self.calls.append(('splits', ticker))
+        return pd.Series([2.], index=pd.to_datetime(['2022-03-01']))
+
+    def get_dividends(self, ticker, start_date=None, end_date=None):
+        self.calls.append(('dividends', ticker))
+        pd.DataFrame({'date': ['2022-03-15'], 'dividend': [0.5]}).to_csv(
+            f"{self.statement_dir}/{self.file_prefix}_{ticker}_dividends.csv", index=False)
+
+
+class TestCorporateActions:
+    def test_split_factors(self):
+        splits = pd.Series([2., 3.], index=pd.to_datetime(['2022-03-01', '2022-01-03']))
+        dates = pd.to_datetime(['2021-12-31', '2022-01-03', '2022-02-01', '2022-03-01', '2022-04-01'])
+
+        assert np.allclose(split_factors(splits=splits, dates=dates), [6., 6., 2., 2., 1.])
+        assert np.allclose(split_factors(splits=None, dates=dates), np.ones(5))
+        assert np.allclose(split_factors(splits=pd.Series(dtype=float), dates=dates), np.ones(5))
+
+    def test_fetched_ttl(self, tmp_path):
+        source = FakeSource(tmp_path)
+        actions = CorporateActions(market_data_source=source)
+
+        assert actions.splits('AAA').iloc[0] == 2.
+        assert actions.dividends('AAA').iloc[0] == 0.5
+        assert actions.stale(tickers=['AAA', 'BBB'], action='dividends') == ['BBB']
+
+        # a new store reads the fetch times from the manifest and only fetches again after the time to live
+        reloaded = CorporateActions(market_data_source=source)
+        reloaded.splits('AAA')
+        assert source.calls == [('splits', 'AAA'), ('dividends', 'AAA')]
+        assert reloaded.stale(tickers=['AAA'], action='splits', max_age=timedelta(0)) == ['AAA']
+
+        reloaded._manifest['AAA']['splits'] = (datetime.now() - timedelta(days=8)).isoformat()
+        reloaded.splits('AAA')
+        assert source.calls[-1] == ('splits', 'AAA')
+        assert len(source.calls) == 3
+
+    def test_manifest_from_threads(self, tmp_path):
+        source = FakeSource(tmp_path)
+        actions = CorporateActions(market_data_source=source)
+        tickers = [f"T{i}" for i in range(50)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda t: actions.update_splits(ticker=t), tickers))
+
+        with open(f"{tmp_path}/corporate_actions.json") as f:
+            manifest = json.load(f)
+        assert sorted(manifest) == sorted(tickers)
+
+    def test_shared_manifest(self, tmp_path):
+        # two stores on the same manifest, as in two processes
+        source = FakeSource(tmp_path)
+        first = CorporateActions(market_data_source=source)
+        second = CorporateActions(market_data_source=source)
+        first.update_splits(ticker='AAA')
+        second.update_dividends(ticker='BBB')
+
+        reloaded = CorporateActions(market_data_source=source)
+        assert reloaded.stale(tickers=['AAA'], action='splits') == []
+        assert reloaded.stale(tickers=['BBB'], action='dividends') == []
+        assert second.stale(tickers=['AAA'], action='splits') == []
@@ -0,0 +1,118 @@
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from pyportlib.services.data_catalog import DataCatalog
+from pyportlib.services.data_reader import DataReader
+
+
+def _prices(last: str) -> pd.DataFrame:
+    index = pd.date_range(end=last, periods=5, freq='B', name='Date')
+    return pd.DataFrame({'Close': range(5)}, index=index)
+
+
+class TestDataCatalog:
+    def test_record(self, tmp_path):
+        catalog = DataCatalog(directory=f"{tmp_path}/")
+        catalog.record(kind='prices', key='AAPL', path='AAPL.csv', data=_prices('2022-06-10'), source='Yahoo',
+                       content=b'abc')
+
+        entry = catalog.entry(kind='prices', key='AAPL')
+        assert entry['rows'] == 5
+        assert catalog.last_date(kind='prices', key='AAPL') == pd.Timestamp('2022-06-10')
+        assert not catalog.exists(kind='fx', key='AAPL')
+
+        reloaded = DataCatalog(directory=f"{tmp_path}/")
+        assert reloaded.entry(kind='prices', key='AAPL') == entry
+        reloaded.remove(kind='prices', key='AAPL')
+        assert DataCatalog(directory=f"{tmp_path}/").entries().empty
+
+    def test_stale(self, tmp_path):
+        catalog = DataCatalog(directory=f"{tmp_path}/")
+        catalog.record(kind='prices', key='OLD', path='OLD.csv', data=_prices('2022-06-03'), source='Yahoo',
+                       content=b'old', fetched=datetime.now() - timedelta(days=3))
+        catalog.record(kind='prices', key='NEW', path='NEW.csv', data=_prices('2022-06-10'), source='Yahoo',
+                       content=b'new')
+
+        keys = ['OLD', 'NEW', 'MISSING']
+        assert catalog.stale(kind='prices', keys=keys) == ['MISSING']
+        assert catalog.stale(kind='prices', keys=keys, last_date=datetime(2022, 6, 10)) == ['OLD', 'MISSING']
+        assert catalog.stale(kind='prices', keys=keys, max_age=timedelta(days=1)) == ['OLD', 'MISSING']
+
+    def test_shared_manifest(self, tmp_path):
+        # two catalogs on the same manifest, as in two processes
+        first = DataCatalog(directory=f"{tmp_path}/")
+        second = DataCatalog(directory=f"{tmp_path}/")
+        first.record(kind='prices', key='AAA', path='AAA.csv', data=_prices('2022-06-10'), source='Yahoo',
+                     content=b'new', fetched=datetime(2022, 6, 10, 20))
+        second.record(kind='prices', key='BBB', path='BBB.csv', data=_prices('2022-06-10'), source='Yahoo',
+                      content=b'bbb')
+        # an older fetch of the same file does not replace the newer one
+        second.record(kind='prices', key='AAA', path='AAA.csv', data=_prices('2022-06-03'), source='Yahoo',
+                      content=b'old', fetched=datetime(2022, 6, 3, 20))
+
+        reloaded = DataCatalog(directory=f"{tmp_path}/")
+        assert list(reloaded.entries().index.get_level_values('Key')) == ['AAA', 'BBB']
+        assert reloaded.last_date(kind='prices', key='AAA') == pd.Timestamp('2022-06-10')
+        assert second.last_date(kind='prices', key='AAA') == pd.Timestamp('2022-06-10')
+
+
+class FakeSource:
+    name = 'Fake'
+    file_prefix = 'fake'
+
+    def __init__(self, directory):
+        self.data_dir = f"{directory}/"
+        self.prices_dir = self.fx_dir = self.statement_dir = f"{directory}"
+
+    def get_prices(self, ticker):
+        raise AssertionError('a read only reader never fetches')
+
+
+class TestDataReader:
+    def test_read_only(self, tmp_path):
+        reader = DataReader(market_data_source=FakeSource(tmp_path), statements_data_source=FakeSource(tmp_path))
+        _prices('2022-06-10').to_csv(reader.prices_path(ticker='AAA'))
+        reader.set_read_only()
+
+        reader.update_prices(ticker='AAA')
+        assert reader.read_prices(ticker='AAA').iloc[-1] == 4
+        assert not reader.catalog.exists(kind='prices', key='AAA')
+        with pytest.raises(FileNotFoundError):
+            reader.read_prices(ticker='BBB')
+        assert not os.path.isfile(reader.catalog.path)
+
+    def test_cache_follows_catalog(self, tmp_path):
+        source = FakeSource(tmp_path)
+        reader = DataReader(market_data_source=source, statements_data_source=FakeSource(tmp_path))
+        path = reader.prices_path(ticker='AAA')
+        _prices('2022-06-10').to_csv(path)
+        assert reader.read_prices(ticker='AAA').iloc[-1] == 4
+
+        source.get_prices = lambda ticker: (_prices('2022-06-13') * 2).to_csv(path)
+        reader.update_prices(ticker='AAA')
+        prices = reader.read_prices(ticker='AAA')
+        assert prices.iloc[-1] == 8
+        assert prices.index[-1] == pd.Timestamp('2022-06-13')
+
+        # a new catalog entry of the file, ex. from a refresh of another reader, reads it again
+        (_prices('2022-06-14') * 3).to_csv(path)
+        with open(path, 'rb') as f:
+            reader.catalog.record(kind='prices', key='AAA', path=path, data=_prices('2022-06-14'), source='Fake',
+                                  content=f.read())
+        assert reader.read_prices(ticker='AAA').iloc[-1] == 12
+
+    def test_batch(self, tmp_path):
+        catalog = DataCatalog(directory=f"{tmp_path}/")
+        with catalog.batch():
+            catalog.record(kind='prices', key='AAA', path='AAA.csv', data=_prices('2022-06-10'), source='Yahoo',
+                           content=b'aaa')
+            catalog.record(kind='fx', key='USDCAD', path='USDCAD.csv', data=_prices('2022-06-10'), source='Yahoo',
+                           content=b'fx')
+            # the changes are kept in memory until the end of the batch
+            assert catalog.exists(kind='prices', key='AAA')
+            assert not os.path.isfile(catalog.path)
+
+        assert len(DataCatalog(directory=f"{tmp_path}/").entries()) == 2
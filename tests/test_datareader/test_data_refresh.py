@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.reporting import html_reports
+from pyportlib.services import data_refresh
+from pyportlib.services.refresh_planner import RefreshPlanner
+
+
+class TestDataRefresh:
+    def test_download(self, fake_reader):
+        fake_reader.fail = {'BAD'}
+        errors = data_refresh.download(datareader=fake_reader, tickers=['AAA', 'BBB', 'AAA', 'BAD'],
+                                       pairs=['USDCAD', 'USDCAD'], workers=3)
+
+        assert sorted(fake_reader.calls) == [('fx', 'USDCAD'), ('prices', 'AAA'), ('prices', 'BBB')]
+        assert list(errors) == ['BAD']
+
+
+class FakePortfolio:
+    def __init__(self, account, tickers):
+        self.account = account
+        self.currency = 'CAD'
+        self.start_date = pd.Timestamp('2022-01-03')
+        self.positions = {ticker: FakePosition() for ticker in tickers}
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+
+    def pct_daily_total_pnl(self, start_date=None):
+        return pd.Series(0.01, index=pd.bdate_range(start_date, periods=5))
+
+
+class FakePosition:
+    currency = 'USD'
+    quantities = pd.Series([10.], index=[pd.Timestamp('2022-01-03')])
+
+
+class TestBatch:
+    def test_shared_refresh(self, tmp_path, monkeypatch, fake_reader):
+        refreshes = []
+        monkeypatch.setattr(RefreshPlanner, 'refresh', lambda self, tickers, pairs, **kwargs:
+                            refreshes.append((sorted(tickers), sorted(pairs))) or {})
+        monkeypatch.setattr(html_reports, 'ProcessPoolExecutor', ThreadPoolExecutor)
+        monkeypatch.setattr(html_reports, '_render', lambda path, **kwargs: path)
+        monkeypatch.setattr(html_reports, 'OUT_DIR', f"{tmp_path}/")
+        ptfs = [FakePortfolio('tfsa', ['AAA', 'BBB']), FakePortfolio('margin', ['BBB', 'CCC'])]
+
+        with create._datareader_container.datareader.override(providers.Object(fake_reader)):
+            paths = html_reports.batch(ptfs=ptfs, benchmark=pd.Series(0.005, index=pd.bdate_range('2022-01-03',
+                                                                                                    periods=5)),
+                                       names=['first', 'second'], workers=2)
+
+        assert refreshes == [(['AAA', 'BBB', 'CCC'], ['CADCAD', 'USDCAD'])]
+        assert [ptf.reloads for ptf in ptfs] == [1, 1]
+        assert paths == {'first': f"{tmp_path}/first.html", 'second': f"{tmp_path}/second.html"}
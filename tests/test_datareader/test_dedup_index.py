@@ -0,0 +1,84 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from pyportlib import create
+from pyportlib.services.dedup_index import DedupIndex
+
+FILL = (datetime(2022, 1, 3), 'AAA', 'Buy', 10, 100., 1., 'CAD')
+OTHER = (datetime(2022, 1, 4), 'BBB', 'Buy', 5, 50., 1., 'CAD')
+
+
+def transaction(row):
+    return create.transaction(date=row[0], ticker=row[1], transaction_type=row[2], quantity=row[3], price=row[4],
+                              fees=row[5], currency=row[6])
+
+
+class TestDedupIndex:
+    @pytest.fixture(autouse=True)
+    def account(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(DedupIndex, '_ACCOUNTS_DIRECTORY', f"{tmp_path}/")
+        (tmp_path / 'Test').mkdir()
+        self.directory = tmp_path / 'Test'
+        self.cash_changes = pd.DataFrame([(datetime(2022, 1, 3), 'Deposit', 1000.)],
+                                         columns=['Date', 'Direction', 'Amount']).set_index('Date')
+        self.cash_changes.to_csv(self.directory / 'cash.csv')
+
+    def write(self, rows):
+        transactions = pd.DataFrame(rows, columns=['Date', 'Ticker', 'Type', 'Quantity', 'Price', 'Fees',
+                                                   'Currency']).set_index('Date')
+        transactions.to_csv(self.directory / 'transactions.csv')
+        return transactions
+
+    def index(self, rows):
+        index = DedupIndex(account='Test')
+        index.sync(transactions=self.write(rows), cash_changes=self.cash_changes)
+        return index
+
+    def test_repeated_fills(self):
+        index = self.index([FILL])
+        fills = [transaction(FILL), transaction(FILL), transaction(OTHER)]
+
+        # the account holds one of the two identical fills
+        new = index.new_transactions(fills)
+        assert new == fills[1:]
+
+        self.write([FILL, FILL, OTHER])
+        index.record(transactions=new, cash_changes=[])
+        assert index.new_transactions(fills) == []
+        third = transaction(FILL)
+        assert index.new_transactions(fills + [third]) == [third]
+
+        reloaded = DedupIndex(account='Test')
+        reloaded.sync(transactions=pd.DataFrame(), cash_changes=pd.DataFrame())
+        assert reloaded.new_transactions(fills) == []
+        assert reloaded.new_cash_changes([create.cash_change(date=datetime(2022, 1, 3), direction='Deposit',
+                                                             amount=1000.)]) == []
+
+    def test_rebuild_after_edit(self):
+        self.index([FILL, OTHER])
+
+        # the account files were edited by hand, a fill was removed
+        index = self.index([OTHER])
+        assert [trx.ticker for trx in index.new_transactions([transaction(FILL), transaction(OTHER)])] == ['AAA']
+
+    def test_incomplete_record(self):
+        index = self.index([FILL])
+        index.record(transactions=[transaction(OTHER)], cash_changes=[], complete=False)
+
+        # the account rejected some of the fills, the index is rebuilt from the account even if its files did not change
+        reloaded = DedupIndex(account='Test')
+        reloaded.sync(transactions=self.write([FILL]), cash_changes=self.cash_changes)
+        assert [trx.ticker for trx in reloaded.new_transactions([transaction(FILL), transaction(OTHER)])] == ['BBB']
+
+    def test_save(self):
+        index = self.index([FILL])
+        index.record(transactions=[transaction(OTHER)], cash_changes=[])
+
+        with open(self.directory / 'dedup_index.json') as f:
+            saved = json.load(f)
+        assert sum(saved['transactions'].values()) == 2
+        assert not [f for f in os.listdir(self.directory) if f.endswith('.tmp')]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.services.fx_rates import FxRates
+
+
+class TestFxRates:
+    rates = {'USDCAD': pd.Series([1.25, 1.26, np.nan, 1.28], index=pd.bdate_range('2022-01-03', periods=4)),
+             'EURCAD': pd.Series([1.4, 1.41], index=pd.bdate_range('2022-01-03', periods=2))}
+
+    def test_get(self, fake_reader):
+        fake_reader.fx = self.rates
+        fx = FxRates(ptf_currency='CAD', currencies={'USD'}, datareader=fake_reader)
+        fx.get('EURCAD')
+
+        assert fake_reader.fx_reads == ['USDCAD', 'EURCAD']
+
+    def test_convert(self, fake_reader):
+        fake_reader.fx = self.rates
+        fx = FxRates(ptf_currency='CAD', currencies={'USD'}, datareader=fake_reader)
+        prices = {'AAA': pd.Series([10., 11., 12., 13., 14.], index=pd.bdate_range('2021-12-31', periods=5)),
+                  'BBB': pd.Series([20., 21.], index=pd.bdate_range('2022-01-03', periods=2))}
+
+        converted = fx.convert(prices=prices, currency='USD')
+
+        # no rate on the first date and a missing rate on the fourth
+        assert list(converted['AAA'].index) == list(pd.to_datetime(['2022-01-03', '2022-01-04', '2022-01-06']))
+        assert np.allclose(converted['AAA'].values, [11 * 1.25, 12 * 1.26, 14 * 1.28])
+        # the last price is converted at the last rate
+        assert np.allclose(converted['BBB'].values, [20 * 1.25, 21 * 1.28])
+
+    def test_convert_duplicate_dates(self, fake_reader):
+        dates = pd.to_datetime(['2022-01-03', '2022-01-04', '2022-01-04', '2022-01-05'])
+        fake_reader.fx = {'USDCAD': pd.Series([1.25, 1.2, 1.26, 1.27], index=dates)}
+        fx = FxRates(ptf_currency='CAD', currencies={'USD'}, datareader=fake_reader)
+        prices = {'AAA': pd.Series([10., 11., 12.], index=pd.bdate_range('2022-01-03', periods=3))}
+
+        converted = fx.convert(prices=prices, currency='USD')
+
+        assert np.allclose(converted['AAA'].values, [10 * 1.25, 11 * 1.26, 12 * 1.27])
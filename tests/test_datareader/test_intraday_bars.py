@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.services import intraday_bar_store
+from pyportlib.services.intraday_bar_store import IntradayBarStore
+
+
+def _bars(start: str, periods: int) -> pd.DataFrame:
+    idx = pd.date_range(start, periods=periods, freq='1min')
+    close = 100 + np.arange(periods, dtype=float)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(periods, 10)}, index=idx)
+
+
+class TestIntradayBars:
+
+    def test_append_only_new_bars(self, tmp_path):
+        store = IntradayBarStore(directory=f"{tmp_path}/")
+        bars = _bars('2022-06-27 09:30', 10)
+
+        assert store.append('AAA', bars.iloc[:6]) == 6
+        assert store.append('AAA', bars) == 4
+        assert len(store.read('AAA')) == 10
+
+    def test_partitioned_by_day(self, tmp_path):
+        store = IntradayBarStore(directory=f"{tmp_path}/")
+        store.append('AAA', pd.concat([_bars('2022-06-27 15:58', 2), _bars('2022-06-28 09:30', 2)]))
+
+        assert store.days('AAA') == [pd.Timestamp('2022-06-27'), pd.Timestamp('2022-06-28')]
+        assert len(store.read('AAA', start_date=pd.Timestamp('2022-06-28'))) == 2
+
+    def test_resample(self):
+        records = intraday_bar_store.to_records(_bars('2022-06-27 09:30', 12))
+        bars = intraday_bar_store.to_frame(intraday_bar_store.resample(records, '5min'))
+
+        assert list(bars.index.minute) == [30, 35, 40]
+        assert list(bars.Open) == [100, 105, 110]
+        assert list(bars.Close) == [104, 109, 111]
+        assert list(bars.High) == [105, 110, 112]
+        assert list(bars.Volume) == [50, 50, 20]
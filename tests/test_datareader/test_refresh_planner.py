@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from pyportlib.services.refresh_planner import RefreshPlanner
+
+
+class TestRefreshPlanner:
+    # a tuesday before the close is published, the last market day is monday
+    now = datetime(2022, 6, 14, 12, 0)
+
+    def test_last_market_day(self, fake_reader):
+        planner = RefreshPlanner(datareader=fake_reader)
+
+        assert planner.last_market_day(now=self.now) == datetime(2022, 6, 13)
+        assert planner.last_market_day(now=datetime(2022, 6, 14, 19, 0)) == datetime(2022, 6, 14)
+        assert planner.last_market_day(now=datetime(2022, 6, 19, 12, 0)) == datetime(2022, 6, 17)
+
+    def test_plan(self, fake_reader):
+        fake_reader.fresh_dividends = {'FRESH'}
+        fake_reader.add('prices', 'FRESH', '2022-06-13', self.now - timedelta(hours=1))
+        fake_reader.add('prices', 'OLD', '2022-06-10', self.now - timedelta(days=3))
+        fake_reader.add('prices', 'CLOSED', '2022-03-01', self.now - timedelta(days=100))
+        fake_reader.add('prices', 'HOLIDAY', '2022-06-10', datetime(2022, 6, 13, 20, 0))
+        fake_reader.add('fx', 'USDCAD', '2022-06-13', self.now - timedelta(hours=1))
+        for kind in ['balance_sheet', 'cash_flow', 'income_statement']:
+            fake_reader.add(kind, 'FRESH', '2022-03-31', self.now - timedelta(days=10))
+        planner = RefreshPlanner(datareader=fake_reader)
+
+        plan = planner.plan(tickers=['FRESH', 'OLD', 'CLOSED', 'HOLIDAY', 'NEW'], pairs=['USDCAD', 'CADCAD'],
+                            closed={'CLOSED': datetime(2022, 2, 15)}, fundamentals_and_dividends=True, now=self.now)
+
+        assert plan.prices == ['NEW', 'OLD']
+        assert plan.fx == ['CADCAD']
+        assert plan.skipped == ['CLOSED']
+        assert plan.statements == ['HOLIDAY', 'NEW', 'OLD']
+        assert plan.dividends == ['HOLIDAY', 'NEW', 'OLD']
+
+        errors = planner.execute(plan=plan, workers=2)
+        assert errors == {}
+        assert ('prices', 'FRESH') not in fake_reader.calls
+        assert len(fake_reader.calls) == len(plan)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from pyportlib.utils import df_utils
+
+
+class TestDfUtils:
+    def test_compact_prices(self):
+        prices = pd.Series([10.25, np.nan, 250.5], index=pd.bdate_range('2022-01-03', periods=3))
+
+        compact = df_utils.compact_prices(prices)
+        assert compact.dtype == np.float32
+        assert np.allclose(compact.values, prices.values, equal_nan=True)
+        assert df_utils.compact_prices(prices * 1e6).dtype == np.float64
+
+    def test_compact_prices_precision(self):
+        prices = pd.Series(np.linspace(0.01, df_utils.FLOAT32_PRICE_LIMIT - 0.01, 100001).round(2))
+        error = np.abs(df_utils.compact_prices(prices).values.astype(float) - prices.values)
+
+        assert error.max() <= 2 ** -9
+        assert error[prices.values < 2 ** 10].max() < 1e-4
+
+    def test_compact_transactions(self):
+        trx = pd.DataFrame({'Ticker': ['AAPL', 'AAPL', 'SHOP.TO'], 'Type': ['Buy', 'Sell', 'Buy'],
+                            'Quantity': [10, -5, 3], 'Currency': ['USD', 'USD', 'CAD']})
+
+        compact = df_utils.compact_transactions(trx.copy())
+        assert all(isinstance(compact[c].dtype, pd.CategoricalDtype) for c in df_utils.CATEGORY_COLUMNS)
+        assert compact.loc[compact.Ticker == 'AAPL', 'Quantity'].sum() == 5
+        assert set(compact.Currency) == {'USD', 'CAD'}
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from pyportlib.reporting.figures import FigureCache, ReturnsBundle
+
+
+class TestFigures:
+    returns = pd.Series(np.random.default_rng(0).normal(0, 0.01, 300), index=pd.bdate_range('2021-01-04', periods=300))
+
+    def bundle(self, returns: pd.Series) -> ReturnsBundle:
+        return ReturnsBundle(returns, benchmark=returns * 0.5, start_date=returns.index[0], end_date=returns.index[-1])
+
+    def test_key(self, tmp_path):
+        cache = FigureCache(directory=str(tmp_path))
+        bundle = self.bundle(self.returns)
+
+        assert cache.key('rolling_var', bundle) == cache.key('rolling_var', self.bundle(self.returns.copy()))
+        assert cache.key('rolling_var', bundle) != cache.key('rolling_var', bundle, quantile=0.99)
+        assert cache.key('rolling_var', bundle) != cache.key('rolling_vol', bundle)
+        assert cache.key('rolling_var', bundle) != cache.key('rolling_var', self.bundle(self.returns * 2))
+
+    def test_render_cached(self, tmp_path):
+        cache = FigureCache(directory=str(tmp_path))
+        bundle = self.bundle(self.returns)
+
+        path = cache.render('rolling_vol', bundle)
+        modified = os.path.getmtime(path)
+        assert os.path.getsize(path) > 0
+        assert cache.render('rolling_vol', bundle) == path
+        assert os.path.getmtime(path) == modified
+        assert cache.submit('rolling_vol', bundle).result() == path
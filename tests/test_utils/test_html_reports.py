@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from dependency_injector import providers
+
+from pyportlib import create
+from pyportlib.reporting import html_reports
+
+
+class TestBenchmarkReturns:
+    @pytest.fixture(autouse=True)
+    def reader(self, fake_reader):
+        fake_reader.prices = {'SPY': pd.Series([100., 101., 103.], index=pd.bdate_range('2022-01-03', periods=3))}
+        self.reader = fake_reader
+        html_reports.clear_benchmarks()
+        with create._datareader_container.datareader.override(providers.Object(fake_reader)):
+            yield
+        html_reports.clear_benchmarks()
+
+    def test_cached_by_prices(self):
+        assert len(html_reports.benchmark_returns('SPY', update=False)) == 3
+
+        # prices not in the catalog are read again
+        html_reports.benchmark_returns('SPY', update=False)
+        assert self.reader.price_reads == ['SPY', 'SPY']
+
+        # the data source adds a day of prices
+        self.reader.prices['SPY'] = pd.Series([100., 101., 103., 104.], index=pd.bdate_range('2022-01-03', periods=4))
+        assert len(html_reports.benchmark_returns('SPY', update=True)) == 4
+        html_reports.benchmark_returns('SPY', update=False)
+        # fetching the same prices again keeps the returns
+        html_reports.benchmark_returns('SPY', update=True)
+        assert len(self.reader.price_reads) == 3
@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+
+from dependency_injector import providers
+
+from pyportlib import create, main
+
+
+class TestMain:
+    def test_next_run(self):
+        assert main.next_run(datetime(2022, 1, 3, 10, 0)) == datetime(2022, 1, 3, 10, 0)
+        assert main.next_run(datetime(2022, 1, 3, 10, 0), at='18:30') == datetime(2022, 1, 3, 18, 30)
+        assert main.next_run(datetime(2022, 1, 3, 19, 0), at='18:30') == datetime(2022, 1, 4, 18, 30)
+        assert main.next_run(datetime(2022, 1, 4, 18, 31), at='18:30',
+                             last=datetime(2022, 1, 4, 18, 30)) == datetime(2022, 1, 5, 18, 30)
+        assert main.next_run(datetime(2022, 1, 3, 10, 5), every=30,
+                             last=datetime(2022, 1, 3, 10, 0)) == datetime(2022, 1, 3, 10, 30)
+
+    def test_account_currencies(self):
+        accounts = main.account_currencies(specs=['tfsa', 'margin:usd'], currency='CAD')
+        assert accounts == {'tfsa': 'CAD', 'margin': 'USD'}
+
+    def test_missing_account(self, tmp_path):
+        log = tmp_path / "log.jsonl"
+        code = main.main(['build', '--accounts', 'not_an_account', '--log-file', str(log)])
+        assert code == main.EXIT_NO_ACCOUNTS
+        assert not log.exists()
+
+    def test_state(self, tmp_path):
+        state = main.JobState(path=str(tmp_path / "state.json"))
+        state.record("report", "tfsa", "abc")
+        state.save()
+
+        state = main.JobState(path=str(tmp_path / "state.json"))
+        assert state.unchanged("report", "tfsa", "abc")
+        assert not state.unchanged("report", "tfsa", "def")
+        assert json.loads((tmp_path / "state.json").read_text()) == {"report|tfsa": "abc"}
+
+    def test_refresh_benchmark(self, tmp_path, monkeypatch):
+        from pyportlib.services.refresh_planner import RefreshPlanner
+        refreshed = []
+        monkeypatch.setattr(RefreshPlanner, 'refresh', lambda self, tickers, **kwargs: refreshed.extend(tickers) or {})
+        runner = main.Runner(accounts={}, benchmark='SPY', state=main.JobState(path=str(tmp_path / "state.json")),
+                             log=main.JobLog(path=str(tmp_path / "log.jsonl")))
+        with create._datareader_container.datareader.override(providers.Object(object())):
+            runner.refresh()
+
+        # no account holds the benchmark, it is refreshed for the reports
+        assert refreshed == ['SPY']
+
+    def test_usage(self, tmp_path):
+        log = tmp_path / "log.jsonl"
+        assert main.main(['sync', '--questrade', 'tfsa', '--log-file', str(log)]) == main.EXIT_USAGE
+        assert main.main(['sync', '--questrade', 'tfsa=', '--log-file', str(log)]) == main.EXIT_USAGE
+        assert main.main(['run', '--at', '25:00', '--log-file', str(log)]) == main.EXIT_USAGE
+        assert not log.exists()
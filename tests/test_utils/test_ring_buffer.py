@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from pyportlib.utils.ring_buffer import RingBuffer
+
+
+class TestRingBuffer:
+
+    def test_append_below_capacity(self):
+        buffer = RingBuffer(capacity=3)
+        buffer.append(datetime(2022, 5, 20, 10), 1.)
+        buffer.append(datetime(2022, 5, 20, 11), 2.)
+
+        assert len(buffer) == 2
+        assert list(buffer.values()) == [1., 2.]
+
+    def test_overwrites_oldest(self):
+        buffer = RingBuffer(capacity=3)
+        for i in range(5):
+            buffer.append(datetime(2022, 5, 20, 10, i), float(i))
+
+        assert len(buffer) == 3
+        assert list(buffer.values()) == [2., 3., 4.]
+        assert buffer.last() == 4.
+        assert buffer.to_series().index[0] == datetime(2022, 5, 20, 10, 2)